@@ -1,4 +1,18 @@
 __version__ = "0.0.6"
 from .ads_connection import ADSConnection
 from .ads_connection_labview import LabviewADSConnection
+from .ads_connection_pool import ADSConnectionPool, get_connection_pool
+from .ads_symbol_index import SymbolIndex
+from .ads_resilience import Backoff, CircuitBreaker
+from .ads_metrics import start_metrics_server
+from .ads_verification import WriteVerificationError, WriteVerifier
+from .ads_value_cache import ValueCache
+from .ads_filter import ChangeFilter, Deadband
+from .ads_ring_buffer import BufferFullError, ColumnarRingBuffer
+from .ads_line_protocol import LineProtocolEncoder, LineProtocolSink
+from .ads_recorder import ArrowRecorder
+from .ads_stream import Snapshot
 from .ads_client import ADSClient
+from .ads_scheduler import ADSScheduler
+from .ads_targets import load_targets
+from .ads_orchestrator import ADSOrchestrator
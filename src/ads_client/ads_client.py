@@ -9,19 +9,35 @@
 # ---------------------------------------------------------------------------
 
 import asyncio
-import sys
+import time
 from typing import Union
 from collections import deque
 from pathlib import Path
 import logging
 from datetime import datetime, timezone
 
-from ads_client import ADSConnection
+from ads_client import ADSConnectionPool, get_connection_pool
+from ads_client.ads_connection import SumResult
+from ads_client.ads_filter import ChangeFilter
+from ads_client.ads_metrics import LATENCY_BUCKETS
+from ads_client.ads_resilience import (
+    Backoff,
+    CircuitBreaker,
+    FailureEvent,
+    get_circuit_breaker,
+)
+from ads_client.ads_verification import WriteVerificationError, WriteVerifier
 from buffered import Buffer
+from prometheus_client import Counter, Gauge, Histogram
 from pyads import ADSError
 
 logger = logging.getLogger(__name__)
 
+# Notification modes of ADSReaderClient: send samples when they change or every cycle
+NOTIFICATION_ON_CHANGE = "on_change"
+NOTIFICATION_CYCLIC = "cyclic"
+NOTIFICATION_MODES = (NOTIFICATION_ON_CHANGE, NOTIFICATION_CYCLIC)
+
 
 def id_generator(prefix: str = "instance"):
     """Generator function to create unique IDs with a configurable prefix."""
@@ -31,11 +47,66 @@ def id_generator(prefix: str = "instance"):
         counter += 1
 
 
+class Ticker:
+    """
+    Periodic clock aligned to ``time.monotonic``.
+
+    Tick ``n`` is due ``n * interval`` seconds after the clock started, so time spent
+    between ticks does not accumulate as drift. Ticks already past by more than an
+    interval when the clock is awaited are skipped and counted in ``missed``.
+    """
+
+    def __init__(self, interval: float, start: float = None):
+        self.interval = interval
+        self.start = time.monotonic() if start is None else start
+        self.tick = -1
+        self.missed = 0
+
+    def due(self, tick: int) -> float:
+        """Return the monotonic time a tick is due."""
+        return self.start + tick * self.interval
+
+    async def wait(self) -> int:
+        """Sleep until the next tick is due and return its number."""
+        tick = self.tick + 1
+        now = time.monotonic()
+        late = int((now - self.due(tick)) // self.interval)
+        if late > 0:
+            self.missed += late
+            tick += late
+        delay = self.due(tick) - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.tick = tick
+        return tick
+
+
 class ADSClient:
-    """ADSClient class to manage the connection to an ADS target device and read data from it."""
+    """
+    ADSClient class to manage the connection to an ADS target device and read data from it.
+
+    Failed operations are retried up to ``retry_attempts`` times, waiting between
+    attempts as given by ``backoff``. Transport errors force the connection to be
+    reopened and count towards the circuit breaker shared by all clients of the
+    target, and while the circuit is open operations are skipped without reaching
+    the target. Every failed attempt is reported to `report_failure` as a
+    `FailureEvent`.
+    """
 
     client_id = id_generator(prefix="client")
 
+    # Class-level metrics to be shared across instances
+    operation_failures = Counter(
+        name="ads_client_operation_failures",
+        documentation="Number of failed attempts of client operations",
+        labelnames=["ams_net_id"],
+    )
+    operations_rejected = Counter(
+        name="ads_client_operations_rejected",
+        documentation="Number of client operations skipped because the circuit was open",
+        labelnames=["ams_net_id"],
+    )
+
     def __init__(
         self,
         name: str = None,
@@ -45,9 +116,17 @@ class ADSClient:
         update_interval: int = 1,
         retry_attempts: int = 10,
         retain_connection: bool = False,
+        connection_pool: ADSConnectionPool = None,
+        request_limiter: asyncio.Semaphore = None,
+        backoff: Backoff = None,
+        circuit_breaker: CircuitBreaker = None,
     ):
         self.name = name or next(self.client_id)
-        self.target = ADSConnection(
+        # Clients of the same target share one pooled connection
+        if connection_pool is None:
+            connection_pool = get_connection_pool()
+        self.connection_pool = connection_pool
+        self.target = self.connection_pool.acquire(
             ams_net_id=ams_net_id,
             ip_address=ip_address,
             ams_net_port=ams_net_port,
@@ -55,43 +134,136 @@ class ADSClient:
         )
         self.update_interval = update_interval
         self.retry_attempts = retry_attempts
+        # Optional semaphore shared between clients to cap their requests in flight
+        self.request_limiter = request_limiter
+        self.backoff = backoff or Backoff()
+        if circuit_breaker is None:
+            circuit_breaker = get_circuit_breaker(
+                self.target.ams_net_id, self.target.ams_net_port
+            )
+        self.circuit_breaker = circuit_breaker
+
+    def close(self):
+        """Release the client's lease on its pooled connection."""
+        if self.target is not None:
+            self.connection_pool.release(self.target)
+            self.target = None
 
     async def do_work_periodically(self, *args, update_interval=None, **kwargs):
-        update_interval = update_interval or self.update_interval
+        # Ticks are aligned to the clock, so the time taken by the work does not drift
+        ticker = Ticker(update_interval or self.update_interval)
         while True:
+            await ticker.wait()
             await self.do_work(*args, **kwargs)
-            await asyncio.sleep(update_interval)
 
     async def do_work(self, *args, **kwargs):
-        """This should be overridden by subclasses"""
+        """This should be overridden by subclasses, returning whether the work succeeded"""
         raise NotImplementedError("Subclasses should implement this method.")
 
-    async def _perform_operation(self, operation):
-        operation_successful = False
-        retry_attempts = self.retry_attempts
-
-        while not operation_successful and retry_attempts > 0:
+    async def _perform_operation(self, operation) -> bool:
+        """Run an operation with retries and return whether it succeeded."""
+        ams_net_id = self.target.ams_net_id
+        for attempt in range(self.retry_attempts):
+            if not self.circuit_breaker.allow_request():
+                logger.debug(f"Circuit of {ams_net_id} is open, skipping {self.name}")
+                self.operations_rejected.labels(ams_net_id).inc()
+                return False
+            generation = self.target.reconnect_generation
             try:
-                await operation()
-                operation_successful = True
+                if self.request_limiter is None:
+                    await operation()
+                else:
+                    async with self.request_limiter:
+                        await operation()
             except ADSError as e:
-                retry_attempts -= 1
-                logger.error(
-                    f"Operation failed. Retrying... ({retry_attempts} remaining) {e}"
+                event = FailureEvent.from_error(
+                    self, attempt, e, self.circuit_breaker.state
                 )
+                if event.transport_error:
+                    self.circuit_breaker.record_failure()
+                    await self._reconnect(generation)
+                else:
+                    # The target answered, so only the request itself failed
+                    self.circuit_breaker.record_success()
+                self.report_failure(event)
+                if attempt + 1 < self.retry_attempts:
+                    # The request limiter is not held while waiting to retry
+                    await asyncio.sleep(self.backoff.delay(attempt))
+            else:
+                self.circuit_breaker.record_success()
+                return True
 
-        if not operation_successful:
-            logger.error(
-                f"Operation failed after {self.retry_attempts} attempts. Exiting."
+        logger.error(
+            f"Operation of {self.name} failed after {self.retry_attempts} attempts"
+        )
+        return False
+
+    def report_failure(self, event: FailureEvent):
+        """
+        Report a failed attempt of an operation.
+        Override this method to forward failure events elsewhere.
+        """
+        self.operation_failures.labels(event.ams_net_id).inc()
+        logger.warning(
+            f"Operation of {self.name} failed on attempt {event.attempt + 1} of {self.retry_attempts}: {event.error}",
+            extra={"failure_event": event._asdict()},
+        )
+
+    def check_read(self, result: SumResult) -> SumResult:
+        """
+        Log the variables a sum read could not read, and raise an `ADSError` if none of
+        them could be read, so the read fails and is retried like any other operation.
+        """
+        if not result.errors:
+            return result
+        if not result:
+            data_name, err_code = next(iter(result.errors.items()))
+            raise ADSError(
+                err_code,
+                f"None of {len(result.errors)} variables could be read, e.g. {data_name}",
             )
-            sys.exit(1)
+        logger.warning(
+            f"{self.name} could not read {len(result.errors)} variables: {result.errors}"
+        )
+        return result
+
+    async def _reconnect(self, generation: int = None):
+        """
+        Reconnect the target after a transport error, unless another client sharing
+        the connection reconnected it since ``generation`` was read.
+        """
+        try:
+            await self.target.run_async(self.target.reconnect, generation)
+        except (ADSError, OSError) as e:
+            logger.warning(f"Unable to reconnect to {self.target.ams_net_id}: {e}")
 
 
 class ADSReaderClient(ADSClient):
-    """ADSClient class to manage the connection to an ADS target device and read data from it."""
+    """
+    ADSClient class to manage the connection to an ADS target device and read data from it.
+
+    By default ``data_names`` are polled every ``update_interval`` seconds. With a
+    ``notification_mode`` the client instead subscribes to ADS device notifications,
+    sampled on the target every ``update_interval`` seconds and sent on change or every
+    cycle, and moves the received samples to the buffer on each update. Samples are
+    grouped by timestamp, so each buffer entry holds the values sampled together.
+    Subscriptions are added again when the connection is reopened.
+
+    With ``report_on_change`` or ``deadbands`` set, values that did not change since
+    they were last buffered are left out of the buffer entries, and entries left
+    empty are not buffered. See `ChangeFilter` for ``deadbands`` and
+    ``heartbeat_interval``.
+    """
 
     client_id = id_generator(prefix="reader_client")
 
+    # Class-level metrics to be shared across instances
+    suppressed_values = Counter(
+        name="ads_client_reader_suppressed_values",
+        documentation="Number of unchanged values left out of the buffer",
+        labelnames=["ams_net_id"],
+    )
+
     def __init__(
         self,
         buffer: Union[list, deque],
@@ -104,7 +276,23 @@ class ADSReaderClient(ADSClient):
         retry_attempts: int = 10,
         retain_connection: bool = False,
         process_data_enabled: bool = False,
+        connection_pool: ADSConnectionPool = None,
+        request_limiter: asyncio.Semaphore = None,
+        backoff: Backoff = None,
+        circuit_breaker: CircuitBreaker = None,
+        notification_mode: str = None,
+        notification_max_delay: float = 0.0,
+        report_on_change: bool = False,
+        deadbands: dict = None,
+        heartbeat_interval: float = 0.0,
     ):
+        if (
+            notification_mode is not None
+            and notification_mode not in NOTIFICATION_MODES
+        ):
+            raise ValueError(
+                f"Unknown notification mode '{notification_mode}', expected one of {NOTIFICATION_MODES}"
+            )
         super().__init__(
             name=name,
             ams_net_id=ams_net_id,
@@ -113,50 +301,153 @@ class ADSReaderClient(ADSClient):
             update_interval=update_interval,
             retry_attempts=retry_attempts,
             retain_connection=retain_connection,
+            connection_pool=connection_pool,
+            request_limiter=request_limiter,
+            backoff=backoff,
+            circuit_breaker=circuit_breaker,
         )
         self.process_data_enabled = process_data_enabled
         self.buffer = buffer
         self.data_names = data_names
+        self.notification_mode = notification_mode
+        self.notification_max_delay = notification_max_delay
+        self._samples: asyncio.Queue = None
+        self._subscription: int = None
+        self.change_filter = None
+        if report_on_change or deadbands:
+            self.change_filter = ChangeFilter(deadbands, heartbeat_interval)
+
+    def close(self):
+        """Unsubscribe from notifications and release the pooled connection."""
+        if self.target is not None and self._subscription is not None:
+            self.target.remove_notifications(self.data_names, self._subscription)
+            self._subscription = None
+            self._samples = None
+        super().close()
 
     def process_data(self, data):
         """
         Process data read from the target device.
         Define how to process the data in this method.
         """
-        # Example: Convert data to InfluxDB line protocol format
-        # processed_data = {
-        #     "time": datetime.now(timezone.utc).timestamp(),
-        #     "measurement": self.name,
-        #     "tags": {"device": self.name},
-        #     "fields": data,
-        # }
-        # return processed_data
+        # To stream samples as InfluxDB line protocol, pass a `LineProtocolSink` as
+        # the buffer instead, which encodes them in batches.
         return None
 
+    def store_data(self, read_data):
+        """Process data if enabled and add it to the buffer."""
+        if self.change_filter is not None:
+            count = len(read_data)
+            read_data = self.change_filter.filter(read_data)
+            if count > len(read_data):
+                self.suppressed_values.labels(self.target.ams_net_id).inc(
+                    count - len(read_data)
+                )
+            if not read_data:
+                return
+        if self.process_data_enabled:
+            read_data = self.process_data(read_data)
+        if read_data is None and self.process_data_enabled:
+            logger.error(
+                f"Processing data failed. 'process_data_enabled' is {self.process_data_enabled} but 'process_data' function returning {read_data}. Check that 'process_data' is implemented correctly for subclass{self.__class__.__name__}."
+            )
+            return
+        logger.info(f"Adding {len(read_data)} packets to queue")
+        self.buffer.append(read_data)
+
     async def do_work(self, *args, **kwargs):
         async def read_operation():
-            read_data = self.target.read_list_by_name(data_names=self.data_names)
-
+            read_data = self.check_read(
+                await self.target.read_list_by_name_async(self.data_names)
+            )
             if read_data:
-                if self.process_data_enabled:
-                    read_data = self.process_data(read_data)
-                if read_data is None and self.process_data_enabled:
-                    logger.error(
-                        f"Processing data failed. 'process_data_enabled' is {self.process_data_enabled} but 'process_data' function returning {read_data}. Check that 'process_data' is implemented correctly for subclass{self.__class__.__name__}."
-                    )
-                    return
-                logger.info(f"Adding {len(read_data)} packets to queue")
-                self.buffer.append(read_data)
+                self.store_data(read_data)
+
+        async def notification_operation():
+            if self._samples is None:
+                await self.subscribe()
+            elif not self.target.is_open:
+                # Reopening the connection adds the notifications on the target again
+                await self.target.run_async(self.target.open)
+            for read_data in self.drain_samples():
+                self.store_data(read_data)
 
         # Use the base class method to handle retries and errors
-        await self._perform_operation(read_operation)
+        if self.notification_mode:
+            return await self._perform_operation(notification_operation)
+        return await self._perform_operation(read_operation)
+
+    async def subscribe(self):
+        """Subscribe to device notifications of ``data_names``."""
+        loop = asyncio.get_running_loop()
+        samples = asyncio.Queue()
+
+        def on_notification(data_name, timestamp, value):
+            # Called from the thread receiving notifications
+            loop.call_soon_threadsafe(samples.put_nowait, (timestamp, data_name, value))
+
+        self._subscription = await self.target.run_async(
+            self.target.add_notifications,
+            self.data_names,
+            on_notification,
+            on_change=self.notification_mode == NOTIFICATION_ON_CHANGE,
+            cycle_time=self.update_interval,
+            max_delay=self.notification_max_delay,
+        )
+        self._samples = samples
+
+    def drain_samples(self) -> list:
+        """Return the queued samples as one dict of values per timestamp."""
+        grouped = []
+        while not self._samples.empty():
+            timestamp, data_name, value = self._samples.get_nowait()
+            # A repeated variable starts a new entry even if timestamps are coarse
+            if (
+                not grouped
+                or grouped[-1][0] != timestamp
+                or data_name in grouped[-1][1]
+            ):
+                grouped.append((timestamp, {}))
+            grouped[-1][1][data_name] = value
+        return [values for _, values in grouped]
 
 
 class ADSWriterClient(ADSClient):
-    """ADSClient class to manage the connection to an ADS target device and write data to it."""
+    """
+    ADSClient class to manage the connection to an ADS target device and write data to it.
+
+    Each update drains the dicts of values queued in ``buffer``, up to
+    ``write_batch_size`` of them if set, and merges them so that the latest value
+    queued for a variable wins. The merged values are written with a single sum
+    write. Values that could not be written are kept pending, whether the write
+    failed as a whole or only for some variables, and are retried merged with any
+    updates queued in the meantime.
+
+    With ``verify_write_operations`` the written values are read back with one sum
+    read, and differences are logged and the values kept pending. Pass a `WriteVerifier` to verify only one in N
+    updates or to change the tolerances.
+    """
 
     client_id = id_generator(prefix="writer_client")
 
+    # Class-level metrics to be shared across instances
+    queue_depth = Gauge(
+        name="ads_client_writer_queue_depth",
+        documentation="Number of updates queued in the writer buffer",
+        labelnames=["ams_net_id"],
+    )
+    flush_duration = Histogram(
+        name="ads_client_writer_flush_duration_seconds",
+        documentation="Duration of writing the merged updates of a writer",
+        labelnames=["ams_net_id"],
+        buckets=LATENCY_BUCKETS,
+    )
+    coalesced_writes = Counter(
+        name="ads_client_writer_coalesced_writes",
+        documentation="Number of queued values superseded by a later value before being written",
+        labelnames=["ams_net_id"],
+    )
+
     def __init__(
         self,
         buffer: Union[list, deque, Buffer],
@@ -168,7 +459,11 @@ class ADSWriterClient(ADSClient):
         retry_attempts: int = 10,
         retain_connection: bool = False,
         write_batch_size: int = 0,
-        verify_write_operations: bool = False,
+        verify_write_operations: Union[bool, WriteVerifier] = False,
+        connection_pool: ADSConnectionPool = None,
+        request_limiter: asyncio.Semaphore = None,
+        backoff: Backoff = None,
+        circuit_breaker: CircuitBreaker = None,
     ):
         super().__init__(
             name=name,
@@ -178,26 +473,70 @@ class ADSWriterClient(ADSClient):
             update_interval=update_interval,
             retry_attempts=retry_attempts,
             retain_connection=retain_connection,
+            connection_pool=connection_pool,
+            request_limiter=request_limiter,
+            backoff=backoff,
+            circuit_breaker=circuit_breaker,
         )
         self.buffer = buffer
         self.write_batch_size = write_batch_size
         self.verify_write_operations = verify_write_operations
+        # Merged values waiting to be written
+        self.pending = {}
+
+    def drain(self) -> dict:
+        """Merge the queued updates into the pending values and return them."""
+        ams_net_id = self.target.ams_net_id
+        count = len(self.buffer)
+        self.queue_depth.labels(ams_net_id).set(count)
+        if self.write_batch_size:
+            count = min(count, self.write_batch_size)
+        if isinstance(self.buffer, Buffer):
+            updates = self.buffer.dump(count)
+        elif isinstance(self.buffer, deque):
+            updates = [self.buffer.popleft() for _ in range(count)]
+        else:
+            updates = self.buffer[:count]
+            del self.buffer[:count]
+        coalesced = 0
+        for update in updates:
+            coalesced += sum(1 for data_name in update if data_name in self.pending)
+            self.pending.update(update)
+        if coalesced:
+            self.coalesced_writes.labels(ams_net_id).inc(coalesced)
+        return self.pending
 
     async def do_work(self, *args, **kwargs):
         async def write_operation():
-            if self.buffer:
-                if isinstance(self.buffer, Buffer):
-                    if self.write_batch_size:
-                        write_data = self.buffer.dump(self.write_batch_size)
-                        self.target.write_list_by_name(
-                            variables=write_data, verify=self.verify_write_operations
-                        )
-                    else:
-                        write_data = self.buffer.get()
-                else:
-                    write_data = self.buffer.popleft()
-                for data_name, value in write_data.items():
-                    self.target.write_by_name(data_name=data_name, value=value)
+            variables = self.drain()
+            if not variables:
+                return
+            started = time.perf_counter()
+            try:
+                # One sum write for all the merged updates instead of a request per variable
+                errors = await self.target.write_list_by_name_async(
+                    variables=variables, verify=self.verify_write_operations
+                )
+            except WriteVerificationError as e:
+                errors = e.write_errors
+                logger.warning(
+                    f"Written variables differ from the values read back: {e.report.mismatches}"
+                )
+                # Variables not known to hold the values written are written again
+                unverified = {**e.report.mismatches, **e.report.errors}
+            else:
+                unverified = {}
+            self.flush_duration.labels(self.target.ams_net_id).observe(
+                time.perf_counter() - started
+            )
+            # Only the values written successfully leave the pending values
+            self.pending = {
+                data_name: value
+                for data_name, value in variables.items()
+                if data_name in errors or data_name in unverified
+            }
+            if errors:
+                logger.warning(f"Failed to write variables: {errors}")
 
         # Use the base class method to handle retries and errors
-        await self._perform_operation(write_operation)
+        return await self._perform_operation(write_operation)
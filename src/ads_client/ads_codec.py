@@ -0,0 +1,349 @@
+"""Conversion between raw ADS bytes and python values"""
+
+from ctypes import addressof, sizeof, string_at
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Union
+import struct
+
+import pyads
+from pyads.constants import DATATYPE_MAP, PLC_DEFAULT_STRING_SIZE
+from pyads.pyads_ex import get_value_from_ctype_data, type_is_string, type_is_wstring
+from pyads.filetimes import filetime_to_dt
+from pyads.structs import SAdsNotificationHeader, SAdsSymbolEntry
+from pyads.symbol import AdsSymbol
+
+try:
+    import numpy
+except ImportError:  # NumPy is an optional dependency
+    numpy = None
+
+
+def symbol_entry_from_bytes(data: bytes) -> SAdsSymbolEntry:
+    """Parse a symbol entry as returned by ADSIGRP_SYM_INFOBYNAMEEX."""
+    size = sizeof(SAdsSymbolEntry)
+    return SAdsSymbolEntry.from_buffer_copy(bytes(data[:size]).ljust(size, b"\x00"))
+
+
+def plc_datatype_from_symbol(symbol_entry: SAdsSymbolEntry):
+    """Return the PLCTYPE matching a symbol entry, or None if it cannot be mapped."""
+    plc_datatype = AdsSymbol.get_type_from_str(symbol_entry.symbol_type)
+    if (
+        plc_datatype is None
+        and symbol_entry.dataType in pyads.constants.ads_type_to_ctype
+    ):
+        plc_datatype = pyads.constants.ads_type_to_ctype[symbol_entry.dataType]
+        element_size = sizeof(plc_datatype)
+        if symbol_entry.size > element_size and not type_is_string(plc_datatype):
+            plc_datatype = plc_datatype * (symbol_entry.size // element_size)
+    return plc_datatype
+
+
+def notification_sample(notification) -> tuple[datetime, bytes]:
+    """Return the timestamp and data of a notification received through pyads."""
+    header = notification.contents
+    data = string_at(
+        addressof(header) + SAdsNotificationHeader.data.offset, header.cbSampleSize
+    )
+    return filetime_to_dt(header.nTimeStamp), data
+
+
+def decode_value(data: bytes, plc_datatype) -> Any:
+    """Convert bytes read from the PLC to a python value of the given PLCTYPE."""
+    if type_is_string(plc_datatype):
+        return bytes(data).split(b"\x00", 1)[0].decode("utf-8")
+    if type_is_wstring(plc_datatype):
+        data = bytes(data)
+        for index in range(0, len(data) - 1, 2):
+            if data[index : index + 2] == b"\x00\x00":
+                return data[:index].decode("utf-16-le")
+        raise ValueError("No null-terminator found in buffer")
+    size = sizeof(plc_datatype)
+    if len(data) < size:
+        raise RuntimeError(
+            f"Insufficient data (expected {size} bytes, {len(data)} were read)."
+        )
+    return get_value_from_ctype_data(
+        plc_datatype.from_buffer_copy(data[:size]), plc_datatype
+    )
+
+
+def encode_value(value: Any, plc_datatype, size: int = None) -> bytes:
+    """
+    Convert a python value to the bytes of the given PLCTYPE.
+    Strings are null terminated and, if ``size`` is given, padded or truncated to it.
+    """
+    if type_is_string(plc_datatype):
+        data = value.encode("utf-8") + b"\x00"
+    elif type_is_wstring(plc_datatype):
+        data = value.encode("utf-16-le") + b"\x00\x00"
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    elif type(plc_datatype).__name__ == "PyCArrayType":
+        return bytes(plc_datatype(*value))
+    else:
+        return bytes(plc_datatype(value))
+    if size is not None:
+        data = data[:size].ljust(size, b"\x00")
+    return data
+
+
+# Values of TwinCAT's {attribute 'pack_mode'}: the largest alignment of a member.
+# TwinCAT 3 aligns members naturally, as with pack mode 8, unless declared otherwise
+PACK_MODES = (8, 4, 2, 1)
+DEFAULT_PACK_MODE = 8
+
+
+class StructureCodec:
+    """
+    Codec for PLC structures described by a pyads ``structure_def`` tuple.
+
+    The definition is compiled once into a ``struct.Struct`` laid out like a TwinCAT
+    structure declared with ``{attribute 'pack_mode' := 'n'}``: each member is aligned
+    to its own size, or to that of its largest member for nested structures, but to no
+    more than ``pack_mode`` bytes, and the structure is padded to a multiple of its
+    alignment. Pack mode 1 is the layout without padding which pyads'
+    ``size_of_structure`` and ``dict_from_bytes`` assume. Strings take their declared
+    length (default 80) plus the null terminator. Arrays of structures are packed and
+    unpacked with a single struct call over the whole buffer.
+    """
+
+    def __init__(self, structure_def: tuple, pack_mode: int = DEFAULT_PACK_MODE):
+        if pack_mode not in PACK_MODES:
+            raise ValueError(
+                f"Unknown pack mode {pack_mode}, expected one of {PACK_MODES}"
+            )
+        self.structure_def = structure_def
+        self.pack_mode = pack_mode
+        self.fields = []
+        self.alignment = 1
+        formats, layouts = [], []
+        offset = 0
+        for item in structure_def:
+            name, plc_datatype, count = item[:3]
+            str_len = item[3] if len(item) > 3 else PLC_DEFAULT_STRING_SIZE
+            if type_is_string(plc_datatype):
+                item_format, alignment = f"{str_len + 1}s", 1
+                field = (_decode_string, _encode_string, str_len)
+            elif type_is_wstring(plc_datatype):
+                item_format, alignment = f"{2 * (str_len + 1)}s", 2
+                field = (_decode_wstring, _encode_wstring, 2 * str_len)
+            elif isinstance(plc_datatype, tuple):
+                codec = get_structure_codec(plc_datatype, pack_mode)
+                item_format, alignment = f"{codec.size}s", codec.alignment
+                item_layout = f"({codec.layout})"
+                field = (codec.decode, codec.encode, None)
+            elif plc_datatype in DATATYPE_MAP:
+                item_format = DATATYPE_MAP[plc_datatype].lstrip("<")
+                alignment = struct.calcsize("<" + item_format)
+                field = (None, None, None)
+            else:
+                raise RuntimeError(
+                    f"Datatype of {name} not found in structure definition"
+                )
+            alignment = min(alignment, pack_mode)
+            self.alignment = max(self.alignment, alignment)
+            padding = -offset % alignment
+            formats.append(f"{padding}x" * bool(padding) + item_format * count)
+            if not isinstance(plc_datatype, tuple):
+                item_layout = item_format
+            layouts.append(f"{padding}x" * bool(padding) + item_layout * count)
+            offset += padding + struct.calcsize("<" + item_format) * count
+            self.fields.append((name, count) + field)
+        padding = -offset % self.alignment
+        formats.append(f"{padding}x" * bool(padding))
+        layouts.append(f"{padding}x" * bool(padding))
+        self.format = "".join(formats)
+        # The format with nested structures spelled out, equal for identical layouts
+        self.layout = "".join(layouts)
+        self.struct = struct.Struct("<" + self.format)
+        self.size = self.struct.size
+        self._array_structs = {1: self.struct}
+
+    def array_struct(self, array_size: int) -> struct.Struct:
+        """Return the struct of an array of ``array_size`` structures."""
+        array_struct = self._array_structs.get(array_size)
+        if array_struct is None:
+            array_struct = struct.Struct("<" + self.format * array_size)
+            if len(self._array_structs) < 32:
+                self._array_structs[array_size] = array_struct
+        return array_struct
+
+    def decode(
+        self, data: Union[bytes, memoryview], array_size: int = 1
+    ) -> Union[dict, list]:
+        """
+        Decode one structure, or a list of ``array_size`` structures, from a buffer.
+        The buffer is unpacked in place, so a memoryview of the response is not copied.
+        """
+        items = self.array_struct(array_size).unpack_from(data)
+        structures = []
+        index = 0
+        for _ in range(array_size):
+            values = {}
+            for name, count, decode, _, _ in self.fields:
+                field_items = items[index : index + count]
+                index += count
+                if decode is not None:
+                    field_items = [decode(item) for item in field_items]
+                values[name] = field_items[0] if count == 1 else list(field_items)
+            structures.append(values)
+        return structures if array_size != 1 else structures[0]
+
+    def encode(self, values: Union[dict, list], array_size: int = None) -> bytes:
+        """Encode one structure, or a list of structures, to the bytes of the PLC."""
+        if not isinstance(values, list):
+            values = [values]
+        if array_size is not None and len(values) != array_size:
+            raise ValueError(
+                f"Expected {array_size} structures, {len(values)} were given"
+            )
+        items = []
+        for structure in values:
+            for name, count, _, encode, length in self.fields:
+                value = structure[name]
+                field_items = [value] if count == 1 else value
+                if encode is None:
+                    items.extend(field_items)
+                elif length is None:
+                    items.extend(encode(item) for item in field_items)
+                else:
+                    items.extend(encode(item)[:length] for item in field_items)
+        return self.array_struct(len(values)).pack(*items)
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(size={self.size}, pack_mode={self.pack_mode}, "
+            f"format='{self.format}')"
+        )
+
+
+def get_structure_codec(
+    structure_def: tuple, pack_mode: int = DEFAULT_PACK_MODE
+) -> StructureCodec:
+    """Return the compiled codec of a structure definition, compiling it once."""
+    return _compiled_structure_codec(structure_def, pack_mode)
+
+
+@lru_cache(maxsize=None)
+def _compiled_structure_codec(structure_def: tuple, pack_mode: int) -> StructureCodec:
+    # Called with positional arguments only, so every call shares the cache entry
+    return StructureCodec(structure_def, pack_mode)
+
+
+def get_symbol_structure_codec(
+    structure_def: tuple, symbol_size: int, array_size: int = 1, pack_mode: int = None
+) -> StructureCodec:
+    """
+    Return the codec of a structure definition for a symbol of ``symbol_size`` bytes
+    holding at least ``array_size`` structures. Unless ``pack_mode`` is given, the
+    layout is detected from the size of the symbol: a layout whose ``array_size``
+    structures fill the symbol exactly is taken first, and otherwise the one whose
+    structures fit it. A ValueError is raised if several layouts fit equally well,
+    such as for a packed array read as its first structure, as the pack mode must
+    then be given.
+    """
+    if pack_mode is not None:
+        codecs = [get_structure_codec(structure_def, pack_mode)]
+    else:
+        codecs = [get_structure_codec(structure_def, mode) for mode in PACK_MODES]
+    fitting = [
+        codec
+        for codec in codecs
+        if symbol_size >= codec.size * array_size and symbol_size % codec.size == 0
+    ]
+    exact = [codec for codec in fitting if codec.size * array_size == symbol_size]
+    candidates = exact or fitting
+    # Pack modes above the alignment of every member share one layout
+    layouts = {codec.layout: codec for codec in reversed(candidates)}
+    if len(layouts) == 1:
+        return layouts.popitem()[1]
+    if layouts:
+        modes = ", ".join(str(codec.pack_mode) for codec in candidates)
+        raise ValueError(
+            f"Pack mode of a symbol of {symbol_size} bytes holding {array_size} "
+            f"structures is ambiguous between pack modes {modes}, give its pack_mode"
+        )
+    sizes = ", ".join(
+        f"{codec.size} bytes in pack mode {codec.pack_mode}" for codec in codecs
+    )
+    raise ValueError(
+        f"Symbol of {symbol_size} bytes does not hold {array_size} structures of {sizes}"
+    )
+
+
+def _decode_string(data: bytes) -> str:
+    return data.partition(b"\x00")[0].decode("utf-8")
+
+
+def _encode_string(value: str) -> bytes:
+    return value.encode("utf-8")
+
+
+def _decode_wstring(data: bytes) -> str:
+    for index in range(0, len(data) - 1, 2):
+        if data[index : index + 2] == b"\x00\x00":
+            return data[:index].decode("utf-16-le")
+    return data.decode("utf-16-le")
+
+
+def _encode_wstring(value: str) -> bytes:
+    return value.encode("utf-16-le")
+
+
+def numpy_dtype(plc_datatype):
+    """Return the NumPy dtype of a PLCTYPE, or of the elements of a PLCTYPE array."""
+    if numpy is None:
+        raise ImportError("NumPy is required for array reads and writes as ndarrays")
+    plc_datatype = element_datatype(plc_datatype)
+    if plc_datatype not in DATATYPE_MAP:
+        raise TypeError(f"No NumPy dtype for PLC type {plc_datatype.__name__}")
+    return numpy.dtype(DATATYPE_MAP[plc_datatype])
+
+
+def array_from_buffer(data: Union[bytes, memoryview], plc_datatype):
+    """Return an ndarray viewing a buffer read from the PLC, without copying it."""
+    return numpy.frombuffer(data, dtype=numpy_dtype(plc_datatype))
+
+
+def element_datatype(plc_datatype):
+    """Return the PLCTYPE of the elements of a PLCTYPE array, or the PLCTYPE itself."""
+    if type(plc_datatype).__name__ == "PyCArrayType":
+        return plc_datatype._type_
+    return plc_datatype
+
+
+def buffer_from_array(value: Any, plc_datatype) -> memoryview:
+    """
+    Return the raw bytes of a buffer-protocol object, such as an ndarray or an
+    ``array.array``, with its elements converted to the type of ``plc_datatype`` as a
+    whole rather than element by element. Bytes, bytearrays and byte memoryviews are
+    taken as the raw bytes to write, whatever the PLC type.
+    """
+    if isinstance(value, (bytes, bytearray)) or (
+        isinstance(value, memoryview) and value.format == "B"
+    ):
+        return memoryview(value).cast("B")
+    if plc_datatype is None:
+        raise TypeError("A PLC type is required to write an array that is not bytes")
+    plc_datatype = element_datatype(plc_datatype)
+    if numpy is not None:
+        value = numpy.ascontiguousarray(value, dtype=numpy_dtype(plc_datatype))
+        return memoryview(value).cast("B")
+    view = memoryview(value)
+    item_format = DATATYPE_MAP.get(plc_datatype, "").lstrip("<")
+    if view.format != item_format:
+        raise TypeError(
+            f"NumPy is required to convert '{view.format}' items to PLC type "
+            f"{plc_datatype.__name__}"
+        )
+    return view.cast("B")
+
+
+def supports_buffer(value: Any) -> bool:
+    """Whether a value exposes the buffer protocol and can be written as raw bytes."""
+    try:
+        memoryview(value)
+    except TypeError:
+        return False
+    return True
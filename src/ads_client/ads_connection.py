@@ -9,18 +9,102 @@
 # ---------------------------------------------------------------------------
 
 
-from typing import Any, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from ctypes import Structure, c_ubyte, sizeof
+from functools import lru_cache, partial
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Union
+import asyncio
+import itertools
 import pyads
 import json
 import logging
 import re
+import struct
+import threading
+import time
+import weakref
 
-from prometheus_client import Counter
+from prometheus_client import Counter, Histogram
+from pyads.pyads_ex import (
+    adsGetHandle,
+    adsGetSymbolInfo,
+    adsReleaseHandle,
+    adsSyncAddDeviceNotificationReqEx,
+    adsSyncDelDeviceNotificationReqEx,
+    adsSyncReadWriteReqEx2,
+    type_is_string,
+    type_is_wstring,
+)
+from pyads.structs import SAdsSumRequest, SAdsSymbolEntry
 
+from ads_client.ads_codec import (
+    array_from_buffer,
+    buffer_from_array,
+    decode_value,
+    element_datatype,
+    encode_value,
+    get_symbol_structure_codec,
+    notification_sample,
+    numpy_dtype,
+    plc_datatype_from_symbol,
+    supports_buffer,
+    symbol_entry_from_bytes,
+)
+from ads_client.ads_metrics import (
+    BATCH_SIZE_BUCKETS,
+    LATENCY_BUCKETS,
+    error_code_label,
+)
+from ads_client.ads_stream import (
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP_OLDEST,
+    STREAM_MODES,
+    STREAM_NOTIFY,
+    STREAM_POLL,
+    Snapshot,
+    SnapshotQueue,
+)
+from ads_client.ads_resilience import is_transport_error
+from ads_client.ads_symbol_cache import STALE_SYMBOL_ERRORS, SymbolCache
+from ads_client.ads_symbol_index import (
+    UPLOAD_INFO,
+    SymbolIndex,
+    expand_symbols,
+    parse_datatype_upload,
+    parse_symbol_upload,
+)
+from ads_client.ads_transport import AsyncADSTransport, get_transport_loop
+from ads_client.ads_value_cache import DEFAULT_VALUE_CACHE_SIZE, MISSING, ValueCache
+from ads_client.ads_verification import (
+    VerificationReport,
+    WriteVerificationError,
+    WriteVerifier,
+)
 from ads_client.constants import ERROR_STRUCTURE
 
 logger = logging.getLogger(__name__)
 
+# Seconds a connection is kept open after its last session ends
+DEFAULT_IDLE_TIMEOUT = 5.0
+
+# Available I/O backends: the pyads/TcAdsDll router or the asyncio AMS/TCP transport
+BACKEND_PYADS = "pyads"
+BACKEND_ASYNCIO = "asyncio"
+BACKENDS = (BACKEND_PYADS, BACKEND_ASYNCIO)
+
+# ADS sum commands bundle many sub-commands into a single request
+ADSIGRP_SUMUP_READ = pyads.constants.ADSIGRP_SUMUP_READ
+ADSIGRP_SUMUP_WRITE = pyads.constants.ADSIGRP_SUMUP_WRITE
+ADSIGRP_SUMUP_READWRITE = 0xF082
+# Largest request or response data sent in a single sum command, in bytes
+DEFAULT_MAX_SUM_PAYLOAD = 0x10000
+
+SUM_REQUEST = struct.Struct("<III")
+SUM_READ_WRITE_REQUEST = struct.Struct("<IIII")
+SUM_READ_WRITE_RESULT = struct.Struct("<II")
+
 
 class AMSNetIDFormatError(Exception):
     """Custom exception for invalid AMS Net ID format."""
@@ -59,10 +143,196 @@ def id_generator(prefix: str = "instance"):
         counter += 1
 
 
+def _idle_check(connection_ref: weakref.ref):
+    """Timer callback closing a connection once it has been idle long enough."""
+    connection = connection_ref()
+    if connection is not None:
+        connection._idle_check()
+
+
+class SumResult(dict):
+    """
+    Values returned by a sum read, keyed by variable name.
+    Variables whose sub-command failed are left out and their ADS error codes are
+    kept in ``errors`` instead.
+    """
+
+    def __init__(self, values: dict = None, errors: dict = None):
+        super().__init__(values or {})
+        self.errors = errors or {}
+
+
+def _sum_sizes(index_group: int, request: tuple) -> tuple:
+    """Return the request and response bytes taken by one sum sub-command."""
+    if index_group == ADSIGRP_SUMUP_READ:
+        return SUM_REQUEST.size, 4 + request[2]
+    if index_group == ADSIGRP_SUMUP_WRITE:
+        return SUM_REQUEST.size + len(request[2]), 4
+    return (
+        SUM_READ_WRITE_REQUEST.size + len(request[3]),
+        SUM_READ_WRITE_RESULT.size + request[2],
+    )
+
+
+def chunk_sum_requests(
+    index_group: int, requests: list, max_sub_commands: int, max_payload: int
+) -> list:
+    """
+    Split sum sub-commands into chunks of at most ``max_sub_commands`` requests whose
+    request and response data each fit in ``max_payload`` bytes. A sub-command larger
+    than ``max_payload`` on its own is sent in a chunk by itself.
+    """
+    chunks, chunk = [], []
+    request_bytes = response_bytes = 0
+    for request in requests:
+        request_size, response_size = _sum_sizes(index_group, request)
+        if chunk and (
+            len(chunk) >= max_sub_commands
+            or request_bytes + request_size > max_payload
+            or response_bytes + response_size > max_payload
+        ):
+            chunks.append(chunk)
+            chunk, request_bytes, response_bytes = [], 0, 0
+        chunk.append(request)
+        request_bytes += request_size
+        response_bytes += response_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def pack_sum_request(index_group: int, requests: list) -> tuple:
+    """Return the data of a sum command and the length of its response."""
+    if index_group == ADSIGRP_SUMUP_READ:
+        data = b"".join(SUM_REQUEST.pack(*request) for request in requests)
+        return data, sum(4 + length for _, _, length in requests)
+    if index_group == ADSIGRP_SUMUP_WRITE:
+        data = b"".join(
+            SUM_REQUEST.pack(group, offset, len(value))
+            for group, offset, value in requests
+        ) + b"".join(value for _, _, value in requests)
+        return data, 4 * len(requests)
+    data = b"".join(
+        SUM_READ_WRITE_REQUEST.pack(group, offset, read_length, len(value))
+        for group, offset, read_length, value in requests
+    ) + b"".join(value for _, _, _, value in requests)
+    return data, sum(
+        SUM_READ_WRITE_RESULT.size + read_length for _, _, read_length, _ in requests
+    )
+
+
+def unpack_sum_response(index_group: int, requests: list, data: bytes) -> list:
+    """Return an (error code, data) tuple for every sub-command of a sum command."""
+    data = memoryview(data)
+    count = len(requests)
+    if index_group == ADSIGRP_SUMUP_WRITE:
+        return [(error, b"") for error in struct.unpack_from(f"<{count}I", data)]
+    if index_group == ADSIGRP_SUMUP_READ:
+        errors = struct.unpack_from(f"<{count}I", data)
+        lengths = [length for _, _, length in requests]
+        offset = 4 * count
+    else:
+        results = [
+            SUM_READ_WRITE_RESULT.unpack_from(data, SUM_READ_WRITE_RESULT.size * i)
+            for i in range(count)
+        ]
+        errors = [error for error, _ in results]
+        lengths = [length for _, length in results]
+        offset = SUM_READ_WRITE_RESULT.size * count
+    results = []
+    for error, length in zip(errors, lengths):
+        results.append((error, bytes(data[offset : offset + length])))
+        offset += length
+    return results
+
+
+def _sum_read_requests(symbol_infos: dict) -> list:
+    return [(info.iGroup, info.iOffs, info.size) for info in symbol_infos.values()]
+
+
+def _sum_read_result(symbol_infos: dict, results: list, errors: dict) -> SumResult:
+    result = SumResult(errors=dict(errors))
+    for (data_name, info), (error, data) in zip(symbol_infos.items(), results):
+        if error:
+            result.errors[data_name] = error
+            continue
+        plc_datatype = plc_datatype_from_symbol(info)
+        # Variables of types without a PLCTYPE, such as structures, are returned raw
+        result[data_name] = (
+            data if plc_datatype is None else decode_value(data, plc_datatype)
+        )
+    return result
+
+
+def _sum_write_requests(symbol_infos: dict, variables: dict) -> list:
+    requests = []
+    for data_name, info in symbol_infos.items():
+        plc_datatype = plc_datatype_from_symbol(info)
+        value = variables[data_name]
+        if plc_datatype is None and not isinstance(value, (bytes, bytearray)):
+            raise TypeError(
+                f"Unsupported PLC type '{info.symbol_type}' of {data_name}, write it as bytes"
+            )
+        requests.append(
+            (
+                info.iGroup,
+                info.iOffs,
+                encode_value(value, plc_datatype, size=info.size),
+            )
+        )
+    return requests
+
+
+def _sum_write_result(symbol_infos: dict, results: list, errors: dict) -> dict:
+    errors = dict(errors)
+    errors.update(
+        (data_name, error)
+        for data_name, (error, _) in zip(symbol_infos, results)
+        if error
+    )
+    return errors
+
+
+def _name_list(data_names: Union[str, list, tuple, set]) -> list:
+    return [data_names] if isinstance(data_names, str) else list(data_names)
+
+
+def _known_size(plc_datatype) -> int:
+    """Return the size of a PLC type, or 0 for strings and when no type is given."""
+    if plc_datatype is None:
+        return 0
+    if type_is_string(plc_datatype) or type_is_wstring(plc_datatype):
+        return 0
+    return sizeof(plc_datatype)
+
+
+def _check_array_size(data_name: str, size: int, symbol_size: int, partial: bool):
+    """Raise ValueError unless an array of ``size`` bytes fits the variable it is for."""
+    if size == symbol_size or (partial and size < symbol_size):
+        return
+    raise ValueError(
+        f"Array of {size} bytes does not match the {symbol_size} bytes of {data_name}"
+    )
+
+
+@lru_cache(maxsize=128)
+def _raw_buffer_type(length: int) -> type:
+    """Return a ctypes structure holding ``length`` raw bytes."""
+    return type(
+        f"RawBuffer{length}",
+        (Structure,),
+        {"_pack_": 1, "_fields_": [("data", c_ubyte * length)]},
+    )
+
+
 class ADSConnection(pyads.Connection):
-    """Class to manage an ADS client connection"""
+    """
+    Class to manage an ADS client connection, shared by reference-counted sessions
+    that keep the port open until it has been idle for ``idle_timeout`` seconds.
+    """
 
     connection_id = id_generator("ads_connection")
+    subscription_tokens = itertools.count(1)
 
     # Class-level metrics to be shared across instances
     open_events = Counter(
@@ -75,6 +345,11 @@ class ADSConnection(pyads.Connection):
         documentation="Number of times the connection was closed",
         labelnames=["ams_net_id"],
     )
+    reconnect_events = Counter(
+        name="ads_client_connection_reconnect_events",
+        documentation="Number of times the connection was forcibly reconnected",
+        labelnames=["ams_net_id"],
+    )
     write_events = Counter(
         name="ads_client_connection_write_events",
         documentation="Number of times a variable was written",
@@ -85,6 +360,54 @@ class ADSConnection(pyads.Connection):
         documentation="Number of times a variable was read",
         labelnames=["ams_net_id"],
     )
+    operation_duration = Histogram(
+        name="ads_client_connection_operation_duration_seconds",
+        documentation="Duration of read and write operations, including encoding and decoding",
+        labelnames=["ams_net_id", "operation"],
+        buckets=LATENCY_BUCKETS,
+    )
+    request_duration = Histogram(
+        name="ads_client_connection_request_duration_seconds",
+        documentation="Round-trip time of ADS requests to the target",
+        labelnames=["ams_net_id"],
+        buckets=LATENCY_BUCKETS,
+    )
+    batch_size = Histogram(
+        name="ads_client_connection_batch_size",
+        documentation="Number of variables read or written by a sum command",
+        labelnames=["ams_net_id", "operation"],
+        buckets=BATCH_SIZE_BUCKETS,
+    )
+    bytes_sent = Counter(
+        name="ads_client_connection_bytes_sent",
+        documentation="Payload bytes sent to the target",
+        labelnames=["ams_net_id"],
+    )
+    bytes_received = Counter(
+        name="ads_client_connection_bytes_received",
+        documentation="Payload bytes received from the target",
+        labelnames=["ams_net_id"],
+    )
+    verified_writes = Counter(
+        name="ads_client_connection_verified_writes",
+        documentation="Number of written variables read back for verification",
+        labelnames=["ams_net_id"],
+    )
+    verification_mismatches = Counter(
+        name="ads_client_connection_verification_mismatches",
+        documentation="Number of written variables whose value read back differed",
+        labelnames=["ams_net_id"],
+    )
+    errors = Counter(
+        name="ads_client_connection_errors",
+        documentation="Number of failed operations by ADS error code",
+        labelnames=["ams_net_id", "error_code"],
+    )
+    stream_overflows = Counter(
+        name="ads_client_connection_stream_overflows",
+        documentation="Number of snapshots dropped or coalesced as a stream consumer fell behind",
+        labelnames=["ams_net_id", "overflow"],
+    )
 
     def __init__(
         self,
@@ -94,7 +417,43 @@ class ADSConnection(pyads.Connection):
         name: str = None,
         verify_is_open: bool = False,
         retain_connection: bool = False,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        backend: str = BACKEND_PYADS,
+        transport_options: dict = None,
+        max_sum_sub_commands: int = pyads.constants.MAX_ADS_SUB_COMMANDS,
+        max_sum_payload: int = DEFAULT_MAX_SUM_PAYLOAD,
+        symbol_version_check_interval: float = 1.0,
+        symbol_index: SymbolIndex = None,
+        write_verifier: WriteVerifier = None,
+        value_cache_ttls: dict = None,
+        value_cache_size: int = DEFAULT_VALUE_CACHE_SIZE,
+        serialize_requests: bool = False,
     ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+        # Guards the port, the session count and the idle timer
+        self._lock = threading.RLock()
+        # Guards the cached handles and the symbol version check
+        self._symbol_lock = threading.RLock()
+        self._request_lock = nullcontext()
+        if serialize_requests:
+            if backend == BACKEND_ASYNCIO:
+                # The transport serialises requests itself, also across coroutines
+                transport_options = {**(transport_options or {}), "max_in_flight": 1}
+            else:
+                self._request_lock = threading.RLock()
+        self._session_depth = 0
+        self._last_activity = time.monotonic()
+        self._idle_timer = None
+        self._close_requested = False
+        self._executor = None
+        # Subscribers of each variable by token, as (callback, trans_mode, max_delay, cycle_time)
+        self._notifications: dict[str, dict[int, tuple]] = {}
+        self._notification_handles: dict[str, int] = {}
+        self.idle_timeout = idle_timeout
+        # Counts forced reconnects, so clients sharing the connection reconnect it once
+        self.reconnect_generation = 0
+
         if name:
             self.name = name
         else:
@@ -113,6 +472,26 @@ class ADSConnection(pyads.Connection):
             ams_net_id=ams_net_id, ams_net_port=ams_net_port, ip_address=ip_address
         )
 
+        self.symbol_cache = SymbolCache(
+            ams_net_id,
+            symbol_infos=self._symbol_info_cache,
+            version_check_interval=symbol_version_check_interval,
+        )
+        self.symbol_index = symbol_index
+        self.write_verifier = write_verifier or WriteVerifier()
+        self.value_cache = ValueCache(ams_net_id, value_cache_ttls, value_cache_size)
+        self.max_sum_sub_commands = max_sum_sub_commands
+        self.max_sum_payload = max_sum_payload
+        self.backend = backend
+        self._transport = None
+        if backend == BACKEND_ASYNCIO:
+            self._transport = AsyncADSTransport(
+                ams_net_id=ams_net_id,
+                ams_net_port=ams_net_port,
+                ip_address=self.ip_address,
+                **(transport_options or {}),
+            )
+
         self.retain_connection = retain_connection
         if retain_connection:
             logger.warning(
@@ -124,28 +503,117 @@ class ADSConnection(pyads.Connection):
         if verify_is_open:
             self._ensure_open()
 
+    def __enter__(self):
+        """Open the connection and start a session."""
+        with self._lock:
+            self.open()
+            self._session_depth += 1
+        return self
+
+    def __exit__(self, _type, _val, _traceback):
+        """End a session, closing the connection once the last session has been idle."""
+        with self._lock:
+            self._session_depth -= 1
+            self._last_activity = time.monotonic()
+            if self._session_depth > 0 or self.retain_connection or self._notifications:
+                return
+            if self.idle_timeout and not self._close_requested:
+                self._schedule_idle_check(self.idle_timeout)
+            else:
+                self._close()
+
+    @property
+    def session_depth(self) -> int:
+        """Return the number of sessions currently using the connection."""
+        return self._session_depth
+
+    def _schedule_idle_check(self, delay: float):
+        # A single pending timer is re-armed on expiry rather than restarted on every
+        # session, so polling loops do not spawn a thread per call
+        if self._idle_timer is not None:
+            return
+        self._idle_timer = threading.Timer(
+            delay, _idle_check, args=(weakref.ref(self),)
+        )
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _idle_check(self):
+        with self._lock:
+            self._idle_timer = None
+            if (
+                self._session_depth > 0
+                or self.retain_connection
+                or self._notifications
+                or not self.is_open
+            ):
+                return
+            remaining = self._last_activity + self.idle_timeout - time.monotonic()
+            if remaining > 0:
+                self._schedule_idle_check(remaining)
+                return
+            logger.debug(
+                f"Connection {self.name} idle for {self.idle_timeout}s, closing"
+            )
+            self._close()
+
     def _ensure_open(self):
         """Ensure the connection is open using a context manager."""
         if not self.is_open:
             with self:
                 assert self.is_open
 
+    # Metrics
+    # ################################################################################################
+
+    @contextmanager
+    def _measure(self, operation: str, reads: int = 0, writes: int = 0):
+        """Time an operation and count its variables, or its ADS error if it fails."""
+        with self._request_lock:
+            started = time.perf_counter()
+            try:
+                yield
+            except pyads.ADSError as e:
+                self.errors.labels(self.ams_net_id, error_code_label(e)).inc()
+                raise
+            finally:
+                self.operation_duration.labels(self.ams_net_id, operation).observe(
+                    time.perf_counter() - started
+                )
+        if reads:
+            self.read_events.labels(self.ams_net_id).inc(reads)
+        if writes:
+            self.write_events.labels(self.ams_net_id).inc(writes)
+
+    def _observe_request(self, started: float, sent: int = 0, received: int = 0):
+        """Record the round trip of an ADS request started at ``time.perf_counter()``."""
+        self.request_duration.labels(self.ams_net_id).observe(
+            time.perf_counter() - started
+        )
+        if sent:
+            self.bytes_sent.labels(self.ams_net_id).inc(sent)
+        if received:
+            self.bytes_received.labels(self.ams_net_id).inc(received)
+
     def write_by_name(
         self,
         data_name: str,
         value: Any,
         plc_datatype=None,
         handle=None,
-        verify: bool = False,
+        verify: Union[bool, WriteVerifier] = False,
         cache_symbol_info: bool = True,
     ) -> None:
         """Write a value to a PLC variable."""
-        with self:  # Using context manager to ensure connection is open
-            super().write_by_name(
-                data_name, value, plc_datatype, handle, cache_symbol_info
+        with self, self._measure("write_by_name", writes=1):
+            self._write_by_name(
+                data_name,
+                value,
+                plc_datatype,
+                handle=handle,
+                cache_symbol_info=cache_symbol_info,
             )
-            if verify:
-                assert super().read_by_name(data_name) == value
+            self._verify(verify, {data_name: value}, {data_name: plc_datatype})
 
     def read_by_name(
         self,
@@ -156,87 +624,168 @@ class ADSConnection(pyads.Connection):
         cache_symbol_info: bool = True,
     ) -> Any:
         """Read a PLC variable by name."""
-        with self:
+        value = self.value_cache.get(data_name, plc_datatype)
+        if value is not MISSING:
+            return value
+        with self, self._measure("read_by_name", reads=1):
             try:
-                return super().read_by_name(
+                value = self._read_by_name(
                     data_name,
                     plc_datatype=plc_datatype,
                     handle=handle,
                     check_length=check_length,
                     cache_symbol_info=cache_symbol_info,
                 )
+                self.value_cache.put(data_name, value, plc_datatype)
+                return value
             except TypeError:
                 logger.warning(
                     f"Variable {data_name} does not have a type declared in PLC. Ignoring read operation."
                 )
 
     def write_array_by_name(
-        self, data_name: str, value: Any, plc_datatype=None, verify: bool = False
+        self,
+        data_name: str,
+        value: Any,
+        plc_datatype=None,
+        verify: Union[bool, WriteVerifier] = False,
+        partial: bool = True,
     ) -> None:
-        """Write an array to a PLC variable."""
-        if plc_datatype is None:
-            logger.warning("No PLC datatype provided, defaulting to LREAL")
-            plc_datatype = pyads.PLCTYPE_LREAL
+        """
+        Write an array to a PLC variable.
+        Elements are converted to ``plc_datatype``, or to the element type of the
+        symbol if it is not given. Buffer-protocol objects, such as NumPy arrays, are
+        converted as a whole rather than element by element, while bytes are written
+        as they are. A shorter array is written to the start of the variable, and
+        ValueError is raised if the array is larger than the variable, or without
+        ``partial`` if it does not fill the variable exactly.
+        """
         with self:
-            super().write_by_name(
-                data_name, value, plc_datatype=plc_datatype * len(value)
-            )
-            if verify:
-                assert (
-                    super().read_by_name(
-                        data_name,
-                        plc_datatype=(
-                            plc_datatype * len(value) if plc_datatype else None
-                        ),
-                    )
-                    == value
+            info = self._symbol_infos([data_name])[data_name]
+            if plc_datatype is None:
+                plc_datatype = element_datatype(plc_datatype_from_symbol(info))
+            if supports_buffer(value):
+                return self._write_array_buffer(
+                    data_name,
+                    info,
+                    buffer_from_array(value, plc_datatype),
+                    verify,
+                    partial,
+                )
+            if plc_datatype is None:
+                raise TypeError(
+                    f"Unsupported PLC type '{info.symbol_type}' of {data_name}"
                 )
+            array_datatype = plc_datatype * len(value)
+            _check_array_size(data_name, sizeof(array_datatype), info.size, partial)
+            with self._measure("write_array_by_name", writes=1):
+                self._write_by_name(data_name, value, array_datatype)
+            self._verify(verify, {data_name: value}, {data_name: array_datatype})
 
     def write_list_array_by_name(
-        self, variables: dict, plc_datatype=None, verify: bool = False
+        self,
+        variables: dict,
+        plc_datatype=None,
+        verify: Union[bool, WriteVerifier] = False,
     ) -> None:
-        """Write multiple arrays to PLC variables."""
-        if plc_datatype is None:
-            logger.warning("No PLC datatype provided, defaulting to LREAL")
-            plc_datatype = pyads.PLCTYPE_LREAL
+        """
+        Write multiple arrays to PLC variables, verifying them with one read.
+        Elements are converted as by `write_array_by_name`.
+        """
         with self:
             for data_name, value in variables.items():
-                self.write_array_by_name(
-                    data_name, value, plc_datatype=plc_datatype, verify=verify
+                self.write_array_by_name(data_name, value, plc_datatype=plc_datatype)
+            if not verify:
+                return
+            infos = self._symbol_infos(list(variables))
+            written, plc_datatypes = {}, {}
+            for data_name, value in variables.items():
+                datatype = plc_datatype or element_datatype(
+                    plc_datatype_from_symbol(infos[data_name])
                 )
+                if supports_buffer(value):
+                    # Buffers are compared as the bytes they were written as
+                    written[data_name] = buffer_from_array(value, datatype)
+                else:
+                    written[data_name] = value
+                    plc_datatypes[data_name] = datatype * len(value)
+            self._verify(verify, written, plc_datatypes)
 
-    def write_list_by_name(self, variables: dict, verify: bool = False) -> None:
-        """Write multiple values to PLC variables."""
-        with self:
-            super().write_list_by_name(variables)
-            if verify:
-                assert super().read_list_by_name(variables) == variables
-
-    def read_by_name(self, data_name: str, plc_datatype=None) -> Any:
-        """Read a PLC variable by name."""
+    def write_list_by_name(
+        self, variables: dict, verify: Union[bool, WriteVerifier] = False
+    ) -> dict:
+        """
+        Write multiple values to PLC variables with sum write commands.
+        Return the ADS error codes of variables that could not be written.
+        """
         with self:
+            errors = self.sum_write(variables)
+            # Variables that could not be written are already reported
             try:
-                return super().read_by_name(data_name, plc_datatype=plc_datatype)
-            except TypeError:
-                logger.warning(
-                    f"Variable {data_name} does not have a type declared in PLC. Ignoring read operation."
+                self._verify(
+                    verify,
+                    {
+                        data_name: value
+                        for data_name, value in variables.items()
+                        if data_name not in errors
+                    },
                 )
+            except WriteVerificationError as e:
+                e.write_errors.update(errors)
+                raise
+            return errors
 
-    def read_array_by_name(self, data_name: str, plc_datatype=None, array_size=1):
-        """Read an array from a PLC variable."""
-        with self:
-            return super().read_by_name(
+    def read_array_by_name(
+        self, data_name: str, plc_datatype=None, array_size=1, as_numpy: bool = False
+    ):
+        """
+        Read an array from a PLC variable.
+        With ``as_numpy`` an ndarray viewing the received buffer is returned instead of
+        a list, with its dtype taken from the PLC type.
+        """
+        if as_numpy:
+            return self._read_array_buffer(data_name, plc_datatype, array_size)
+        with self, self._measure("read_array_by_name", reads=1):
+            return self._read_by_name(
                 data_name,
                 plc_datatype=plc_datatype * array_size if plc_datatype else None,
             )
 
+    def _read_array_buffer(self, data_name: str, plc_datatype=None, array_size=1):
+        with self, self._measure("read_array_by_name", reads=1):
+            info = self._symbol_infos([data_name])[data_name]
+            if plc_datatype is None:
+                plc_datatype = self._symbol_datatype(data_name, info)
+                length = info.size
+            else:
+                length = numpy_dtype(plc_datatype).itemsize * array_size
+            return array_from_buffer(
+                self._read_buffer(info.iGroup, info.iOffs, length), plc_datatype
+            )
+
+    def _write_array_buffer(
+        self,
+        data_name: str,
+        info: SAdsSymbolEntry,
+        data: memoryview,
+        verify=False,
+        partial=True,
+    ) -> None:
+        _check_array_size(data_name, len(data), info.size, partial)
+        with self._measure("write_array_by_name", writes=1):
+            try:
+                self._write_bytes(info.iGroup, info.iOffs, data)
+            finally:
+                self.value_cache.invalidate([data_name])
+        self._verify(verify, {data_name: data})
+
     def read_list_array_by_name(
         self, data_names: Union[str, list, tuple, set], plc_datatype=None, array_size=1
     ):
         """Read multiple PLC variables by their names."""
         with self:
             return {
-                data_name: super().read_by_name(
+                data_name: self._read_by_name(
                     data_names,
                     plc_datatype=plc_datatype * array_size if plc_datatype else None,
                     check_length=False,
@@ -244,10 +793,43 @@ class ADSConnection(pyads.Connection):
                 for data_name in data_names
             }
 
-    def read_list_by_name(self, data_names: Union[str, list, tuple, set]):
-        """Read multiple PLC variables by their names."""
-        with self:
-            return super().read_list_by_name(data_names)
+    def read_list_by_name(self, data_names: Union[str, list, tuple, set]) -> SumResult:
+        """Read multiple PLC variables by their names with sum read commands."""
+        data_names = _name_list(data_names)
+        cached, data_names_to_read = self._cached_values(data_names)
+        if not data_names_to_read:
+            return self._merge_cached(data_names, cached, SumResult())
+        return self._merge_cached(data_names, cached, self.sum_read(data_names_to_read))
+
+    def _cached_values(self, data_names: list) -> tuple[dict, list]:
+        """Split variables into those with a fresh cached value and those to read."""
+        if not self.value_cache.enabled:
+            return {}, data_names
+        cached = {}
+        data_names_to_read = []
+        for data_name in data_names:
+            value = self.value_cache.get(data_name)
+            if value is MISSING:
+                data_names_to_read.append(data_name)
+            else:
+                cached[data_name] = value
+        return cached, data_names_to_read
+
+    def _merge_cached(self, data_names: list, cached: dict, result: SumResult):
+        """Cache the values read and merge in the cached values, in request order."""
+        if not self.value_cache.enabled:
+            return result
+        for data_name, value in result.items():
+            self.value_cache.put(data_name, value)
+        if not cached:
+            return result
+        merged = SumResult(errors=result.errors)
+        for data_name in data_names:
+            if data_name in cached:
+                merged[data_name] = cached[data_name]
+            elif data_name in result:
+                merged[data_name] = result[data_name]
+        return merged
 
     def read_errors(self, data_name: str, number_of_errors=1):
         """Read error messages."""
@@ -257,61 +839,1119 @@ class ADSConnection(pyads.Connection):
             )
         )
 
+    def read_structure_by_name(
+        self, data_name: str, structure_def: tuple, array_size=1, pack_mode: int = None
+    ) -> Union[dict, list]:
+        """
+        Read a structure, or an array of structures, from a PLC variable.
+        The layout follows the {attribute 'pack_mode'} of the structure in the PLC,
+        detected from the size of the symbol unless ``pack_mode`` is given.
+        """
+        with self, self._measure("read_structure_by_name", reads=1):
+            info = self._symbol_infos([data_name])[data_name]
+            codec = get_symbol_structure_codec(
+                structure_def, info.size, array_size, pack_mode
+            )
+            data = self._read_buffer(info.iGroup, info.iOffs, codec.size * array_size)
+            return codec.decode(data, array_size)
+
     def write_structure_by_name(
-        self, data_name: str, value: dict, structure_def: tuple, array_size=1
+        self,
+        data_name: str,
+        value: Union[str, dict, list],
+        structure_def: tuple,
+        array_size=1,
+        pack_mode: int = None,
     ):
-        """Write a structure to a PLC variable."""
-        with self:
-            super().write_structure_by_name(
-                data_name, json.loads(value), structure_def, array_size=array_size
+        """
+        Write a structure, or an array of structures, given as JSON or python values.
+        The layout is chosen as by `read_structure_by_name`.
+        """
+        if isinstance(value, str):
+            value = json.loads(value)
+        with self, self._measure("write_structure_by_name", writes=1):
+            info = self._symbol_infos([data_name])[data_name]
+            codec = get_symbol_structure_codec(
+                structure_def, info.size, array_size, pack_mode
             )
+            data = codec.encode(value, array_size)
+            try:
+                self._write_bytes(info.iGroup, info.iOffs, data)
+            finally:
+                self.value_cache.invalidate([data_name])
 
     def read_device_info(self):
         """Read device information."""
         with self:
+            if self._transport is not None:
+                return self._run_transport(self._transport.read_device_info())
             return super().read_device_info()
 
+    def read_state(self):
+        """Read the ADS state and device state."""
+        with self:
+            if self._transport is not None:
+                return self._run_transport(self._transport.read_state())
+            return super().read_state()
+
+    # Write verification
+    # ################################################################################################
+
+    def verify_writes(
+        self,
+        variables: dict,
+        plc_datatypes: dict = None,
+        verifier: WriteVerifier = None,
+    ) -> VerificationReport:
+        """
+        Read written variables back with one sum read and compare them with the values
+        written. Values are decoded with their type in ``plc_datatypes`` or else their
+        symbol type, and bytes-like values are compared as raw bytes.
+        """
+        verifier = verifier or self.write_verifier
+        plc_datatypes = plc_datatypes or {}
+        with self:
+            symbol_infos = self._symbol_infos(list(variables))
+            requests, datatypes = [], {}
+            for data_name, info in symbol_infos.items():
+                value = variables[data_name]
+                if isinstance(value, (bytes, bytearray, memoryview)):
+                    datatypes[data_name] = None
+                    size = memoryview(value).nbytes
+                else:
+                    datatypes[data_name] = self._symbol_datatype(
+                        data_name, info, plc_datatypes.get(data_name)
+                    )
+                    size = self._datatype_size(info, datatypes[data_name])
+                requests.append((info.iGroup, info.iOffs, size))
+            results = self._sum_command(ADSIGRP_SUMUP_READ, requests)
+        read_values, errors = {}, {}
+        for (data_name, plc_datatype), (error, data) in zip(datatypes.items(), results):
+            if error:
+                errors[data_name] = error
+            elif plc_datatype is None:
+                read_values[data_name] = bytes(data)
+            else:
+                read_values[data_name] = decode_value(data, plc_datatype)
+        report = verifier.compare(variables, read_values, errors, datatypes)
+        self.verified_writes.labels(self.ams_net_id).inc(report.checked)
+        if report.mismatches:
+            self.verification_mismatches.labels(self.ams_net_id).inc(
+                len(report.mismatches)
+            )
+        return report
+
+    def _verify(
+        self,
+        verify: Union[bool, WriteVerifier],
+        variables: dict,
+        plc_datatypes: dict = None,
+    ):
+        """Verify written variables if due, raising if they were not written as given."""
+        if not verify or not variables:
+            return
+        verifier = verify if isinstance(verify, WriteVerifier) else self.write_verifier
+        if not verifier.due():
+            return
+        report = self.verify_writes(variables, plc_datatypes, verifier)
+        if not report.ok:
+            raise WriteVerificationError(report)
+
+    # Backend dispatch
+    # ################################################################################################
+
+    def _read_by_name(
+        self, data_name: str, plc_datatype=None, handle=None, **kwargs
+    ) -> Any:
+        if self._transport is not None:
+            return self._run_transport(
+                self._transport_read_by_name(data_name, plc_datatype)
+            )
+        read = partial(
+            super().read_by_name, data_name, plc_datatype=plc_datatype, **kwargs
+        )
+        started = time.perf_counter()
+        if handle is not None:
+            value = read(handle=handle)
+        else:
+            value = self._with_cached_handle(data_name, read)
+        self._observe_request(
+            started, received=self._request_size(data_name, plc_datatype)
+        )
+        return value
+
+    def _write_by_name(
+        self, data_name: str, value: Any, plc_datatype=None, handle=None, **kwargs
+    ):
+        # Cached values are dropped once written, so that a read racing the write
+        # cannot cache the previous value again
+        try:
+            if self._transport is not None:
+                return self._run_transport(
+                    self._transport_write_by_name(data_name, value, plc_datatype)
+                )
+            write = partial(
+                super().write_by_name, data_name, value, plc_datatype, **kwargs
+            )
+            started = time.perf_counter()
+            if handle is not None:
+                write(handle=handle)
+            else:
+                self._with_cached_handle(data_name, write)
+            self._observe_request(
+                started, sent=self._request_size(data_name, plc_datatype)
+            )
+        finally:
+            self.value_cache.invalidate([data_name])
+
+    def _request_size(self, data_name: str, plc_datatype=None) -> int:
+        """
+        Return the bytes read or written by name, taken from the symbol information
+        if the variable has no fixed-size type, such as when no type was given.
+        """
+        size = _known_size(plc_datatype)
+        if size:
+            return size
+        try:
+            return self._symbol_infos([data_name])[data_name].size
+        except pyads.ADSError as e:
+            logger.debug(f"Unable to get the size of {data_name}: {e}")
+            return 0
+
+    def _symbol_infos(self, data_names: list) -> dict:
+        if self._transport is not None:
+            return self._run_transport(self._transport_symbol_infos(data_names))
+        self._check_symbol_version()
+        symbol_infos = {}
+        for data_name in data_names:
+            info = self.symbol_cache.symbol_info(data_name)
+            if info is None:
+                info = adsGetSymbolInfo(self._port, self._adr, data_name)
+                self.symbol_cache.symbol_infos[data_name] = info
+            symbol_infos[data_name] = info
+        return symbol_infos
+
+    def _sum_symbol_infos(self, data_names: list) -> tuple[dict, dict]:
+        """
+        Return the symbol information of the variables of a sum command and the ADS
+        error codes of those that could not be looked up, such as unknown names.
+        """
+        if self._transport is not None:
+            return self._run_transport(self._transport_sum_symbol_infos(data_names))
+        symbol_infos, errors = {}, {}
+        for data_name in data_names:
+            try:
+                symbol_infos.update(self._symbol_infos([data_name]))
+            except pyads.ADSError as e:
+                # A lost connection fails the whole command rather than each variable
+                if is_transport_error(e):
+                    raise
+                errors[data_name] = e.err_code
+        return symbol_infos, errors
+
+    # Symbol cache
+    # ################################################################################################
+
+    def _check_symbol_version(self):
+        """Read the symbol version if due and drop the cache if it changed."""
+        if not self.symbol_cache.version_check_due:
+            return
+        if self._transport is not None:
+            return self._run_transport(self._transport_check_symbol_version())
+        with self._symbol_lock:
+            # Another thread may have checked it while this one waited
+            if not self.symbol_cache.version_check_due:
+                return
+            try:
+                version = super().read(
+                    pyads.constants.ADSIGRP_SYM_VERSION, 0, pyads.PLCTYPE_BYTE
+                )
+            except pyads.ADSError as e:
+                logger.debug(f"Unable to read symbol version of {self.ams_net_id}: {e}")
+                version = self.symbol_cache.version
+            self._release_handles(self.symbol_cache.update_version(version))
+
+    def _symbol_handle(self, data_name: str) -> int:
+        handle = self.symbol_cache.handle(data_name)
+        if handle is None:
+            # Threads missing the same handle would otherwise each get one and leak all
+            # but the last
+            with self._symbol_lock:
+                handle = self.symbol_cache.handles.get(data_name)
+                if handle is None:
+                    handle = adsGetHandle(self._port, self._adr, data_name)
+                    self.symbol_cache.handles[data_name] = handle
+        return handle
+
+    def _with_cached_handle(self, data_name: str, operation) -> Any:
+        """
+        Call ``operation`` with the cached handle of a variable. If the target reports
+        the handle stale the cache is cleared and the operation retried once.
+        """
+        self._check_symbol_version()
+        handle = self._symbol_handle(data_name)
+        try:
+            return operation(handle=handle)
+        except pyads.ADSError as e:
+            if e.err_code not in STALE_SYMBOL_ERRORS:
+                raise
+            logger.info(f"Handle of {data_name} is stale ({e}), clearing symbol cache")
+            with self._symbol_lock:
+                self._release_handles(self.symbol_cache.invalidate())
+            return operation(handle=self._symbol_handle(data_name))
+
+    def _release_handles(self, handles: list):
+        """Release handles with a single sum write, or one by one if that fails."""
+        if not handles or not self.is_open:
+            return
+        requests = [
+            (pyads.constants.ADSIGRP_SYM_RELEASEHND, 0, struct.pack("<I", handle))
+            for handle in handles
+        ]
+        try:
+            self._sum_command(ADSIGRP_SUMUP_WRITE, requests)
+        except pyads.ADSError as e:
+            logger.debug(f"Sum release of {len(handles)} handles failed: {e}")
+            for handle in handles:
+                try:
+                    adsReleaseHandle(self._port, self._adr, handle)
+                except pyads.ADSError:
+                    pass
+
+    def _read_bytes(self, index_group: int, index_offset: int, length: int) -> bytes:
+        return bytes(self._read_buffer(index_group, index_offset, length))
+
+    def _read_buffer(
+        self, index_group: int, index_offset: int, length: int
+    ) -> Union[bytes, memoryview]:
+        """Read raw bytes, returning a view of the response buffer where possible."""
+        if not length:
+            return b""
+        started = time.perf_counter()
+        if self._transport is not None:
+            data = self._run_transport(
+                self._transport.read(index_group, index_offset, length)
+            )
+        else:
+            data = memoryview(
+                super().read(
+                    index_group,
+                    index_offset,
+                    c_ubyte * length,
+                    return_ctypes=True,
+                    check_length=False,
+                )
+            ).cast("B")
+        self._observe_request(started, received=len(data))
+        return data
+
+    def _write_bytes(self, index_group: int, index_offset: int, data: bytes):
+        started = time.perf_counter()
+        if self._transport is not None:
+            self._run_transport(self._transport.write(index_group, index_offset, data))
+        else:
+            # A raw buffer type keeps pyads from converting an array element by element
+            buffer_type = _raw_buffer_type(len(data))
+            super().write(
+                index_group,
+                index_offset,
+                buffer_type.from_buffer_copy(data),
+                buffer_type,
+            )
+        self._observe_request(started, sent=len(data))
+
+    def _read_write_bytes(
+        self, index_group: int, index_offset: int, read_length: int, data: bytes
+    ) -> bytes:
+        # pyads expects sum reads and writes in the types its own sum commands use
+        if index_group == ADSIGRP_SUMUP_READ:
+            value = (SAdsSumRequest * index_offset).from_buffer_copy(data)
+            write_datatype = None
+        elif index_group == ADSIGRP_SUMUP_WRITE:
+            value = bytearray(data)
+            write_datatype = None
+        else:
+            value = (c_ubyte * len(data)).from_buffer_copy(data)
+            write_datatype = type(value)
+        started = time.perf_counter()
+        response = adsSyncReadWriteReqEx2(
+            self._port,
+            self._adr,
+            index_group,
+            index_offset,
+            c_ubyte * read_length,
+            value,
+            write_datatype,
+            return_ctypes=True,
+            check_length=False,
+        )
+        self._observe_request(started, sent=len(data), received=read_length)
+        return bytes(response)
+
+    # Sum commands
+    # ################################################################################################
+
+    def sum_read(self, data_names: Union[str, list, tuple, set]) -> SumResult:
+        """
+        Read PLC variables with sum read commands (0xF080).
+        Variables that cannot be read are reported in the ``errors`` of the result
+        rather than failing the whole read.
+        """
+        data_names = _name_list(data_names)
+        with self, self._measure("sum_read", reads=len(data_names)):
+            self.batch_size.labels(self.ams_net_id, "sum_read").observe(len(data_names))
+            symbol_infos, errors = self._sum_symbol_infos(data_names)
+            results = self._sum_command(
+                ADSIGRP_SUMUP_READ, _sum_read_requests(symbol_infos)
+            )
+            return _sum_read_result(symbol_infos, results, errors)
+
+    def sum_write(self, variables: dict) -> dict:
+        """
+        Write PLC variables with sum write commands (0xF081).
+        Return the ADS error codes of variables that could not be written.
+        """
+        with self, self._measure("sum_write", writes=len(variables)):
+            self.batch_size.labels(self.ams_net_id, "sum_write").observe(len(variables))
+            symbol_infos, errors = self._sum_symbol_infos(list(variables))
+            try:
+                results = self._sum_command(
+                    ADSIGRP_SUMUP_WRITE, _sum_write_requests(symbol_infos, variables)
+                )
+            finally:
+                self.value_cache.invalidate(variables)
+            return _sum_write_result(symbol_infos, results, errors)
+
+    def sum_read_write(self, requests: list) -> list:
+        """
+        Run read-write sub-commands with sum read-write commands (0xF082).
+        Each request is an (index_group, index_offset, read_length, data) tuple and
+        an (error code, data) tuple is returned for each.
+        """
+        with self, self._measure("sum_read_write"):
+            self.batch_size.labels(self.ams_net_id, "sum_read_write").observe(
+                len(requests)
+            )
+            return self._sum_command(ADSIGRP_SUMUP_READWRITE, requests)
+
+    def _sum_command(self, index_group: int, requests: list) -> list:
+        if self._transport is not None:
+            return self._run_transport(self._sum_command_async(index_group, requests))
+        results = []
+        for chunk in chunk_sum_requests(
+            index_group, requests, self.max_sum_sub_commands, self.max_sum_payload
+        ):
+            data, read_length = pack_sum_request(index_group, chunk)
+            response = self._read_write_bytes(
+                index_group, len(chunk), read_length, data
+            )
+            results.extend(unpack_sum_response(index_group, chunk, response))
+        return results
+
+    async def _sum_command_async(self, index_group: int, requests: list) -> list:
+        async def run_chunk(chunk):
+            data, read_length = pack_sum_request(index_group, chunk)
+            started = time.perf_counter()
+            response = await self._transport.read_write(
+                index_group, len(chunk), read_length, data
+            )
+            self._observe_request(started, sent=len(data), received=len(response))
+            return unpack_sum_response(index_group, chunk, response)
+
+        chunks = chunk_sum_requests(
+            index_group, requests, self.max_sum_sub_commands, self.max_sum_payload
+        )
+        # Chunks are pipelined on the transport rather than sent one after another
+        results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        return [result for chunk_results in results for result in chunk_results]
+
+    async def _sum_read_async(self, data_names: list) -> SumResult:
+        with self._measure("sum_read", reads=len(data_names)):
+            self.batch_size.labels(self.ams_net_id, "sum_read").observe(len(data_names))
+            symbol_infos, errors = await self._transport_sum_symbol_infos(data_names)
+            results = await self._sum_command_async(
+                ADSIGRP_SUMUP_READ, _sum_read_requests(symbol_infos)
+            )
+            return _sum_read_result(symbol_infos, results, errors)
+
+    async def _sum_write_async(self, variables: dict) -> dict:
+        with self._measure("sum_write", writes=len(variables)):
+            self.batch_size.labels(self.ams_net_id, "sum_write").observe(len(variables))
+            symbol_infos, errors = await self._transport_sum_symbol_infos(
+                list(variables)
+            )
+            try:
+                results = await self._sum_command_async(
+                    ADSIGRP_SUMUP_WRITE, _sum_write_requests(symbol_infos, variables)
+                )
+            finally:
+                self.value_cache.invalidate(variables)
+            return _sum_write_result(symbol_infos, results, errors)
+
+    # asyncio transport backend
+    # ################################################################################################
+
+    def _run_transport(self, coroutine):
+        """Run a transport coroutine from synchronous code."""
+        return get_transport_loop().run(coroutine)
+
+    async def _await_transport(self, coroutine):
+        """Await a transport coroutine from any event loop."""
+        return await asyncio.wrap_future(get_transport_loop().submit(coroutine))
+
+    async def _transport_check_symbol_version(self):
+        if not self.symbol_cache.version_check_due:
+            return
+        try:
+            data = await self._transport.read(pyads.constants.ADSIGRP_SYM_VERSION, 0, 1)
+            version = data[0]
+        except pyads.ADSError as e:
+            logger.debug(f"Unable to read symbol version of {self.ams_net_id}: {e}")
+            version = self.symbol_cache.version
+        self.symbol_cache.update_version(version)
+
+    async def _transport_symbol_info(self, data_name: str) -> SAdsSymbolEntry:
+        await self._transport_check_symbol_version()
+        info = self.symbol_cache.symbol_info(data_name)
+        if info is None:
+            data = await self._transport.read_write(
+                pyads.constants.ADSIGRP_SYM_INFOBYNAMEEX,
+                0,
+                sizeof(SAdsSymbolEntry),
+                data_name.encode("utf-8") + b"\x00",
+            )
+            info = symbol_entry_from_bytes(data)
+            self.symbol_cache.symbol_infos[data_name] = info
+        return info
+
+    async def _transport_symbol_infos(self, data_names: list) -> dict:
+        data_names = list(dict.fromkeys(data_names))
+        await self._transport_check_symbol_version()
+        infos = await asyncio.gather(
+            *(self._transport_symbol_info(data_name) for data_name in data_names)
+        )
+        return dict(zip(data_names, infos))
+
+    async def _transport_sum_symbol_infos(self, data_names: list) -> tuple[dict, dict]:
+        async def lookup(data_name):
+            try:
+                return await self._transport_symbol_info(data_name), None
+            except pyads.ADSError as e:
+                if is_transport_error(e):
+                    raise
+                return None, e.err_code
+
+        data_names = list(dict.fromkeys(data_names))
+        await self._transport_check_symbol_version()
+        results = await asyncio.gather(*(lookup(data_name) for data_name in data_names))
+        symbol_infos, errors = {}, {}
+        for data_name, (info, error) in zip(data_names, results):
+            if error is None:
+                symbol_infos[data_name] = info
+            else:
+                errors[data_name] = error
+        return symbol_infos, errors
+
+    @staticmethod
+    def _symbol_datatype(data_name: str, info: SAdsSymbolEntry, plc_datatype=None):
+        plc_datatype = plc_datatype or plc_datatype_from_symbol(info)
+        if plc_datatype is None:
+            raise TypeError(f"Unsupported PLC type '{info.symbol_type}' of {data_name}")
+        return plc_datatype
+
+    @staticmethod
+    def _datatype_size(info: SAdsSymbolEntry, plc_datatype) -> int:
+        if type_is_string(plc_datatype) or type_is_wstring(plc_datatype):
+            return info.size
+        return sizeof(plc_datatype)
+
+    async def _transport_read_by_name(self, data_name: str, plc_datatype=None) -> Any:
+        info = await self._transport_symbol_info(data_name)
+        plc_datatype = self._symbol_datatype(data_name, info, plc_datatype)
+        started = time.perf_counter()
+        data = await self._transport.read(
+            info.iGroup, info.iOffs, self._datatype_size(info, plc_datatype)
+        )
+        self._observe_request(started, received=len(data))
+        return decode_value(data, plc_datatype)
+
+    async def _transport_write_by_name(
+        self, data_name: str, value: Any, plc_datatype=None
+    ) -> None:
+        info = await self._transport_symbol_info(data_name)
+        plc_datatype = self._symbol_datatype(data_name, info, plc_datatype)
+        data = encode_value(
+            value, plc_datatype, size=self._datatype_size(info, plc_datatype)
+        )
+        started = time.perf_counter()
+        await self._transport.write(info.iGroup, info.iOffs, data)
+        self._observe_request(started, sent=len(data))
+
     def get_all_symbols(self):
         """Read all symbols from the client."""
         with self:
-            return super().get_all_symbols()
+            if self.symbol_index is None:
+                return super().get_all_symbols()
+            return [
+                pyads.AdsSymbol(
+                    self,
+                    name=symbol.name,
+                    index_group=symbol.index_group,
+                    index_offset=symbol.index_offset,
+                    symbol_type=symbol.symbol_type,
+                    comment=symbol.comment,
+                )
+                for symbol in self.find_symbols(include_members=False)
+            ]
+
+    # Symbol index
+    # ################################################################################################
+
+    def upload_symbols(self) -> list:
+        """
+        Upload the symbol table and data types of the target.
+        Return its symbols with the elements and members of their data types expanded.
+        """
+        with self:
+            upload_info = self._read_bytes(
+                pyads.constants.ADSIGRP_SYM_UPLOADINFO2, 0, UPLOAD_INFO.size
+            )
+            (
+                symbol_count,
+                symbol_length,
+                datatype_count,
+                datatype_length,
+            ) = UPLOAD_INFO.unpack(upload_info.ljust(UPLOAD_INFO.size, b"\x00"))
+            symbols = parse_symbol_upload(
+                self._read_bytes(pyads.constants.ADSIGRP_SYM_UPLOAD, 0, symbol_length),
+                symbol_count,
+            )
+            datatypes = {}
+            if datatype_length:
+                datatypes = parse_datatype_upload(
+                    self._read_bytes(
+                        pyads.constants.ADSIGRP_SYM_DT_UPLOAD, 0, datatype_length
+                    ),
+                    datatype_count,
+                )
+            return list(expand_symbols(symbols, datatypes))
+
+    def index_symbols(self, refresh: bool = False) -> int:
+        """
+        Make sure the symbol table of the current symbol version is in the symbol
+        index, uploading it if required, and return the symbol version.
+        """
+        if self.symbol_index is None:
+            raise ValueError(f"Connection {self.name} has no symbol index")
+        with self:
+            self._check_symbol_version()
+            version = self.symbol_cache.version
+            if version is None:
+                # Without a symbol version changes cannot be detected
+                version, refresh = -1, True
+            if refresh or not self.symbol_index.has_table(
+                self.ams_net_id, self.ams_net_port, version
+            ):
+                self.symbol_index.store(
+                    self.ams_net_id, self.ams_net_port, version, self.upload_symbols()
+                )
+            return version
+
+    def find_symbols(self, pattern: str = "*", include_members: bool = True) -> list:
+        """
+        Return the symbols matching a glob pattern, such as ``MAIN.*`` or
+        ``GVL.aMotors[*].fPos``, from the symbol index.
+        """
+        version = self.index_symbols()
+        return self.symbol_index.query(
+            self.ams_net_id,
+            self.ams_net_port,
+            version,
+            pattern,
+            include_members=include_members,
+        )
+
+    def get_plc_datatypes(self, data_names: Union[str, list, tuple, set]) -> dict:
+        """
+        Return the PLCTYPE of variables as declared in the PLC, or None for those
+        that cannot be mapped, such as structures.
+        """
+        with self:
+            symbol_infos = self._symbol_infos(_name_list(data_names))
+        return {
+            data_name: plc_datatype_from_symbol(info)
+            for data_name, info in symbol_infos.items()
+        }
+
+    # Device notifications
+    # ################################################################################################
+
+    def add_notifications(
+        self,
+        data_names: Union[str, list, tuple, set],
+        callback,
+        on_change: bool = True,
+        cycle_time: float = 0.1,
+        max_delay: float = 0.0,
+    ) -> int:
+        """
+        Subscribe to device notifications of PLC variables, returning the token that
+        identifies the subscription to `remove_notifications`.
+
+        The target samples each variable every ``cycle_time`` seconds and sends it
+        when it has changed, or every cycle if ``on_change`` is False. Samples are held
+        back for up to ``max_delay`` seconds so they can be sent together.
+        ``callback(data_name, timestamp, value)`` is called from the thread receiving
+        the notification.
+
+        Variables that already have subscribers share their notification on the
+        target, which keeps the settings of the subscriber that added it.
+        """
+        trans_mode = (
+            pyads.constants.ADSTRANS_SERVERONCHA
+            if on_change
+            else pyads.constants.ADSTRANS_SERVERCYCLE
+        )
+        token = next(ADSConnection.subscription_tokens)
+        with self:
+            for data_name in _name_list(data_names):
+                subscribers = self._notifications.setdefault(data_name, {})
+                subscribers[token] = (callback, trans_mode, max_delay, cycle_time)
+                if data_name not in self._notification_handles:
+                    try:
+                        self._add_notification(data_name)
+                    except Exception:
+                        self._remove_subscriber(data_name, token)
+                        raise
+        return token
+
+    def remove_notifications(
+        self, data_names: Union[str, list, tuple, set] = None, token: int = None
+    ) -> None:
+        """
+        Unsubscribe the subscription ``token`` from the notifications of PLC
+        variables, or of all of them. Without a token all subscribers are removed.
+        The notification on the target is deleted once a variable has no subscribers.
+        """
+        with self._lock:
+            if data_names is None:
+                data_names = list(self._notifications)
+            data_names = _name_list(data_names)
+            if not self.is_open:
+                for data_name in data_names:
+                    self._remove_subscriber(data_name, token)
+                return
+            # Once the last subscription is removed the session lets the connection idle out
+            with self:
+                for data_name in data_names:
+                    if self._remove_subscriber(data_name, token):
+                        self._delete_notification(data_name)
+
+    def _remove_subscriber(self, data_name: str, token: int = None) -> bool:
+        """Remove a subscriber of a variable, returning whether it was the last one."""
+        subscribers = self._notifications.get(data_name)
+        if subscribers is None:
+            return False
+        if token is None:
+            subscribers.clear()
+        else:
+            subscribers.pop(token, None)
+        if subscribers:
+            return False
+        del self._notifications[data_name]
+        return True
+
+    @property
+    def notifications(self) -> list:
+        """Return the names of the variables with a notification subscription."""
+        return list(self._notifications)
+
+    def _add_notification(self, data_name: str):
+        subscribers = self._notifications[data_name]
+        _, trans_mode, max_delay, cycle_time = next(iter(subscribers.values()))
+        info = self._symbol_infos([data_name])[data_name]
+        plc_datatype = self._symbol_datatype(data_name, info)
+        attrib = pyads.NotificationAttrib(
+            self._datatype_size(info, plc_datatype),
+            trans_mode,
+            # pyads expects milliseconds
+            max_delay * 1000,
+            cycle_time * 1000,
+        )
+
+        def on_notification(timestamp, data):
+            value = decode_value(data, plc_datatype)
+            for callback, *_ in list(subscribers.values()):
+                try:
+                    callback(data_name, timestamp, value)
+                except Exception:
+                    logger.exception(f"Notification callback of {data_name} failed")
+
+        if self._transport is not None:
+            handle = self._run_transport(
+                self._transport.add_device_notification(
+                    info.iGroup, info.iOffs, attrib, on_notification
+                )
+            )
+        else:
+            handle, _ = adsSyncAddDeviceNotificationReqEx(
+                self._port,
+                self._adr,
+                (info.iGroup, info.iOffs),
+                attrib,
+                lambda notification, _: on_notification(
+                    *notification_sample(notification)
+                ),
+            )
+        self._notification_handles[data_name] = handle
+
+    def _delete_notification(self, data_name: str):
+        handle = self._notification_handles.pop(data_name, None)
+        if handle is None or not self.is_open:
+            return
+        try:
+            if self._transport is not None:
+                self._run_transport(self._transport.delete_device_notification(handle))
+            else:
+                adsSyncDelDeviceNotificationReqEx(self._port, self._adr, handle, None)
+        except pyads.ADSError as e:
+            logger.debug(f"Unable to delete notification of {data_name}: {e}")
+
+    def _restore_notifications(self):
+        """Add the subscribed notifications on the target again after reconnecting."""
+        for data_name in list(self._notifications):
+            try:
+                self._add_notification(data_name)
+            except pyads.ADSError as e:
+                logger.error(f"Unable to restore notification of {data_name}: {e}")
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """
+        Return the executor running blocking calls for the asynchronous API.
+        Each connection has a single worker so requests to one target stay in order
+        while different targets run concurrently.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=f"ads-{self.name}"
+                )
+            return self._executor
+
+    async def run_async(self, func, *args, **kwargs) -> Any:
+        """Run a blocking connection method in the connection's executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    @asynccontextmanager
+    async def _session_async(self):
+        """Session of a coroutine, opening and closing the port off the event loop."""
+        if self.is_open:
+            self.__enter__()
+        else:
+            entering = self.executor.submit(self.__enter__)
+            try:
+                await asyncio.wrap_future(entering)
+            except asyncio.CancelledError:
+                # A session entered after the caller was cancelled is ended again
+                self.executor.submit(self._end_entered_session, entering)
+                raise
+        try:
+            yield self
+        finally:
+            if self.idle_timeout and not self._close_requested:
+                self.__exit__(None, None, None)
+            else:
+                # The last session closes the port right away
+                await asyncio.shield(self.run_async(self.__exit__, None, None, None))
+
+    def _end_entered_session(self, entering: Future):
+        if not entering.cancelled() and entering.exception() is None:
+            self.__exit__(None, None, None)
+
+    async def read_by_name_async(self, data_name: str, plc_datatype=None) -> Any:
+        """Asynchronous variant of `read_by_name`."""
+        return await self.run_async(self.read_by_name, data_name, plc_datatype)
+
+    async def write_by_name_async(
+        self,
+        data_name: str,
+        value: Any,
+        plc_datatype=None,
+        verify: Union[bool, WriteVerifier] = False,
+    ) -> None:
+        """Asynchronous variant of `write_by_name`."""
+        return await self.run_async(
+            self.write_by_name, data_name, value, plc_datatype, verify=verify
+        )
+
+    async def read_list_by_name_async(
+        self, data_names: Union[str, list, tuple, set]
+    ) -> dict:
+        """Asynchronous variant of `read_list_by_name`."""
+        if self._transport is not None:
+            data_names = _name_list(data_names)
+            cached, data_names_to_read = self._cached_values(data_names)
+            result = SumResult()
+            if data_names_to_read:
+                async with self._session_async():
+                    result = await self._await_transport(
+                        self._sum_read_async(data_names_to_read)
+                    )
+            return self._merge_cached(data_names, cached, result)
+        return await self.run_async(self.read_list_by_name, data_names)
+
+    async def write_list_by_name_async(
+        self, variables: dict, verify: Union[bool, WriteVerifier] = False
+    ) -> dict:
+        """Asynchronous variant of `write_list_by_name`."""
+        if self._transport is not None and not verify:
+            async with self._session_async():
+                return await self._await_transport(self._sum_write_async(variables))
+        return await self.run_async(self.write_list_by_name, variables, verify=verify)
+
+    async def read_array_by_name_async(
+        self, data_name: str, plc_datatype=None, array_size=1, as_numpy: bool = False
+    ):
+        """Asynchronous variant of `read_array_by_name`."""
+        return await self.run_async(
+            self.read_array_by_name,
+            data_name,
+            plc_datatype,
+            array_size,
+            as_numpy=as_numpy,
+        )
+
+    async def write_array_by_name_async(
+        self,
+        data_name: str,
+        value: Any,
+        plc_datatype=None,
+        verify: Union[bool, WriteVerifier] = False,
+        partial: bool = True,
+    ) -> None:
+        """Asynchronous variant of `write_array_by_name`."""
+        return await self.run_async(
+            self.write_array_by_name,
+            data_name,
+            value,
+            plc_datatype,
+            verify=verify,
+            partial=partial,
+        )
+
+    async def stream(
+        self,
+        data_names: Union[str, list, tuple, set],
+        interval: float = 1.0,
+        mode: str = STREAM_POLL,
+        maxsize: int = 1,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+    ) -> AsyncIterator[Snapshot]:
+        """
+        Stream snapshots of PLC variables::
+
+            async for snapshot in connection.stream(["GVL.fTemp"], interval=0.1):
+                print(snapshot.timestamp, snapshot.values)
+
+        In ``poll`` mode the variables are read every ``interval`` seconds with one sum
+        read, and each snapshot holds all of them. In ``notify`` mode the target samples
+        them every ``interval`` seconds and sends those that changed as device
+        notifications, and each snapshot holds the variables sampled at the same time.
+        The stream shares the notifications of variables other subscribers already
+        receive, and removes only its own subscription when it ends.
+
+        Up to ``maxsize`` snapshots wait for the consumer. When another arrives, the
+        oldest is dropped with ``drop_oldest``, or the new one is merged into the newest
+        with ``coalesce``. With ``block`` polling waits for the consumer, which is not
+        possible in ``notify`` mode. Read errors are raised once the consumer has taken
+        the snapshots read before them. The connection stays open until the stream is
+        closed or the consuming task is cancelled.
+        """
+        if mode not in STREAM_MODES:
+            raise ValueError(
+                f"Unknown stream mode '{mode}', expected one of {STREAM_MODES}"
+            )
+        if mode == STREAM_NOTIFY and overflow == OVERFLOW_BLOCK:
+            raise ValueError("Notification streams cannot block the target")
+        data_names = _name_list(data_names)
+        queue = SnapshotQueue(
+            maxsize,
+            overflow,
+            on_overflow=self.stream_overflows.labels(self.ams_net_id, overflow).inc,
+        )
+        producer = None
+        subscription = None
+        async with self._session_async():
+            if mode == STREAM_NOTIFY:
+                loop = asyncio.get_running_loop()
+
+                def on_notification(data_name, timestamp, value):
+                    # Called from the thread receiving notifications
+                    loop.call_soon_threadsafe(
+                        queue.put_sample, timestamp, data_name, value
+                    )
+
+                subscription = await self.run_async(
+                    self.add_notifications,
+                    data_names,
+                    on_notification,
+                    cycle_time=interval,
+                )
+            else:
+                producer = asyncio.ensure_future(
+                    self._poll_snapshots(data_names, interval, queue)
+                )
+            try:
+                while True:
+                    yield await queue.get()
+            finally:
+                if producer is not None:
+                    producer.cancel()
+                    await asyncio.gather(producer, return_exceptions=True)
+                else:
+                    await self.run_async(
+                        self.remove_notifications, data_names, subscription
+                    )
+
+    async def _poll_snapshots(
+        self, data_names: list, interval: float, queue: SnapshotQueue
+    ):
+        due = time.monotonic()
+        try:
+            while True:
+                result = await self.read_list_by_name_async(data_names)
+                await queue.put(
+                    Snapshot(
+                        datetime.now(timezone.utc), dict(result), dict(result.errors)
+                    )
+                )
+                due += interval
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    # Reads that fell behind are skipped rather than sent back to back
+                    due = time.monotonic()
+        except Exception as e:
+            queue.fail(e)
 
     def set_timeout(self, timeout: int) -> None:
         """Set the timeout for the connection."""
         super().set_timeout(timeout)
 
+    @property
+    def is_open(self) -> bool:
+        """Show the current connection state, False once the transport lost its socket."""
+        if self._open and self._transport is not None:
+            return self._transport.is_connected
+        return self._open
+
+    def _discard_lost_transport(self):
+        """Drop the state of a transport connection dropped by the target or network."""
+        logger.warning(f"Connection to {self.connection_address} was lost")
+        self._run_transport(self._transport.close())
+        self._open = False
+        # Handles and notifications of the lost connection cannot be released anymore
+        self._notification_handles.clear()
+        with self._symbol_lock:
+            self.symbol_cache.pop_handles()
+        self.symbol_cache.expire_version()
+        self.value_cache.invalidate()
+        self.close_events.labels(self.ams_net_id).inc()
+
     def open(self):
-        if self.is_open:
-            return
-        logger.debug(f"Opening connection to {self.connection_address}")
-        super().open()
-        logger.debug(f"Connection to {self.connection_address} opened")
-        self.open_events.labels(self.ams_net_id).inc()
+        with self._lock:
+            if self.is_open:
+                return
+            if self._open:
+                self._discard_lost_transport()
+            logger.debug(f"Opening connection to {self.connection_address}")
+            if self._transport is not None:
+                self._run_transport(self._transport.connect())
+                self._open = True
+            else:
+                super().open()
+            logger.debug(f"Connection to {self.connection_address} opened")
+            self.open_events.labels(self.ams_net_id).inc()
+            if self._notifications:
+                self._restore_notifications()
 
     def close(self):
-        if self.retain_connection:
-            if not self._retain_connection_warning:
-                logger.warning(
-                    f"'ADSConnection.close()' was called, but 'ADSConnection.retain_connection' is set to True. Connection {self.name} will be remain open until explicitly closed. This warning will not be shown again."
+        with self._lock:
+            if self.retain_connection:
+                if not self._retain_connection_warning:
+                    logger.warning(
+                        f"'ADSConnection.close()' was called, but 'ADSConnection.retain_connection' is set to True. Connection {self.name} will be remain open until explicitly closed. This warning will not be shown again."
+                    )
+                    self._retain_connection_warning = True
+                return
+            if self._session_depth > 0:
+                logger.debug(
+                    f"'ADSConnection.close()' called on {self.name} during an active session. Connection will close when the session ends."
                 )
-                self._retain_connection_warning = True
-            return
-        self._close()
+                self._close_requested = True
+                return
+            self._close()
 
     def _close(self):
-        if not self.is_open:
-            return
-        logger.debug(f"Closing connection to {self.connection_address}")
-        super().close()
-        logger.info(f"Connection to {self.connection_address} closed")
-        self.close_events.labels(self.ams_net_id).inc()
+        with self._lock:
+            self._close_requested = False
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            self.value_cache.invalidate()
+            if not self.is_open:
+                if self._open:
+                    self._discard_lost_transport()
+                return
+            logger.debug(f"Closing connection to {self.connection_address}")
+            for data_name in list(self._notification_handles):
+                self._delete_notification(data_name)
+            with self._symbol_lock:
+                self._release_handles(self.symbol_cache.pop_handles())
+            # The PLC program may change while disconnected
+            self.symbol_cache.expire_version()
+            if self._transport is not None:
+                self._run_transport(self._transport.close())
+                self._open = False
+            else:
+                super().close()
+            logger.info(f"Connection to {self.connection_address} closed")
+            self.close_events.labels(self.ams_net_id).inc()
 
     def ensure_closed(self):
         """Force close the connection."""
         self._close()
 
+    def reconnect(self, generation: int = None) -> bool:
+        """
+        Force close and reopen the connection, e.g. after the route was lost, and
+        return whether it was reconnected. If the ``reconnect_generation`` read before
+        the failure is given, the connection is left alone if it has been reconnected
+        since.
+        """
+        with self._lock:
+            if generation is not None and generation != self.reconnect_generation:
+                logger.debug(f"{self.name} was already reconnected")
+                return False
+            self.reconnect_generation += 1
+            logger.info(f"Reconnecting to {self.connection_address}")
+            try:
+                self._close()
+            except pyads.ADSError as e:
+                logger.debug(f"Error closing {self.name} before reconnecting: {e}")
+                self._open = False
+            self.reconnect_events.labels(self.ams_net_id).inc()
+            self.open()
+            return True
+
     def __del__(self):
-        self._close()
+        if hasattr(self, "_lock"):
+            self._close()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
 
     @property
     def connection_address(self):
@@ -1,13 +1,33 @@
 from __future__ import annotations
+from contextlib import contextmanager
 import json
+import threading
 from typing import Optional, Any
 import pyads
 
 from ads_client import ADSConnection
+from ads_client.ads_connection_pool import get_connection_pool
 from ads_client.ads_connection import logger
 import ads_client.constants as constants
 
 
+# The helpers share the pooled connections of the clients of a PLC, so their
+# connections are plain ADSConnections. The name is kept for existing callers.
+LabviewADSConnection = ADSConnection
+
+# Keys of the pooled connections used by this module, closed by `close_all`
+_pooled_keys: set[tuple] = set()
+# Leases held for the connections handed out by `get_connection_object`
+_leases: dict[ADSConnection, int] = {}
+_pooled_lock = threading.Lock()
+
+
+def _pool_args(
+    ams_net_id: str, ip_address: Optional[str], ams_net_port: Optional[int]
+) -> tuple:
+    return (ams_net_id, ams_net_port or pyads.PORT_TC3PLC1, ip_address)
+
+
 def get_connection_object(
     target: Optional[LabviewADSConnection] = None,
     ams_net_id: Optional[str] = None,
@@ -17,29 +37,103 @@ def get_connection_object(
     """
     Get a connection object to a PLC.
     Can be used to parse arguments and create a connection object, if the target is not provided.
+    Connections to an ams_net_id are taken from the process-wide connection pool, so later
+    calls and the clients of the same PLC share one connection, which keeps its port open
+    between calls. The connection stays leased until it is closed with `close_connection`
+    or `close_all`.
     """
-    # If a target is provided, return it
+    if target or not ams_net_id:
+        with _connection(target, ams_net_id) as target:
+            return target
+    args = _pool_args(ams_net_id, ip_address, ams_net_port)
+    target = get_connection_pool().acquire(*args)
+    with _pooled_lock:
+        _pooled_keys.add(args)
+        _leases[target] = _leases.get(target, 0) + 1
+    return target
+
+
+@contextmanager
+def _connection(
+    target: Optional[LabviewADSConnection] = None,
+    ams_net_id: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    ams_net_port: Optional[int] = None,
+):
+    """Lease the pooled connection to ams_net_id for a call, unless a target is given."""
+    # If a target is provided, use it
     if target:
         if ams_net_id:
             logger.warning("Both target and ams_net_id are provided. Using target.")
-        return target
-    # If ams_net_id is provided, create a connection object
+        yield target
+        return
+    # If ams_net_id is provided, lease its pooled connection
     if ams_net_id:
-        return LabviewADSConnection(
-            ams_net_id=ams_net_id,
-            ip_address=ip_address,
-            ams_net_port=ams_net_port,
-        )
-    # If no target or ams_net_id is provided, return None
+        args = _pool_args(ams_net_id, ip_address, ams_net_port)
+        with _pooled_lock:
+            _pooled_keys.add(args)
+        with get_connection_pool().lease(*args) as target:
+            yield target
+        return
+    # If no target or ams_net_id is provided, there is no connection
     logger.warning("No target or ams_net_id provided. No connection object created.")
-    return None
+    yield None
+
+
+def _release(target: ADSConnection) -> bool:
+    """
+    Release the leases held for a pooled connection and close it unless a client still
+    leases it, returning whether it is pooled.
+    """
+    pool = get_connection_pool()
+    with _pooled_lock:
+        leases = _leases.pop(target, 0)
+    for _ in range(leases):
+        pool.release(target)
+    return pool.discard(target, force=False)
 
 
-def close_connection(target: LabviewADSConnection):
+def expire_idle_connections():
     """
-    Close the connection to a PLC.
+    Close and remove the pooled connections that have been idle for the pool's idle timeout.
+    The pool also does this by itself once they have been idle for that long.
     """
-    target.close()
+    get_connection_pool().evict_idle()
+
+
+def close_connection(
+    target: Optional[LabviewADSConnection] = None,
+    ams_net_id: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    ams_net_port: Optional[int] = None,
+):
+    """
+    Close the connection to a PLC, given as target or by its ams_net_id.
+    A pooled connection is closed and removed from the pool once the clients sharing it
+    no longer lease it.
+    """
+    if target is None and ams_net_id:
+        args = _pool_args(ams_net_id, ip_address, ams_net_port)
+        with _pooled_lock:
+            _pooled_keys.discard(args)
+        target = get_connection_pool().get(*args)
+    if target is not None and not _release(target):
+        target.ensure_closed()
+
+
+def close_all():
+    """
+    Close every pooled connection used by these functions that no client still leases.
+    """
+    with _pooled_lock:
+        keys = list(_pooled_keys)
+        _pooled_keys.clear()
+        targets = list(_leases)
+    pool = get_connection_pool()
+    targets += [pool.get(*args) for args in keys]
+    for target in dict.fromkeys(targets):
+        if target is not None:
+            _release(target)
 
 
 def write_magnet_structure(
@@ -49,10 +143,11 @@ def write_magnet_structure(
     ams_net_id: Optional[str] = None,
 ):
     """Write magnet driver clusters to the PLC"""
-    if target := get_connection_object(target, ams_net_id):
-        target.write_structure_by_name(
-            varName, value, structure_def=constants.MAGNET_STRUCTURE
-        )
+    with _connection(target, ams_net_id) as target:
+        if target:
+            target.write_structure_by_name(
+                varName, value, structure_def=constants.MAGNET_STRUCTURE
+            )
 
 
 def write_tdklocal_structure(
@@ -63,13 +158,14 @@ def write_tdklocal_structure(
     number_of_supplies: Optional[int] = 1,
 ):
     """Write TDK Local clusters to the PLC"""
-    if target := get_connection_object(target, ams_net_id):
-        target.write_structure_by_name(
-            varName,
-            value,
-            structure_def=constants.TDKLOCAL_STRUCTURE,
-            array_size=number_of_supplies,
-        )
+    with _connection(target, ams_net_id) as target:
+        if target:
+            target.write_structure_by_name(
+                varName,
+                value,
+                structure_def=constants.TDKLOCAL_STRUCTURE,
+                array_size=number_of_supplies,
+            )
 
 
 def write_hwconfig_structure(
@@ -79,10 +175,11 @@ def write_hwconfig_structure(
     ams_net_id: Optional[str] = None,
 ):
     """Write hardware configuration clusters to the PLC"""
-    if target := get_connection_object(target, ams_net_id):
-        target.write_structure_by_name(
-            varName, value, structure_def=constants.TDK_STRUCTURE
-        )
+    with _connection(target, ams_net_id) as target:
+        if target:
+            target.write_structure_by_name(
+                varName, value, structure_def=constants.TDK_STRUCTURE
+            )
 
 
 def read_error_from_plc(
@@ -94,13 +191,14 @@ def read_error_from_plc(
     """
     Read errors from a PLC.
     """
-    if target := get_connection_object(target, ams_net_id):
-        errors = target.read_structure_by_name(
-            varName,
-            structure_def=constants.ERROR_STRUCTURE,
-            array_size=number_of_errors,
-        )
-        return json.dumps(errors)
+    with _connection(target, ams_net_id) as target:
+        if target:
+            errors = target.read_structure_by_name(
+                varName,
+                structure_def=constants.ERROR_STRUCTURE,
+                array_size=number_of_errors,
+            )
+            return json.dumps(errors)
 
 
 def read_errors_from_plc(
@@ -111,13 +209,14 @@ def read_errors_from_plc(
     """
     Read errors from a PLC.
     """
-    if target := get_connection_object(target, ams_net_id):
-        with target:
-            errors = [
-                target.read_by_name(f"LV.aErrors[{i}]", pyads.PLCTYPE_STRING)
-                for i in range(number_of_errors)
-            ]
-            return json.dumps(errors)
+    with _connection(target, ams_net_id) as target:
+        if target:
+            with target:
+                errors = [
+                    target.read_by_name(f"LV.aErrors[{i}]", pyads.PLCTYPE_STRING)
+                    for i in range(number_of_errors)
+                ]
+                return json.dumps(errors)
 
 
 def read_from_plc(
@@ -126,10 +225,7 @@ def read_from_plc(
     """
     Read a variable by name from a PLC.
     """
-    if target := get_connection_object(target, ams_net_id):
-        with target:
-            return target.read_by_name(var_name)
-
-
-class LabviewADSConnection(ADSConnection):
-    pass
+    with _connection(target, ams_net_id) as target:
+        if target:
+            with target:
+                return target.read_by_name(var_name)
@@ -0,0 +1,351 @@
+"""Process-wide pool sharing ADSConnection objects between clients of the same target"""
+
+from contextlib import contextmanager
+from functools import lru_cache
+import inspect
+import logging
+import threading
+import time
+
+import pyads
+from prometheus_client import Counter
+
+from ads_client.ads_connection import ADSConnection
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPoolExhaustedError(Exception):
+    """Raised when the pool is full and every pooled connection is leased."""
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class _PoolEntry:
+    """Book-keeping for a single pooled connection."""
+
+    __slots__ = ("connection", "leases", "last_released", "last_health_check")
+
+    def __init__(self, connection: ADSConnection):
+        self.connection = connection
+        self.leases = 0
+        self.last_released = time.monotonic()
+        self.last_health_check = time.monotonic()
+
+
+class ADSConnectionPool:
+    """
+    Pool handing out shared connections keyed by (ams_net_id, ams_net_port), the IP
+    address and the options the connection is created with.
+
+    Every lessee of the same target and options receives the same ADSConnection, so a
+    reader, a writer and any helper functions talking to one PLC share a single warm
+    AMS port. Lessees asking for different options, e.g. another ``backend``, receive
+    a connection of their own.
+    Connections without leases are evicted once idle for ``idle_timeout`` seconds, by a
+    timer started as they are released, or earlier when ``max_size`` targets are
+    pooled and room is needed for a new one.
+    Leased connections are health checked with a device state read at most every
+    ``health_check_interval`` seconds and re-opened if the check fails.
+    """
+
+    # Class-level metrics to be shared across instances
+    hits = Counter(
+        name="ads_client_connection_pool_hits",
+        documentation="Number of leases served by an already pooled connection",
+        labelnames=["ams_net_id"],
+    )
+    misses = Counter(
+        name="ads_client_connection_pool_misses",
+        documentation="Number of leases that required a new connection",
+        labelnames=["ams_net_id"],
+    )
+    evictions = Counter(
+        name="ads_client_connection_pool_evictions",
+        documentation="Number of pooled connections evicted",
+        labelnames=["ams_net_id"],
+    )
+    health_check_failures = Counter(
+        name="ads_client_connection_pool_health_check_failures",
+        documentation="Number of pooled connections that failed a health check",
+        labelnames=["ams_net_id"],
+    )
+
+    def __init__(
+        self,
+        max_size: int = 32,
+        idle_timeout: float = 60.0,
+        health_check_interval: float = 30.0,
+        connection_class: type = ADSConnection,
+    ):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.connection_class = connection_class
+        self._entries: dict[tuple, _PoolEntry] = {}
+        self._lock = threading.RLock()
+        self._eviction_timer: threading.Timer = None
+        self._eviction_due = 0.0
+
+    def key(
+        self,
+        ams_net_id: str,
+        ams_net_port: int = pyads.PORT_TC3PLC1,
+        ip_address: str = None,
+        **connection_kwargs,
+    ) -> tuple:
+        """Return the pool key for a target and the options of its connection."""
+        ams_net_port, ip_address = _target_address(ams_net_id, ams_net_port, ip_address)
+        # Options given with their default value share the connection of lessees
+        # leaving them out
+        defaults = _parameter_defaults(self.connection_class)
+        options = tuple(
+            sorted(
+                (name, _hashable(value))
+                for name, value in connection_kwargs.items()
+                if name not in defaults or value != defaults[name]
+            )
+        )
+        return (ams_net_id, ams_net_port, ip_address, options)
+
+    def acquire(
+        self,
+        ams_net_id: str,
+        ams_net_port: int = pyads.PORT_TC3PLC1,
+        ip_address: str = None,
+        **connection_kwargs,
+    ) -> ADSConnection:
+        """
+        Lease the pooled connection to a target, creating it if required.
+        Every call must be paired with a call to `release`.
+        """
+        key = self.key(ams_net_id, ams_net_port, ip_address, **connection_kwargs)
+        ams_net_port, ip_address = key[1:3]
+        with self._lock:
+            self.evict_idle()
+            entry = self._entries.get(key)
+            if entry is None:
+                self._make_room()
+                connection = self.connection_class(
+                    ams_net_id=ams_net_id,
+                    ip_address=ip_address,
+                    ams_net_port=ams_net_port,
+                    **connection_kwargs,
+                )
+                entry = self._entries[key] = _PoolEntry(connection)
+                self.misses.labels(ams_net_id).inc()
+                logger.debug(f"Connection pool miss for {key}, created {connection}")
+                check_health = False
+            else:
+                self.hits.labels(ams_net_id).inc()
+                check_health = self._health_check_due(entry)
+            entry.leases += 1
+        # The probe is sent without holding the pool lock, so a slow target does not
+        # hold up leases of the other targets
+        if check_health:
+            self._check_health(entry.connection)
+        return entry.connection
+
+    def release(self, connection: ADSConnection) -> None:
+        """Return a leased connection to the pool."""
+        with self._lock:
+            entry = self._find(connection)
+            if entry is None:
+                logger.warning(f"Released connection {connection} is not pooled")
+                return
+            entry.leases = max(entry.leases - 1, 0)
+            entry.last_released = time.monotonic()
+            if entry.leases == 0:
+                self._schedule_eviction()
+
+    @contextmanager
+    def lease(
+        self,
+        ams_net_id: str,
+        ams_net_port: int = pyads.PORT_TC3PLC1,
+        ip_address: str = None,
+        **connection_kwargs,
+    ):
+        """Context manager leasing a connection for the duration of the block."""
+        connection = self.acquire(
+            ams_net_id, ams_net_port, ip_address=ip_address, **connection_kwargs
+        )
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def get(
+        self,
+        ams_net_id: str,
+        ams_net_port: int = pyads.PORT_TC3PLC1,
+        ip_address: str = None,
+        **connection_kwargs,
+    ) -> ADSConnection:
+        """Return the pooled connection to a target without leasing it, or None."""
+        key = self.key(ams_net_id, ams_net_port, ip_address, **connection_kwargs)
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry.connection
+
+    def discard(self, connection: ADSConnection, force: bool = True) -> bool:
+        """
+        Close and remove a pooled connection, even if leased, returning whether it
+        was pooled. Unless ``force``, a leased connection is left to its lessees and
+        evicted once idle.
+        """
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.connection is connection:
+                    if force or not entry.leases:
+                        self._evict(key)
+                    return True
+        return False
+
+    def evict_idle(self) -> None:
+        """Close and remove connections that have not been leased for idle_timeout."""
+        now = time.monotonic()
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.leases == 0 and now - entry.last_released >= self.idle_timeout:
+                    self._evict(key)
+
+    def close_all(self) -> None:
+        """Close and remove every pooled connection, leased or not."""
+        with self._lock:
+            if self._eviction_timer is not None:
+                self._eviction_timer.cancel()
+                self._eviction_timer = None
+            for key in list(self._entries):
+                self._evict(key)
+
+    def _schedule_eviction(self):
+        """Start a timer evicting the unleased connections once they are idle."""
+        released = [
+            entry.last_released for entry in self._entries.values() if not entry.leases
+        ]
+        if not released:
+            return
+        due = min(released) + self.idle_timeout
+        if self._eviction_timer is not None:
+            if self._eviction_due <= due:
+                return
+            # The idle timeout was shortened since the timer was started
+            self._eviction_timer.cancel()
+        self._eviction_due = due
+        self._eviction_timer = threading.Timer(
+            max(due - time.monotonic(), 0), self._evict_idle_when_due
+        )
+        self._eviction_timer.daemon = True
+        self._eviction_timer.start()
+
+    def _evict_idle_when_due(self):
+        with self._lock:
+            # A timer cancelled while waiting for the lock leaves its successor alone
+            if threading.current_thread() is not self._eviction_timer:
+                return
+            self._eviction_timer = None
+            self.evict_idle()
+            # Connections released later are due after this one
+            self._schedule_eviction()
+
+    def _make_room(self):
+        if len(self._entries) < self.max_size:
+            return
+        idle = [
+            (entry.last_released, key)
+            for key, entry in self._entries.items()
+            if entry.leases == 0
+        ]
+        if not idle:
+            raise ConnectionPoolExhaustedError(
+                f"Connection pool is full ({self.max_size} targets) and every connection is leased"
+            )
+        self._evict(min(idle, key=lambda item: item[0])[1])
+
+    def _find(self, connection: ADSConnection) -> _PoolEntry:
+        for entry in self._entries.values():
+            if entry.connection is connection:
+                return entry
+        return None
+
+    def _evict(self, key: tuple):
+        entry = self._entries.pop(key)
+        logger.debug(f"Evicting pooled connection {entry.connection}")
+        entry.connection.ensure_closed()
+        self.evictions.labels(key[0]).inc()
+
+    def _health_check_due(self, entry: _PoolEntry) -> bool:
+        now = time.monotonic()
+        if (
+            not entry.connection.is_open
+            or now - entry.last_health_check < self.health_check_interval
+        ):
+            return False
+        # Claimed under the lock, so concurrent leases do not probe the target again
+        entry.last_health_check = now
+        return True
+
+    def _check_health(self, connection: ADSConnection):
+        try:
+            with connection:
+                connection.read_state()
+        except pyads.ADSError as e:
+            logger.warning(
+                f"Health check failed for pooled connection {connection}: {e}. Reconnecting."
+            )
+            self.health_check_failures.labels(connection.ams_net_id).inc()
+            connection.ensure_closed()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: tuple):
+        return key in self._entries
+
+
+def _target_address(ams_net_id: str, ams_net_port: int, ip_address: str) -> tuple:
+    """
+    Return the port and IP address of a target, filling in the defaults ADSConnection
+    uses, so lessees leaving them out share the connection of those naming them.
+    """
+    if ams_net_port is None:
+        ams_net_port = pyads.PORT_TC3PLC1
+    if ip_address is None:
+        ip_address = ".".join(ams_net_id.split(".")[:4])
+    return ams_net_port, ip_address
+
+
+@lru_cache(maxsize=None)
+def _parameter_defaults(connection_class: type) -> dict:
+    """Return the default values of the parameters of a connection class."""
+    return {
+        name: parameter.default
+        for name, parameter in inspect.signature(connection_class).parameters.items()
+    }
+
+
+def _hashable(value):
+    """Return a connection option as a hashable part of a pool key."""
+    if isinstance(value, dict):
+        return tuple(sorted((name, _hashable(item)) for name, item in value.items()))
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_connection_pool() -> ADSConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ADSConnectionPool()
+        return _default_pool
@@ -0,0 +1,106 @@
+"""Deadband and change-detection filtering of values read from an ADS target"""
+
+from fnmatch import fnmatchcase
+from typing import Any, NamedTuple, Union
+import math
+import time
+
+
+class Deadband(NamedTuple):
+    """
+    Change of a numeric variable below which a new value is not reported.
+
+    ``absolute`` is in the units of the variable and ``percent`` is relative to the
+    value last reported. A value is reported when its change exceeds every deadband
+    that is set.
+    """
+
+    absolute: float = 0.0
+    percent: float = 0.0
+
+
+NO_DEADBAND = Deadband()
+
+
+class ChangeFilter:
+    """
+    Suppress values that did not change since they were last reported.
+
+    ``deadbands`` maps variable names or fnmatch patterns such as ``"GVL.f*"`` to a
+    `Deadband`, or to a number taken as an absolute deadband. A variable's own name
+    takes precedence over patterns, which are matched in the order given. Numbers
+    without a deadband, such as INT tags, BOOLs and all other values are reported
+    whenever they change. With a ``heartbeat_interval`` every variable is reported
+    again at least that often in seconds, whether it changed or not.
+    """
+
+    def __init__(self, deadbands: dict = None, heartbeat_interval: float = 0.0):
+        self.deadbands = {
+            pattern: _deadband(deadband)
+            for pattern, deadband in (deadbands or {}).items()
+        }
+        self.heartbeat_interval = heartbeat_interval
+        # Deadband resolved for each variable name, as matching patterns is slow
+        self._resolved: dict[str, Deadband] = {}
+        # Value last reported and the monotonic time it was reported at
+        self._reported: dict[str, tuple] = {}
+
+    def deadband(self, data_name: str) -> Deadband:
+        """Return the deadband of a variable."""
+        deadband = self._resolved.get(data_name)
+        if deadband is None:
+            deadband = self.deadbands.get(data_name)
+            if deadband is None:
+                deadband = next(
+                    (
+                        deadband
+                        for pattern, deadband in self.deadbands.items()
+                        if fnmatchcase(data_name, pattern)
+                    ),
+                    NO_DEADBAND,
+                )
+            self._resolved[data_name] = deadband
+        return deadband
+
+    def changed(self, data_name: str, value: Any, reported: Any) -> bool:
+        """Whether a value differs from the value last reported by more than its deadband."""
+        if (
+            isinstance(value, (int, float))
+            and not isinstance(value, bool)
+            and isinstance(reported, (int, float))
+        ):
+            if math.isnan(value) or math.isnan(reported):
+                return math.isnan(value) != math.isnan(reported)
+            change = abs(value - reported)
+            deadband = self.deadband(data_name)
+            if not change or change <= deadband.absolute:
+                return False
+            return change > abs(reported) * deadband.percent / 100
+        return value != reported
+
+    def filter(self, values: dict, now: float = None) -> dict:
+        """Return the values to report and remember them as reported."""
+        now = time.monotonic() if now is None else now
+        report = {}
+        for data_name, value in values.items():
+            last = self._reported.get(data_name)
+            if (
+                last is None
+                or self.changed(data_name, value, last[0])
+                or (
+                    self.heartbeat_interval and now - last[1] >= self.heartbeat_interval
+                )
+            ):
+                report[data_name] = value
+                self._reported[data_name] = (value, now)
+        return report
+
+    def reset(self):
+        """Forget the values reported, so that the next values are all reported."""
+        self._reported.clear()
+
+
+def _deadband(deadband: Union[Deadband, float]) -> Deadband:
+    if isinstance(deadband, Deadband):
+        return deadband
+    return Deadband(absolute=deadband)
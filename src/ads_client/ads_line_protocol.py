@@ -0,0 +1,409 @@
+"""InfluxDB line protocol encoding and streaming of samples read from an ADS target"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, Union
+import gzip
+import logging
+import math
+import socket
+import sys
+import threading
+import time
+
+from ads_client.ads_resilience import Backoff
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SIZE = 64 * 1024
+DEFAULT_FLUSH_INTERVAL = 1.0
+# Largest UDP payload sent, split on line boundaries
+MAX_DATAGRAM_SIZE = 65_000
+
+_MEASUREMENT_ESCAPES = str.maketrans({",": "\\,", " ": "\\ "})
+_KEY_ESCAPES = str.maketrans({",": "\\,", "=": "\\=", " ": "\\ "})
+_STRING_ESCAPES = str.maketrans({'"': '\\"', "\\": "\\\\"})
+
+
+def escape_key(key: str) -> str:
+    """Escape a tag key, tag value or field key."""
+    return str(key).translate(_KEY_ESCAPES)
+
+
+def format_field(value: Any) -> str:
+    """
+    Format a field value, or return an empty string for values line protocol
+    cannot hold, such as NaN.
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value) if math.isfinite(value) else ""
+    if isinstance(value, str):
+        return f'"{value.translate(_STRING_ESCAPES)}"'
+    return ""
+
+
+class LineProtocolEncoder:
+    """
+    Encode samples of a reader as InfluxDB line protocol with nanosecond timestamps.
+
+    The measurement and ``tags`` are escaped once, when the encoder is created, and
+    the key of each variable the first time it is encoded. Arrays and structures are
+    split into one field per element, named ``name[index]`` and ``name.member``.
+    Fields that line protocol cannot hold, such as NaN, are left out, as are lines
+    left without fields.
+    """
+
+    def __init__(self, measurement: str, tags: dict = None):
+        self.measurement = measurement
+        self.tags = dict(tags or {})
+        prefix = measurement.translate(_MEASUREMENT_ESCAPES)
+        for key, value in sorted(self.tags.items()):
+            prefix += f",{escape_key(key)}={escape_key(value)}"
+        self.prefix = prefix + " "
+        self._keys: dict[str, str] = {}
+
+    def key(self, data_name: str) -> str:
+        """Return the escaped field key of a variable followed by ``=``."""
+        key = self._keys.get(data_name)
+        if key is None:
+            key = self._keys[data_name] = escape_key(data_name) + "="
+        return key
+
+    def fields(self, values: dict) -> str:
+        """Return the field set of a sample."""
+        fields = []
+        for data_name, value in values.items():
+            if isinstance(value, (list, tuple, dict)):
+                fields.extend(self._nested_fields(data_name, value))
+                continue
+            formatted = format_field(value)
+            if formatted:
+                fields.append(self.key(data_name) + formatted)
+        return ",".join(fields)
+
+    def _nested_fields(self, data_name: str, value: Union[list, tuple, dict]):
+        items = value.items() if isinstance(value, dict) else enumerate(value)
+        for key, item in items:
+            name = (
+                f"{data_name}.{key}"
+                if isinstance(value, dict)
+                else f"{data_name}[{key}]"
+            )
+            if isinstance(item, (list, tuple, dict)):
+                yield from self._nested_fields(name, item)
+                continue
+            formatted = format_field(item)
+            if formatted:
+                yield self.key(name) + formatted
+
+    def encode(self, samples: list) -> bytes:
+        """Encode ``(timestamp, values)`` samples, one line each."""
+        prefix = self.prefix
+        lines = []
+        for timestamp, values in samples:
+            fields = self.fields(values)
+            if fields:
+                lines.append(f"{prefix}{fields} {timestamp}\n")
+        return "".join(lines).encode()
+
+    def encode_columns(self, columns: dict) -> bytes:
+        """
+        Encode columns of samples, such as those of a `ColumnarRingBuffer`, with a
+        ``timestamp`` column and one column of values per variable.
+
+        Each column is formatted as a whole, so this is much faster than `encode` for
+        the same samples. Masked values are left out.
+        """
+        timestamps = columns["timestamp"]
+        count = len(timestamps)
+        if not count:
+            return b""
+        formatted = []
+        for data_name, column in columns.items():
+            if data_name == "timestamp":
+                continue
+            if getattr(column, "ndim", 1) > 1:
+                # Arrays are split into one field per element
+                for index in range(column.shape[1]):
+                    formatted.append(
+                        self._format_column(f"{data_name}[{index}]", column[:, index])
+                    )
+                continue
+            formatted.append(self._format_column(data_name, column))
+        rows = zip(*formatted)
+        if any("" in fields for fields in formatted):
+            fields = [",".join(filter(None, row)) for row in rows]
+        else:
+            fields = list(map(",".join, rows))
+        prefix = self.prefix
+        return "".join(
+            f"{prefix}{row} {timestamp}\n"
+            for row, timestamp in zip(fields, _tolist(timestamps))
+            if row
+        ).encode()
+
+    def _format_column(self, data_name: str, column) -> list:
+        key = self.key(data_name)
+        values = _tolist(column)
+        if isinstance(values[0], bool):
+            formatted = [key + ("true" if value else "false") for value in values]
+        elif isinstance(values[0], int):
+            formatted = [f"{key}{value}i" for value in values]
+        elif isinstance(values[0], float):
+            formatted = [
+                key + repr(value) if math.isfinite(value) else "" for value in values
+            ]
+        else:
+            formatted = [
+                key + field if field else "" for field in map(format_field, values)
+            ]
+        # The mask of a masked array, which is a scalar if nothing is masked
+        mask = getattr(column, "mask", None)
+        if mask is not None and mask.any():
+            formatted = [
+                "" if masked else field
+                for field, masked in zip(formatted, _tolist(mask))
+            ]
+        return formatted
+
+
+def _tolist(values) -> list:
+    if hasattr(values, "mask"):
+        # The masked values are formatted too and left out afterwards
+        values = values.data
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+
+class LineProtocolSink:
+    """
+    Stream samples as InfluxDB line protocol to a file, stdout or a socket.
+
+    ``destination`` is a path of a file to append to, ``"-"`` for stdout, a binary
+    stream, or ``tcp://host:port`` or ``udp://host:port``. It can be given as the
+    ``buffer`` of an `ADSReaderClient`, as samples are added with `append` like the
+    entries of a deque and timestamped as they are added.
+
+    Samples are encoded and sent in batches, once ``flush_size`` bytes of samples are
+    pending or ``flush_interval`` seconds after the last batch was sent, whether or
+    not more samples are appended in the meantime. Batches are encoded and sent in order by a background
+    thread, so appending does not wait for the destination. With ``compress`` each
+    batch is sent as a gzip member. UDP batches are split into datagrams of whole
+    lines. Batches that cannot be sent are logged and counted in ``lines_dropped``.
+
+    A TCP connection that fails is opened again for a later batch. While reconnecting
+    fails, the attempts are spaced by ``reconnect_backoff`` and the batches sent in
+    between are dropped.
+    """
+
+    def __init__(
+        self,
+        encoder: LineProtocolEncoder,
+        destination: Union[str, Path, BinaryIO] = "-",
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        compress: bool = False,
+        reconnect_backoff: Backoff = None,
+    ):
+        self.encoder = encoder
+        self.destination = destination
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.reconnect_backoff = reconnect_backoff or Backoff(initial=1.0, maximum=60.0)
+        self.lines_written = 0
+        self.lines_dropped = 0
+        self.bytes_written = 0
+        self._samples = []
+        self._columns = []
+        self._pending_size = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_timer: threading.Timer = None
+        self._closed = False
+        self._stream: BinaryIO = None
+        self._socket: socket.socket = None
+        self._address = None
+        self._udp = False
+        self._owns_stream = False
+        self._reconnect_attempts = 0
+        self._reconnect_at = 0.0
+        self._sender = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="line_protocol_sink"
+        )
+        self._open()
+
+    def _open(self):
+        destination = self.destination
+        if isinstance(destination, str) and "://" in destination:
+            scheme, address = destination.split("://", 1)
+            if scheme not in ("tcp", "udp"):
+                raise ValueError(f"Unknown scheme '{scheme}', expected tcp or udp")
+            host, port = address.rsplit(":", 1)
+            self._address = (host, int(port))
+            self._udp = scheme == "udp"
+            if not self._udp:
+                self._socket = socket.create_connection(self._address)
+            else:
+                self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        elif destination == "-":
+            self._stream = sys.stdout.buffer
+        elif isinstance(destination, (str, Path)):
+            self._stream = open(destination, "ab")
+            self._owns_stream = True
+        else:
+            self._stream = destination
+
+    def __len__(self):
+        return len(self._samples)
+
+    def append(self, values: dict, timestamp: int = None):
+        """Add a sample, timestamped now unless given in nanoseconds since the epoch."""
+        if timestamp is None:
+            timestamp = time.time_ns()
+        with self._lock:
+            self._samples.append((timestamp, values))
+            # Roughly the size of the line, without encoding it yet
+            self._pending_size += len(self.encoder.prefix) + 32 * len(values)
+            self._arm_flush_timer()
+        self._flush_if_due()
+
+    def write_columns(self, columns: dict):
+        """Add columns of samples, such as those consumed from a `ColumnarRingBuffer`."""
+        with self._lock:
+            self._columns.append(columns)
+            self._pending_size += (len(self.encoder.prefix) + 32 * len(columns)) * len(
+                columns["timestamp"]
+            )
+            self._arm_flush_timer()
+        self._flush_if_due()
+
+    def _flush_if_due(self):
+        if (
+            self._pending_size >= self.flush_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self._submit()
+
+    def _arm_flush_timer(self):
+        """Send the pending samples at the flush interval if nothing else sends them."""
+        # Called with the lock held
+        if self._flush_timer is not None or self._closed:
+            return
+        delay = max(0.0, self._last_flush + self.flush_interval - time.monotonic())
+        self._flush_timer = threading.Timer(delay, self._submit, kwargs={"timer": True})
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def flush(self):
+        """Send the pending samples and wait until they and earlier batches are sent."""
+        self._submit().result()
+
+    def _submit(self, timer: bool = False) -> Future:
+        """Hand the pending samples to the sender thread as one batch."""
+        with self._lock:
+            if timer and threading.current_thread() is not self._flush_timer:
+                # The samples were sent, or the sink closed, since the timer was armed
+                return None
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            samples, self._samples = self._samples, []
+            columns, self._columns = self._columns, []
+            self._pending_size = 0
+            self._last_flush = time.monotonic()
+            # Submitted under the lock so that batches are sent in order
+            return self._sender.submit(self._write, samples, columns)
+
+    def _write(self, samples: list, columns: list):
+        data = b"".join(
+            [self.encoder.encode_columns(batch) for batch in columns]
+            + [self.encoder.encode(samples)]
+        )
+        if not data:
+            return
+        lines = data.count(b"\n")
+        try:
+            self._send(data)
+        except OSError as e:
+            # A reader appending samples must not fail with its destination
+            self.lines_dropped += lines
+            logger.error(f"Dropped {lines} lines sent to {self.destination}: {e!r}")
+            return
+        self.lines_written += lines
+
+    def _connect(self):
+        """Open the TCP connection again, unless the last attempt failed too recently."""
+        now = time.monotonic()
+        if now < self._reconnect_at:
+            raise ConnectionError(
+                f"Not connected, reconnecting in {self._reconnect_at - now:.1f}s"
+            )
+        try:
+            self._socket = socket.create_connection(self._address)
+        except OSError:
+            self._reconnect_at = now + self.reconnect_backoff.delay(
+                self._reconnect_attempts
+            )
+            self._reconnect_attempts += 1
+            raise
+        self._reconnect_attempts = 0
+        logger.info(f"Reconnected to {self.destination}")
+
+    def _send(self, data: bytes):
+        if self._udp:
+            for datagram in _split_lines(data, MAX_DATAGRAM_SIZE):
+                if self.compress:
+                    datagram = gzip.compress(datagram)
+                self._socket.sendto(datagram, self._address)
+                self.bytes_written += len(datagram)
+            return
+        if self.compress:
+            data = gzip.compress(data)
+        if self._address is not None:
+            if self._socket is None:
+                self._connect()
+            try:
+                self._socket.sendall(data)
+            except OSError:
+                self._socket.close()
+                self._socket = None
+                raise
+        else:
+            self._stream.write(data)
+            self._stream.flush()
+        self.bytes_written += len(data)
+
+    def close(self):
+        """Send the pending samples and close the destination, unless it was given open."""
+        self.flush()
+        with self._lock:
+            self._closed = True
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        self._sender.shutdown()
+        if self._socket is not None:
+            self._socket.close()
+        elif self._owns_stream:
+            self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _split_lines(data: bytes, size: int):
+    """Split encoded lines into chunks of at most ``size`` bytes of whole lines."""
+    start = 0
+    while start < len(data):
+        end = start + size
+        if end < len(data):
+            end = data.rfind(b"\n", start, end) + 1 or end
+        yield data[start:end]
+        start = end
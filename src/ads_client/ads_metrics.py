@@ -0,0 +1,53 @@
+"""Prometheus metric helpers and the optional /metrics HTTP exporter"""
+
+import logging
+import threading
+
+from prometheus_client import start_http_server
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_PORT = 9100
+
+# Seconds, from a fast local round trip to a request close to the ADS timeout
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# Variables per request, up to the largest sum commands
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def error_code_label(error) -> str:
+    """Return the ADS error code of an error as a metric label, e.g. '0x745'."""
+    err_code = getattr(error, "err_code", None)
+    return hex(err_code) if isinstance(err_code, int) else "none"
+
+
+def start_metrics_server(port: int = DEFAULT_METRICS_PORT, addr: str = "0.0.0.0"):
+    """
+    Serve the metrics of this process at http://<addr>:<port>/metrics from a daemon
+    thread. Starting a server on a port already served by this process does nothing.
+    """
+    with _servers_lock:
+        if (addr, port) in _servers:
+            return _servers[(addr, port)]
+        server = start_http_server(port, addr=addr)
+        _servers[(addr, port)] = server
+        logger.info(f"Serving metrics at http://{addr}:{port}/metrics")
+        return server
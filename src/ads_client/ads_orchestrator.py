@@ -0,0 +1,210 @@
+"""Orchestrator running a scheduler for every target of ads_targets.yaml"""
+
+from collections import deque
+from pathlib import Path
+from typing import Callable, Union
+import argparse
+import asyncio
+import logging
+import os
+
+from prometheus_client import Counter
+import yaml
+
+from ads_client.ads_connection_pool import ADSConnectionPool
+from ads_client.ads_metrics import DEFAULT_METRICS_PORT, start_metrics_server
+from ads_client.ads_scheduler import ADSScheduler
+from ads_client.ads_targets import DEFAULT_TARGETS_PATH, TargetConfig, load_targets
+
+logger = logging.getLogger(__name__)
+
+# Samples kept per target when no buffer factory is given
+DEFAULT_BUFFER_SIZE = 10_000
+
+
+class ADSOrchestrator:
+    """
+    Run an `ADSScheduler` for every target of an ads_targets.yaml file.
+
+    Each target runs in its own task with its own pooled connection, so a slow or
+    unreachable PLC only delays itself. A target whose scheduler fails is restarted
+    after ``restart_delay`` seconds. All schedulers share a semaphore capping the ADS
+    requests in flight at ``max_in_flight``, and a failing request gives up its slot
+    between retries.
+
+    The file is checked for changes every ``reload_interval`` seconds. Targets that
+    were added are started, removed ones stopped and changed ones restarted, while
+    unchanged targets keep running. A file that fails to load is logged and the
+    running targets are kept.
+
+    Samples are appended to the buffer returned by ``buffer_factory(target)`` for each
+    target, by default a deque of the latest ``DEFAULT_BUFFER_SIZE`` samples.
+
+    With a ``metrics_port`` the Prometheus metrics of the process are served at
+    ``/metrics`` on that port while the orchestrator runs.
+    """
+
+    # Class-level metrics to be shared across instances
+    restarts = Counter(
+        name="ads_client_orchestrator_restarts",
+        documentation="Number of times a failed target scheduler was restarted",
+        labelnames=["ams_net_id"],
+    )
+    reloads = Counter(
+        name="ads_client_orchestrator_reloads",
+        documentation="Number of times the targets file was reloaded",
+    )
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_TARGETS_PATH,
+        max_in_flight: int = 32,
+        reload_interval: float = 1.0,
+        restart_delay: float = 5.0,
+        buffer_factory: Callable = None,
+        connection_pool: ADSConnectionPool = None,
+        client_options: dict = None,
+        metrics_port: int = None,
+    ):
+        self.path = Path(path)
+        self.max_in_flight = max_in_flight
+        self.reload_interval = reload_interval
+        self.restart_delay = restart_delay
+        self.buffer_factory = buffer_factory or (
+            lambda target: deque(maxlen=DEFAULT_BUFFER_SIZE)
+        )
+        if connection_pool is None:
+            connection_pool = ADSConnectionPool()
+        self.connection_pool = connection_pool
+        self.client_options = client_options or {}
+        self.metrics_port = metrics_port
+        self.targets: dict[str, TargetConfig] = {}
+        self.buffers: dict[str, deque] = {}
+        self.tasks: dict[str, asyncio.Task] = {}
+        self.request_limiter: asyncio.Semaphore = None
+        self._mtime = None
+
+    async def run(self):
+        """Start every target and keep them in line with the file until cancelled."""
+        self.request_limiter = asyncio.Semaphore(self.max_in_flight)
+        if self.metrics_port is not None:
+            start_metrics_server(self.metrics_port)
+        self.reload()
+        try:
+            while True:
+                await asyncio.sleep(self.reload_interval)
+                if self._file_changed():
+                    self.reload()
+        finally:
+            await self.stop()
+
+    def _file_changed(self) -> bool:
+        try:
+            return os.stat(self.path).st_mtime_ns != self._mtime
+        except OSError as e:
+            logger.error(f"Unable to check {self.path} for changes: {e}")
+            return False
+
+    def reload(self) -> bool:
+        """Load the targets file and start, stop or restart targets to match it."""
+        try:
+            self._mtime = os.stat(self.path).st_mtime_ns
+            targets = load_targets(self.path)
+        except (OSError, ValueError, TypeError, AttributeError, yaml.YAMLError) as e:
+            logger.error(
+                f"Unable to load targets from {self.path}, keeping the running targets: {e}"
+            )
+            return False
+        self.reloads.inc()
+        # Every target holds a lease on its own connection
+        self.connection_pool.max_size = max(self.connection_pool.max_size, len(targets))
+        for name in list(self.tasks):
+            if targets.get(name) != self.targets.get(name):
+                self.stop_target(name)
+        for name, target in targets.items():
+            if name not in self.tasks and target.groups:
+                self.start_target(target)
+        self.targets = targets
+        logger.info(
+            f"Running {len(self.tasks)} of {len(targets)} targets from {self.path}"
+        )
+        return True
+
+    def start_target(self, target: TargetConfig):
+        """Start the scheduler of a target in its own task."""
+        buffer = self.buffers.get(target.name)
+        if buffer is None:
+            buffer = self.buffers[target.name] = self.buffer_factory(target)
+        self.tasks[target.name] = asyncio.get_running_loop().create_task(
+            self._supervise(target, buffer), name=f"ads-target-{target.name}"
+        )
+
+    def stop_target(self, name: str):
+        """Cancel the scheduler task of a target."""
+        task = self.tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+
+    async def stop(self):
+        """Stop every target and wait for their schedulers to close."""
+        tasks = list(self.tasks.values())
+        for name in list(self.tasks):
+            self.stop_target(name)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _supervise(self, target: TargetConfig, buffer):
+        while True:
+            scheduler = None
+            try:
+                scheduler = ADSScheduler.from_config(
+                    target,
+                    buffer,
+                    connection_pool=self.connection_pool,
+                    request_limiter=self.request_limiter,
+                    **self.client_options,
+                )
+                await scheduler.do_work_periodically()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(
+                    f"Target {target.name} failed, restarting in {self.restart_delay}s: {e!r}"
+                )
+                self.restarts.labels(target.ams_net_id).inc()
+            finally:
+                if scheduler is not None:
+                    scheduler.close()
+            await asyncio.sleep(self.restart_delay)
+
+
+def main(args=None):
+    """Run the orchestrator on a targets file until interrupted."""
+    parser = argparse.ArgumentParser(
+        description="Read every target of an ads_targets.yaml file"
+    )
+    parser.add_argument("path", nargs="?", default=str(DEFAULT_TARGETS_PATH))
+    parser.add_argument("--max-in-flight", type=int, default=32)
+    parser.add_argument("--reload-interval", type=float, default=1.0)
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        nargs="?",
+        const=DEFAULT_METRICS_PORT,
+        help="serve Prometheus metrics at /metrics on this port",
+    )
+    args = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO)
+    orchestrator = ADSOrchestrator(
+        args.path,
+        max_in_flight=args.max_in_flight,
+        reload_interval=args.reload_interval,
+        metrics_port=args.metrics_port,
+    )
+    try:
+        asyncio.run(orchestrator.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Recording of samples read from an ADS target to rolling Parquet or Arrow files"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Union
+import logging
+import threading
+import time
+
+from pyads.constants import DATATYPE_MAP
+from pyads.pyads_ex import type_is_string, type_is_wstring
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # PyArrow is an optional dependency
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_PARQUET = "parquet"
+FORMAT_ARROW = "arrow"
+FORMATS = (FORMAT_PARQUET, FORMAT_ARROW)
+
+DEFAULT_BATCH_SIZE = 10_000
+DEFAULT_MAX_FILE_SIZE = 256 * 1024 * 1024
+DEFAULT_MAX_FILE_DURATION = 3600.0
+
+# Arrow types of the struct format characters of pyads.constants.DATATYPE_MAP
+_ARROW_TYPES = {
+    "?": "bool_",
+    "b": "int8",
+    "B": "uint8",
+    "h": "int16",
+    "H": "uint16",
+    "i": "int32",
+    "I": "uint32",
+    "q": "int64",
+    "Q": "uint64",
+    "f": "float32",
+    "d": "float64",
+}
+
+
+def arrow_type(plc_datatype):
+    """Return the Arrow type of a PLCTYPE, or a fixed size list for PLCTYPE arrays."""
+    if pyarrow is None:
+        raise ImportError("PyArrow is required to record Parquet or Arrow files")
+    if type(plc_datatype).__name__ == "PyCArrayType":
+        return pyarrow.list_(arrow_type(plc_datatype._type_), plc_datatype._length_)
+    if type_is_string(plc_datatype) or type_is_wstring(plc_datatype):
+        return pyarrow.string()
+    if plc_datatype not in DATATYPE_MAP:
+        raise TypeError(f"No Arrow type for PLC type {plc_datatype!r}")
+    return getattr(pyarrow, _ARROW_TYPES[DATATYPE_MAP[plc_datatype][-1]])()
+
+
+class ArrowRecorder:
+    """
+    Record samples to rolling Parquet or Arrow IPC files in ``directory``.
+
+    Each variable of ``plc_datatypes`` is recorded in a column of the Arrow type of its
+    PLCTYPE, after a ``timestamp`` column in UTC nanoseconds, so all files share one
+    schema. `from_connection` takes the PLC types from the symbols of the target.
+
+    Variables without a PLCTYPE, such as structures, are left out with a warning.
+
+    It can be given as the ``buffer`` of an `ADSReaderClient`, as samples are added
+    with `append` like the entries of a deque and timestamped as they are added.
+    Variables missing from a sample are recorded as nulls and variables not in the
+    schema are ignored.
+
+    Every ``batch_size`` samples are converted to a record batch, compressed and
+    written on a background thread. A new file is started once a file exceeds
+    ``max_file_size`` bytes, checked as batches are written, or once samples have
+    been appended to it for ``max_file_duration`` seconds, checked as samples are
+    appended. Files are written with a ``.part`` suffix, which is removed once they are
+    complete. ``compression`` defaults to zstd for Parquet files, and to none for
+    Arrow files, so that they can be memory-mapped.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        plc_datatypes: dict,
+        prefix: str = "ads",
+        file_format: str = FORMAT_PARQUET,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+        max_file_duration: float = DEFAULT_MAX_FILE_DURATION,
+        compression: str = None,
+    ):
+        if pyarrow is None:
+            raise ImportError("PyArrow is required to record Parquet or Arrow files")
+        if file_format not in FORMATS:
+            raise ValueError(
+                f"Unknown file format '{file_format}', expected one of {FORMATS}"
+            )
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.max_file_size = max_file_size
+        self.max_file_duration = max_file_duration
+        if compression is None and file_format == FORMAT_PARQUET:
+            compression = "zstd"
+        self.compression = compression
+        skipped = [
+            data_name
+            for data_name, plc_datatype in plc_datatypes.items()
+            if plc_datatype is None
+        ]
+        if skipped:
+            logger.warning(f"Not recording {skipped}, which have no PLC type")
+        plc_datatypes = {
+            data_name: plc_datatype
+            for data_name, plc_datatype in plc_datatypes.items()
+            if plc_datatype is not None
+        }
+        self.schema = pyarrow.schema(
+            [pyarrow.field("timestamp", pyarrow.timestamp("ns", tz="UTC"), False)]
+            + [
+                pyarrow.field(data_name, arrow_type(plc_datatype))
+                for data_name, plc_datatype in plc_datatypes.items()
+            ]
+        )
+        self.files: list[Path] = []
+        self.rows_written = 0
+        self._data_names = list(plc_datatypes)
+        self._timestamps = []
+        self._columns = {data_name: [] for data_name in self._data_names}
+        self._lock = threading.Lock()
+        # A single thread, so that batches are written in order
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._writer = None
+        self._sink = None
+        self._path: Path = None
+        # When the first sample of the current file was appended
+        self._file_started: float = None
+
+    @classmethod
+    def from_connection(cls, connection, data_names: list, directory, **kwargs):
+        """Create a recorder of variables typed as declared in the PLC."""
+        return cls(directory, connection.get_plc_datatypes(data_names), **kwargs)
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def append(self, values: dict, timestamp: int = None):
+        """Add a sample, timestamped now unless given in nanoseconds since the epoch."""
+        if timestamp is None:
+            timestamp = time.time_ns()
+        now = time.monotonic()
+        with self._lock:
+            if self._file_started is None:
+                self._file_started = now
+            elif now - self._file_started >= self.max_file_duration:
+                # The sample is the first of the next file
+                self._submit(roll=True)
+                self._file_started = now
+            self._timestamps.append(timestamp)
+            for data_name, column in self._columns.items():
+                column.append(values.get(data_name))
+            if len(self._timestamps) >= self.batch_size:
+                self._submit()
+
+    def flush(self) -> Future:
+        """Write the pending samples, returning the future of the write."""
+        with self._lock:
+            return self._submit()
+
+    def close(self):
+        """Write the pending samples, complete the current file and stop the thread."""
+        self.flush()
+        self._executor.submit(self._close_file)
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _submit(self, roll: bool = False) -> Future:
+        timestamps, self._timestamps = self._timestamps, []
+        columns = self._columns
+        self._columns = {data_name: [] for data_name in self._data_names}
+        future = self._executor.submit(self._write_batch, timestamps, columns, roll)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    def _log_failure(self, future: Future):
+        if future.exception() is not None:
+            logger.error(
+                f"Recording to {self.directory} failed: {future.exception()!r}"
+            )
+
+    def _write_batch(self, timestamps: list, columns: dict, roll: bool = False):
+        """Write a batch, completing the file if ``roll`` is set or it is full."""
+        if not timestamps:
+            if roll:
+                self._close_file()
+            return
+        arrays = [pyarrow.array(timestamps, type=self.schema.field(0).type)]
+        for data_name, values in columns.items():
+            arrays.append(pyarrow.array(values, type=self.schema.field(data_name).type))
+        batch = pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if self._writer is None:
+            self._open_file()
+        self._writer.write_batch(batch)
+        self.rows_written += batch.num_rows
+        if roll or self._sink.tell() >= self.max_file_size:
+            self._close_file()
+
+    def _open_file(self):
+        started = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        self._path = self.directory / f"{self.prefix}-{started}.{self.file_format}"
+        self._sink = pyarrow.OSFile(str(self._path) + ".part", "wb")
+        if self.file_format == FORMAT_PARQUET:
+            self._writer = pyarrow.parquet.ParquetWriter(
+                self._sink, self.schema, compression=self.compression
+            )
+        else:
+            self._writer = pyarrow.ipc.new_file(
+                self._sink,
+                self.schema,
+                options=pyarrow.ipc.IpcWriteOptions(compression=self.compression),
+            )
+
+    def _close_file(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._sink.close()
+        Path(str(self._path) + ".part").rename(self._path)
+        self.files.append(self._path)
+        self._writer = None
+        self._sink = None
@@ -0,0 +1,194 @@
+"""Retry backoff, per-target circuit breakers and failure events for ADS clients"""
+
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+import logging
+import random
+import threading
+import time
+
+import pyads
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+# ADS errors of the route or connection to the target rather than of the request,
+# after which the connection is re-established
+TRANSPORT_ERRORS = frozenset(
+    (
+        0x6,  # Target port not found
+        0x7,  # Target machine not found
+        0xD,  # Port not connected
+        0x12,  # Port disabled
+        0x15,  # AMS sync timeout
+        0x18,  # Invalid AMS port
+        0x1A,  # TCP send error
+        0x1B,  # Host unreachable
+        0x745,  # Timeout elapsed
+        0x748,  # ADS port not opened
+        0x754,  # Invalid response received
+        0x274C,  # Socket operation to an unreachable host
+        0x274D,  # Connection attempt timed out
+        0x2751,  # Connection refused
+    )
+)
+
+
+def is_transport_error(error: pyads.ADSError) -> bool:
+    """Whether an ADSError was caused by the connection rather than the request."""
+    # Errors raised without a code are not known to be caused by the connection
+    return getattr(error, "err_code", None) in TRANSPORT_ERRORS
+
+
+class Backoff:
+    """
+    Exponential backoff between retries. The delay before retry ``n`` grows from
+    ``initial`` by ``multiplier`` per attempt up to ``maximum`` seconds, and a random
+    fraction of up to ``jitter`` of it is taken off so clients do not retry in step.
+    """
+
+    def __init__(
+        self,
+        initial: float = 0.1,
+        maximum: float = 10.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.5,
+    ):
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        """Return the seconds to wait after the given failed attempt, counted from 0."""
+        delay = min(self.maximum, self.initial * self.multiplier**attempt)
+        return delay * (1 - self.jitter * random.random())
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker shared by the clients of one target.
+
+    The circuit opens after ``failure_threshold`` consecutive requests failed with a
+    transport error, and requests are then refused without reaching the target. After
+    ``reset_timeout`` seconds it is half-open and a single trial request is let
+    through, closing the circuit if it succeeds and opening it again if it fails.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    # Class-level metrics to be shared across instances
+    transitions = Counter(
+        name="ads_client_circuit_breaker_transitions",
+        documentation="Number of times a circuit breaker changed state",
+        labelnames=["ams_net_id", "state"],
+    )
+
+    def __init__(
+        self, ams_net_id: str, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ):
+        self.ams_net_id = ams_net_id
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Return the state of the circuit, half-open once the reset timeout passed."""
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout
+        ):
+            return self.HALF_OPEN
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent, claiming the trial if the circuit is half-open."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.OPEN:
+                return False
+            # A trial that never reported back, e.g. as it was cancelled, expires
+            now = time.monotonic()
+            if (
+                self._trial_started is not None
+                and now - self._trial_started < self.reset_timeout
+            ):
+                return False
+            self._trial_started = now
+            self._set_state(self.HALF_OPEN)
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_started = None
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+            self._trial_started = None
+
+    def _set_state(self, state: str):
+        if state == self._state:
+            return
+        logger.info(f"Circuit of {self.ams_net_id} is now {state}")
+        self._state = state
+        self.transitions.labels(self.ams_net_id, state).inc()
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(
+    ams_net_id: str, ams_net_port: int = pyads.PORT_TC3PLC1, **kwargs
+) -> CircuitBreaker:
+    """Return the process-wide circuit breaker of a target, creating it on first use."""
+    key = (ams_net_id, ams_net_port)
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(key)
+        if breaker is None:
+            breaker = _circuit_breakers[key] = CircuitBreaker(ams_net_id, **kwargs)
+        return breaker
+
+
+class FailureEvent(NamedTuple):
+    """A failed attempt of a client operation."""
+
+    client: str
+    ams_net_id: str
+    attempt: int
+    error_code: Optional[int]
+    error: str
+    transport_error: bool
+    circuit_state: str
+    timestamp: datetime
+
+    @classmethod
+    def from_error(
+        cls, client, attempt: int, error: pyads.ADSError, circuit_state: str
+    ) -> "FailureEvent":
+        err_code = getattr(error, "err_code", None)
+        return cls(
+            client=client.name,
+            ams_net_id=client.target.ams_net_id,
+            attempt=attempt,
+            error_code=err_code if isinstance(err_code, int) else None,
+            error=str(error),
+            transport_error=is_transport_error(error),
+            circuit_state=circuit_state,
+            timestamp=datetime.now(timezone.utc),
+        )
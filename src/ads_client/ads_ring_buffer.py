@@ -0,0 +1,206 @@
+"""Fixed-capacity columnar ring buffer of samples read from an ADS target"""
+
+from typing import Union
+import asyncio
+import threading
+import time
+
+from pyads.constants import DATATYPE_MAP
+
+from ads_client.ads_codec import numpy_dtype
+
+try:
+    import numpy
+except ImportError:  # NumPy is an optional dependency
+    numpy = None
+
+# Policies of ColumnarRingBuffer when a sample is appended while it is full
+OVERWRITE = "overwrite"
+BLOCK = "block"
+POLICIES = (OVERWRITE, BLOCK)
+
+
+class BufferFullError(BufferError):
+    """Raised when a sample cannot be appended to a full ring buffer in time."""
+
+
+class ColumnarRingBuffer:
+    """
+    Samples of ``data_names`` kept in one preallocated NumPy column per variable,
+    alongside an int64 column of timestamps in nanoseconds since the epoch.
+
+    It can be given as the ``buffer`` of an `ADSReaderClient`, as samples are added
+    with `append` like the entries of a deque. ``dtypes`` maps variable names to a
+    PLCTYPE or a NumPy dtype, ``float64`` by default. A subarray dtype such as
+    ``("f8", (16,))`` holds an array variable in each row.
+
+    Once ``capacity`` samples are held, appending drops the oldest sample with the
+    ``overwrite`` policy. With the ``block`` policy it waits up to ``timeout`` seconds
+    for a consumer in another thread to `consume` samples, and raises
+    `BufferFullError` otherwise. Waiting would stall an event loop, so a ``block``
+    buffer is only filled from threads without one, e.g. not by an `ADSReaderClient`.
+
+    Samples are read as dicts of columns in the order they were appended, with the
+    ``timestamp`` column first. Variables missing from a sample, e.g. because their
+    read failed or they were left out as unchanged, keep the value of the previous
+    sample and are masked when reading with ``masked``.
+    """
+
+    def __init__(
+        self,
+        data_names: list,
+        capacity: int,
+        dtypes: dict = None,
+        policy: str = OVERWRITE,
+        timeout: float = None,
+    ):
+        if numpy is None:
+            raise ImportError("NumPy is required for ColumnarRingBuffer")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}', expected one of {POLICIES}")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        dtypes = dtypes or {}
+        self.data_names = list(data_names)
+        self.capacity = capacity
+        self.policy = policy
+        self.timeout = timeout
+        self.overwritten = 0
+        self.timestamps = numpy.zeros(capacity, dtype=numpy.int64)
+        self.columns = {
+            data_name: numpy.zeros(capacity, dtype=_column_dtype(dtypes.get(data_name)))
+            for data_name in self.data_names
+        }
+        self._index = {data_name: i for i, data_name in enumerate(self.data_names)}
+        self._valid = numpy.zeros((capacity, len(self.data_names)), dtype=bool)
+        self._head = 0
+        self._size = 0
+        self._not_full = threading.Condition()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def full(self) -> bool:
+        return self._size == self.capacity
+
+    def append(self, values: dict, timestamp: int = None):
+        """Add a sample, timestamped now unless given in nanoseconds since the epoch."""
+        if self.policy == BLOCK and _in_event_loop():
+            raise RuntimeError(
+                "A ring buffer with the block policy cannot be appended to from an event loop"
+            )
+        if timestamp is None:
+            timestamp = time.time_ns()
+        with self._not_full:
+            if self._size == self.capacity:
+                if self.policy == BLOCK:
+                    if not self._not_full.wait_for(
+                        lambda: self._size < self.capacity, self.timeout
+                    ):
+                        raise BufferFullError(
+                            f"Ring buffer of {self.capacity} samples is full"
+                        )
+                else:
+                    self._head = (self._head + 1) % self.capacity
+                    self._size -= 1
+                    self.overwritten += 1
+            row = (self._head + self._size) % self.capacity
+            self.timestamps[row] = timestamp
+            valid = self._valid[row]
+            valid[:] = False
+            for data_name, value in values.items():
+                index = self._index.get(data_name)
+                if index is None:
+                    continue
+                self.columns[data_name][row] = value
+                valid[index] = True
+            if self._size and not valid.all():
+                previous = (row - 1) % self.capacity
+                for index in numpy.flatnonzero(~valid):
+                    column = self.columns[self.data_names[index]]
+                    column[row] = column[previous]
+            self._size += 1
+
+    def __getitem__(self, key: Union[int, slice]) -> dict:
+        """Return a sample, or a slice of the samples as a dict of columns."""
+        with self._not_full:
+            if isinstance(key, slice):
+                return self._select(self._rows(numpy.arange(*key.indices(self._size))))
+            if key < 0:
+                key += self._size
+            if not 0 <= key < self._size:
+                raise IndexError("ring buffer index out of range")
+            row = self._rows(key)
+            values = {"timestamp": int(self.timestamps[row])}
+            for data_name, column in self.columns.items():
+                if self._valid[row, self._index[data_name]]:
+                    values[data_name] = column[row].tolist()
+            return values
+
+    def column(self, data_name: str, masked: bool = False):
+        """Return the values of a variable, oldest first."""
+        with self._not_full:
+            rows = self._rows(numpy.arange(self._size))
+            return self._column(data_name, rows, masked)
+
+    def window(self, start: int = None, end: int = None, masked: bool = False) -> dict:
+        """Return the samples timestamped from ``start`` up to ``end`` nanoseconds."""
+        with self._not_full:
+            rows = self._rows(numpy.arange(self._size))
+            # Samples are appended in order, so their timestamps are sorted
+            timestamps = self.timestamps[rows]
+            first = 0 if start is None else numpy.searchsorted(timestamps, start)
+            last = len(rows) if end is None else numpy.searchsorted(timestamps, end)
+            return self._select(rows[first:last], masked)
+
+    def consume(self, count: int = None, masked: bool = False) -> dict:
+        """Remove the ``count`` oldest samples, or all of them, and return them."""
+        with self._not_full:
+            count = self._size if count is None else min(count, self._size)
+            values = self._select(self._rows(numpy.arange(count)), masked)
+            self._head = (self._head + count) % self.capacity
+            self._size -= count
+            self._not_full.notify_all()
+            return values
+
+    def clear(self):
+        self.consume()
+
+    def _rows(self, positions):
+        """Return the rows of samples by their position, 0 being the oldest."""
+        return (self._head + positions) % self.capacity
+
+    def _column(self, data_name: str, rows, masked: bool):
+        values = self.columns[data_name][rows]
+        if not masked:
+            return values
+        valid = self._valid[rows, self._index[data_name]]
+        if values.ndim > 1:
+            shape = (-1,) + (1,) * (values.ndim - 1)
+            valid = numpy.broadcast_to(valid.reshape(shape), values.shape).copy()
+        return numpy.ma.MaskedArray(values, mask=~valid)
+
+    def _select(self, rows, masked: bool = False) -> dict:
+        values = {"timestamp": self.timestamps[rows]}
+        for data_name in self.data_names:
+            values[data_name] = self._column(data_name, rows, masked)
+        return values
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _column_dtype(dtype):
+    if dtype is None:
+        return numpy.float64
+    if type(dtype).__name__ == "PyCArrayType":
+        return numpy.dtype((numpy_dtype(dtype), dtype._length_))
+    if dtype in DATATYPE_MAP:
+        return numpy_dtype(dtype)
+    return numpy.dtype(dtype)
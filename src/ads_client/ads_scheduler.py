@@ -0,0 +1,165 @@
+"""Multi-rate acquisition reading groups of variables of one target on a shared clock"""
+
+from typing import Union
+from collections import deque
+import asyncio
+import logging
+import math
+import time
+
+from prometheus_client import Counter
+
+from ads_client.ads_client import ADSClient, Ticker, id_generator
+from ads_client.ads_connection_pool import ADSConnectionPool
+from ads_client.ads_resilience import Backoff, CircuitBreaker
+from ads_client.ads_targets import TagGroup, TargetConfig
+
+logger = logging.getLogger(__name__)
+
+
+def base_interval(intervals) -> float:
+    """Return the longest interval all the given intervals are a multiple of."""
+    return math.gcd(*(round(interval * 1e6) for interval in intervals)) / 1e6
+
+
+class ADSScheduler(ADSClient):
+    """
+    Reader polling groups of variables at different rates over one connection.
+
+    The scheduler ticks at the greatest common divisor of the group intervals on a
+    clock aligned to ``time.monotonic``. The variables of every group due on a tick
+    are read together with one sum read, and the values are appended to ``buffer`` as
+    a single dict. A group whose tick was missed is read on the next tick instead.
+    Skipped ticks are counted as missed, and ticks whose read outlasted the tick
+    interval as overruns.
+    """
+
+    client_id = id_generator(prefix="scheduler")
+
+    # Class-level metrics to be shared across instances
+    ticks = Counter(
+        name="ads_client_scheduler_ticks",
+        documentation="Number of scheduler ticks on which variables were read",
+        labelnames=["ams_net_id"],
+    )
+    missed_ticks = Counter(
+        name="ads_client_scheduler_missed_ticks",
+        documentation="Number of scheduler ticks skipped because the scheduler ran late",
+        labelnames=["ams_net_id"],
+    )
+    overruns = Counter(
+        name="ads_client_scheduler_overruns",
+        documentation="Number of scheduler ticks whose read outlasted the tick interval",
+        labelnames=["ams_net_id"],
+    )
+
+    def __init__(
+        self,
+        buffer: Union[list, deque],
+        groups: list,
+        name: str = None,
+        ams_net_id=None,
+        ip_address=None,
+        ams_net_port=None,
+        retry_attempts: int = 10,
+        retain_connection: bool = False,
+        connection_pool: ADSConnectionPool = None,
+        request_limiter: asyncio.Semaphore = None,
+        backoff: Backoff = None,
+        circuit_breaker: CircuitBreaker = None,
+    ):
+        self.groups = [TagGroup(*group) for group in groups]
+        if not self.groups:
+            raise ValueError("At least one group of variables is required")
+        super().__init__(
+            name=name,
+            ams_net_id=ams_net_id,
+            ip_address=ip_address,
+            ams_net_port=ams_net_port,
+            update_interval=base_interval(
+                group.update_interval for group in self.groups
+            ),
+            retry_attempts=retry_attempts,
+            retain_connection=retain_connection,
+            connection_pool=connection_pool,
+            request_limiter=request_limiter,
+            backoff=backoff,
+            circuit_breaker=circuit_breaker,
+        )
+        self.buffer = buffer
+        # Group intervals in ticks, and the tick each group is next due
+        self.periods = [
+            max(round(group.update_interval / self.update_interval), 1)
+            for group in self.groups
+        ]
+        self._next_due = [0] * len(self.groups)
+        self.missed_tick_count = 0
+        self.overrun_count = 0
+
+    @classmethod
+    def from_config(
+        cls, target: TargetConfig, buffer: Union[list, deque], **kwargs
+    ) -> "ADSScheduler":
+        """Create a scheduler for a target loaded from ads_targets.yaml."""
+        return cls(
+            buffer=buffer,
+            groups=target.groups,
+            name=kwargs.pop("name", target.name),
+            ams_net_id=target.ams_net_id,
+            ip_address=target.ip_address,
+            ams_net_port=target.ams_net_port,
+            **kwargs,
+        )
+
+    def due_groups(self, tick: int) -> list:
+        """Return the groups due on a tick, including any whose tick was missed."""
+        groups = []
+        for index, group in enumerate(self.groups):
+            if self._next_due[index] <= tick:
+                groups.append(group)
+                period = self.periods[index]
+                self._next_due[index] = (tick // period + 1) * period
+        return groups
+
+    async def do_work(self, tick: int = 0) -> bool:
+        """
+        Read the variables of every group due on a tick with one sum read, and return
+        whether the read succeeded.
+        """
+        data_names = list(
+            dict.fromkeys(
+                data_name
+                for group in self.due_groups(tick)
+                for data_name in group.data_names
+            )
+        )
+        if not data_names:
+            return True
+
+        async def read_operation():
+            read_data = self.check_read(
+                await self.target.read_list_by_name_async(data_names)
+            )
+            if read_data:
+                self.buffer.append(read_data)
+
+        return await self._perform_operation(read_operation)
+
+    async def do_work_periodically(self):
+        ticker = Ticker(self.update_interval)
+        while True:
+            missed = ticker.missed
+            tick = await ticker.wait()
+            if ticker.missed > missed:
+                self._record_missed(ticker.missed - missed)
+            started = time.monotonic()
+            await self.do_work(tick)
+            self.ticks.labels(self.target.ams_net_id).inc()
+            if time.monotonic() - started > self.update_interval:
+                self.overrun_count += 1
+                self.overruns.labels(self.target.ams_net_id).inc()
+
+    def _record_missed(self, missed: int):
+        logger.warning(f"Scheduler {self.name} missed {missed} ticks")
+        self.missed_tick_count += missed
+        self.missed_ticks.labels(self.target.ams_net_id).inc(missed)
@@ -0,0 +1,132 @@
+"""Bounded queue of snapshots streamed from an ADS target"""
+
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, NamedTuple
+import asyncio
+
+# Modes of ADSConnection.stream: read the variables every interval, or subscribe to
+# device notifications of their changes
+STREAM_POLL = "poll"
+STREAM_NOTIFY = "notify"
+STREAM_MODES = (STREAM_POLL, STREAM_NOTIFY)
+
+# What a stream does with a new snapshot while its consumer has not taken the queued
+# ones: drop the oldest, wait for the consumer, or merge it into the newest
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_BLOCK = "block"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOWS = (OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK, OVERFLOW_COALESCE)
+
+
+class Snapshot(NamedTuple):
+    """
+    Values of variables sampled together, with the UTC time they were sampled at and
+    the ADS error codes of variables that could not be read, if any.
+    """
+
+    timestamp: datetime
+    values: dict
+    errors: dict = None
+
+    def merge(self, newer: "Snapshot") -> "Snapshot":
+        """Return a snapshot updated with the values of a newer one."""
+        newer_errors = newer.errors or {}
+        errors = {
+            data_name: error
+            for data_name, error in {**(self.errors or {}), **newer_errors}.items()
+            if data_name not in newer.values
+        }
+        values = {
+            data_name: value
+            for data_name, value in self.values.items()
+            if data_name not in newer_errors
+        }
+        return Snapshot(newer.timestamp, {**values, **newer.values}, errors)
+
+
+class SnapshotQueue:
+    """
+    Snapshots waiting for the consumer of a stream, at most ``maxsize`` of them.
+
+    A new snapshot arriving while the queue is full is handled as set by ``overflow``,
+    calling ``on_overflow`` when it drops or coalesces snapshots. The queue serves one
+    producer and one consumer in the same event loop.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+        on_overflow: Callable[[], Any] = None,
+    ):
+        if overflow not in OVERFLOWS:
+            raise ValueError(
+                f"Unknown overflow policy '{overflow}', expected one of {OVERFLOWS}"
+            )
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.on_overflow = on_overflow
+        self._snapshots: deque[Snapshot] = deque()
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._error: BaseException = None
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def full(self) -> bool:
+        return len(self._snapshots) >= self.maxsize
+
+    def put_nowait(self, snapshot: Snapshot):
+        """Queue a snapshot, raising `asyncio.QueueFull` if full and blocking."""
+        if self.full():
+            if self.overflow == OVERFLOW_BLOCK:
+                raise asyncio.QueueFull
+            if self.on_overflow is not None:
+                self.on_overflow()
+            if self.overflow == OVERFLOW_COALESCE:
+                self._snapshots[-1] = self._snapshots[-1].merge(snapshot)
+                return
+            self._snapshots.popleft()
+        self._snapshots.append(snapshot)
+        self._readable.set()
+        if self.full():
+            self._writable.clear()
+
+    async def put(self, snapshot: Snapshot):
+        """Queue a snapshot, waiting for the consumer if full and blocking."""
+        while self.overflow == OVERFLOW_BLOCK and self.full():
+            await self._writable.wait()
+        self.put_nowait(snapshot)
+
+    def put_sample(self, timestamp: datetime, data_name: str, value: Any):
+        """
+        Queue a notification sample, adding it to the newest snapshot if it was sampled
+        at the same time and does not hold the variable yet.
+        """
+        if self._snapshots:
+            newest = self._snapshots[-1]
+            if newest.timestamp == timestamp and data_name not in newest.values:
+                newest.values[data_name] = value
+                return
+        self.put_nowait(Snapshot(timestamp, {data_name: value}, {}))
+
+    def fail(self, error: BaseException):
+        """Raise an error to the consumer once it has taken the queued snapshots."""
+        self._error = error
+        self._readable.set()
+
+    async def get(self) -> Snapshot:
+        """Take the oldest snapshot, waiting for one if the queue is empty."""
+        while not self._snapshots:
+            if self._error is not None:
+                raise self._error
+            self._readable.clear()
+            await self._readable.wait()
+        snapshot = self._snapshots.popleft()
+        self._writable.set()
+        return snapshot
@@ -0,0 +1,120 @@
+"""Cache of symbol information and handles of an ADS target, tied to its symbol version"""
+
+from typing import Optional
+import logging
+import time
+
+from prometheus_client import Counter
+from pyads.structs import SAdsSymbolEntry
+
+logger = logging.getLogger(__name__)
+
+# ADS errors returned when a cached handle or symbol no longer matches the PLC program
+ADSERR_DEVICE_SYMBOLNOTFOUND = 0x710
+ADSERR_DEVICE_SYMBOLVERSIONINVALID = 0x711
+STALE_SYMBOL_ERRORS = (ADSERR_DEVICE_SYMBOLNOTFOUND, ADSERR_DEVICE_SYMBOLVERSIONINVALID)
+
+
+class SymbolCache:
+    """
+    Symbol information and handles of one ADS target, keyed by variable name.
+
+    Entries are only valid for one symbol version of the PLC program. The version is
+    re-read at most every ``version_check_interval`` seconds and any change, such as
+    an online change or a new download, clears the cache. Handles dropped from the
+    cache are returned to the caller, which is responsible for releasing them.
+    """
+
+    # Class-level metrics to be shared across instances
+    hits = Counter(
+        name="ads_client_symbol_cache_hits",
+        documentation="Number of symbol lookups served from the cache",
+        labelnames=["ams_net_id"],
+    )
+    misses = Counter(
+        name="ads_client_symbol_cache_misses",
+        documentation="Number of symbol lookups resolved on the target",
+        labelnames=["ams_net_id"],
+    )
+    invalidations = Counter(
+        name="ads_client_symbol_cache_invalidations",
+        documentation="Number of times the symbol cache was cleared",
+        labelnames=["ams_net_id"],
+    )
+
+    def __init__(
+        self,
+        ams_net_id: str,
+        symbol_infos: dict = None,
+        version_check_interval: float = 1.0,
+    ):
+        self.ams_net_id = ams_net_id
+        # May be shared with pyads' own symbol info cache of the connection
+        self.symbol_infos = {} if symbol_infos is None else symbol_infos
+        self.handles: dict[str, int] = {}
+        self.version: Optional[int] = None
+        self.version_check_interval = version_check_interval
+        self._last_version_check: Optional[float] = None
+
+    def symbol_info(self, data_name: str) -> Optional[SAdsSymbolEntry]:
+        """Return the cached symbol information of a variable, or None."""
+        info = self.symbol_infos.get(data_name)
+        self._count(info)
+        return info
+
+    def handle(self, data_name: str) -> Optional[int]:
+        """Return the cached handle of a variable, or None."""
+        handle = self.handles.get(data_name)
+        self._count(handle)
+        return handle
+
+    def _count(self, entry):
+        if entry is None:
+            self.misses.labels(self.ams_net_id).inc()
+        else:
+            self.hits.labels(self.ams_net_id).inc()
+
+    @property
+    def version_check_due(self) -> bool:
+        """Whether the symbol version should be read before using the cache."""
+        return (
+            self._last_version_check is None
+            or time.monotonic() - self._last_version_check
+            >= self.version_check_interval
+        )
+
+    def update_version(self, version: int) -> list:
+        """
+        Record the symbol version read from the target.
+        Clear the cache if it changed and return the handles that were dropped.
+        """
+        self._last_version_check = time.monotonic()
+        previous, self.version = self.version, version
+        if previous is not None and version != previous:
+            logger.info(
+                f"Symbol version of {self.ams_net_id} changed from {previous} to {version}"
+            )
+            return self.invalidate()
+        return []
+
+    def expire_version(self):
+        """Read the symbol version again before the cache is next used."""
+        self._last_version_check = None
+
+    def invalidate(self) -> list:
+        """Clear the cache and return the handles that were dropped."""
+        self.invalidations.labels(self.ams_net_id).inc()
+        self.symbol_infos.clear()
+        return self.pop_handles()
+
+    def pop_handles(self) -> list:
+        """Remove every handle from the cache and return them."""
+        handles = list(self.handles.values())
+        self.handles.clear()
+        return handles
+
+    def __len__(self):
+        return len(self.symbol_infos)
+
+    def __contains__(self, data_name: str):
+        return data_name in self.symbol_infos
@@ -0,0 +1,427 @@
+"""On-disk index of PLC symbol tables with glob queries, keyed by target and symbol version"""
+
+from itertools import islice, product
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional, Union
+import logging
+import sqlite3
+import struct
+import threading
+import time
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYMBOL_INDEX_PATH = Path.home() / ".cache" / "ads_client" / "symbols.sqlite3"
+
+# Fixed-size headers of the entries of the symbol and data type uploads
+SYMBOL_ENTRY_HEADER = struct.Struct("<IIIIIIHHH")
+DATATYPE_ENTRY_HEADER = struct.Struct("<IIIIIIIIHHHHH")
+ARRAY_INFO = struct.Struct("<II")
+UPLOAD_INFO = struct.Struct("<IIII")
+
+# Nesting depth at which data types are no longer expanded into members
+MAX_EXPANSION_DEPTH = 16
+# Arrays of more elements are indexed as one symbol rather than per element
+MAX_EXPANDED_ARRAY_ELEMENTS = 1024
+# Members and elements indexed per symbol at most, however its type nests
+MAX_EXPANDED_MEMBERS = 65536
+
+# Version of the schema, stored as the user_version of the database. Indexes of
+# other versions are dropped and uploaded again
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbol_tables (
+    ams_net_id TEXT NOT NULL,
+    ams_net_port INTEGER NOT NULL,
+    symbol_version INTEGER NOT NULL,
+    symbol_count INTEGER NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (ams_net_id, ams_net_port, symbol_version)
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    ams_net_id TEXT NOT NULL,
+    ams_net_port INTEGER NOT NULL,
+    symbol_version INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    folded_name TEXT NOT NULL,
+    index_group INTEGER NOT NULL,
+    index_offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    data_type INTEGER NOT NULL,
+    symbol_type TEXT NOT NULL,
+    comment TEXT NOT NULL,
+    is_member INTEGER NOT NULL,
+    PRIMARY KEY (ams_net_id, ams_net_port, symbol_version, folded_name)
+) WITHOUT ROWID;
+"""
+
+
+class IndexedSymbol(NamedTuple):
+    """A symbol, or a member or element of one, as stored in the index."""
+
+    name: str
+    index_group: int
+    index_offset: int
+    size: int
+    data_type: int
+    symbol_type: str
+    comment: str = ""
+    # Whether the symbol was expanded from the data type of an uploaded symbol
+    is_member: bool = False
+
+
+class _Datatype(NamedTuple):
+    name: str
+    type_name: str
+    size: int
+    offset: int
+    data_type: int
+    array_info: tuple
+    sub_items: tuple
+
+
+def _decode(data: bytes) -> str:
+    return bytes(data).decode("windows-1252")
+
+
+def parse_symbol_upload(data: bytes, count: int = None) -> Iterator[IndexedSymbol]:
+    """Parse the symbol table returned by ADSIGRP_SYM_UPLOAD."""
+    data = memoryview(data)
+    offset = 0
+    while offset + SYMBOL_ENTRY_HEADER.size <= len(data) and count != 0:
+        (
+            entry_length,
+            index_group,
+            index_offset,
+            size,
+            data_type,
+            _,
+            name_length,
+            type_length,
+            comment_length,
+        ) = SYMBOL_ENTRY_HEADER.unpack_from(data, offset)
+        if entry_length == 0:
+            break
+        start = offset + SYMBOL_ENTRY_HEADER.size
+        name = _decode(data[start : start + name_length])
+        start += name_length + 1
+        symbol_type = _decode(data[start : start + type_length])
+        start += type_length + 1
+        comment = _decode(data[start : start + comment_length])
+        yield IndexedSymbol(
+            name, index_group, index_offset, size, data_type, symbol_type, comment
+        )
+        offset += entry_length
+        if count is not None:
+            count -= 1
+
+
+def _parse_datatype_entry(data: memoryview, offset: int) -> tuple:
+    (
+        entry_length,
+        _,
+        _,
+        _,
+        size,
+        member_offset,
+        data_type,
+        _,
+        name_length,
+        type_length,
+        comment_length,
+        array_dimensions,
+        sub_item_count,
+    ) = DATATYPE_ENTRY_HEADER.unpack_from(data, offset)
+    start = offset + DATATYPE_ENTRY_HEADER.size
+    name = _decode(data[start : start + name_length])
+    start += name_length + 1
+    type_name = _decode(data[start : start + type_length])
+    start += type_length + 1 + comment_length + 1
+    array_info = []
+    for _ in range(array_dimensions):
+        array_info.append(ARRAY_INFO.unpack_from(data, start))
+        start += ARRAY_INFO.size
+    sub_items = []
+    for _ in range(sub_item_count):
+        sub_item, start = _parse_datatype_entry(data, start)
+        sub_items.append(sub_item)
+    datatype = _Datatype(
+        name,
+        type_name,
+        size,
+        member_offset,
+        data_type,
+        tuple(array_info),
+        tuple(sub_items),
+    )
+    return datatype, offset + entry_length
+
+
+def parse_datatype_upload(data: bytes, count: int = None) -> dict:
+    """Parse the data types returned by ADSIGRP_SYM_DT_UPLOAD, keyed by type name."""
+    data = memoryview(data)
+    datatypes = {}
+    offset = 0
+    while offset + DATATYPE_ENTRY_HEADER.size <= len(data) and count != 0:
+        if struct.unpack_from("<I", data, offset)[0] == 0:
+            break
+        datatype, offset = _parse_datatype_entry(data, offset)
+        datatypes[datatype.name] = datatype
+        if count is not None:
+            count -= 1
+    return datatypes
+
+
+def _expand_datatype(
+    name: str,
+    index_group: int,
+    index_offset: int,
+    datatype: _Datatype,
+    datatypes: dict,
+    max_array_elements: int,
+    depth: int = 0,
+) -> Iterator[IndexedSymbol]:
+    if depth >= MAX_EXPANSION_DEPTH:
+        return
+    if datatype.array_info:
+        element_count = 1
+        for _, elements in datatype.array_info:
+            element_count *= elements
+        if element_count > max_array_elements:
+            logger.debug(f"Not expanding the {element_count} elements of {name}")
+            return
+        element_size = datatype.size // element_count if element_count else 0
+        element_type = datatypes.get(datatype.type_name)
+        ranges = [
+            range(lower_bound, lower_bound + elements)
+            for lower_bound, elements in datatype.array_info
+        ]
+        for n, indices in enumerate(product(*ranges)):
+            element_name = f"{name}[{','.join(str(i) for i in indices)}]"
+            element_offset = index_offset + n * element_size
+            yield IndexedSymbol(
+                element_name,
+                index_group,
+                element_offset,
+                element_size,
+                element_type.data_type if element_type else datatype.data_type,
+                datatype.type_name,
+                is_member=True,
+            )
+            if element_type is not None:
+                yield from _expand_datatype(
+                    element_name,
+                    index_group,
+                    element_offset,
+                    element_type,
+                    datatypes,
+                    max_array_elements,
+                    depth + 1,
+                )
+        return
+    for sub_item in datatype.sub_items:
+        member_name = f"{name}.{sub_item.name}"
+        member_offset = index_offset + sub_item.offset
+        yield IndexedSymbol(
+            member_name,
+            index_group,
+            member_offset,
+            sub_item.size,
+            sub_item.data_type,
+            sub_item.type_name,
+            is_member=True,
+        )
+        member_type = (
+            sub_item if sub_item.array_info else datatypes.get(sub_item.type_name)
+        )
+        if member_type is not None:
+            yield from _expand_datatype(
+                member_name,
+                index_group,
+                member_offset,
+                member_type,
+                datatypes,
+                max_array_elements,
+                depth + 1,
+            )
+
+
+def expand_symbols(
+    symbols,
+    datatypes: dict,
+    max_array_elements: int = MAX_EXPANDED_ARRAY_ELEMENTS,
+    max_members: int = MAX_EXPANDED_MEMBERS,
+) -> Iterator[IndexedSymbol]:
+    """
+    Yield every symbol followed by the array elements and members of its type.
+    Arrays of more than ``max_array_elements`` elements are not expanded, and at most
+    ``max_members`` members and elements are yielded per symbol.
+    """
+    for symbol in symbols:
+        yield symbol
+        datatype = datatypes.get(symbol.symbol_type)
+        if datatype is None:
+            continue
+        members = _expand_datatype(
+            symbol.name,
+            symbol.index_group,
+            symbol.index_offset,
+            datatype,
+            datatypes,
+            max_array_elements,
+        )
+        yield from islice(members, max_members)
+        if next(members, None) is not None:
+            logger.warning(
+                f"Indexed only the first {max_members} members of {symbol.name}"
+            )
+
+
+def glob_to_sqlite(pattern: str) -> str:
+    """
+    Convert a symbol glob such as ``GVL.aMotors[*].fPos`` to an SQLite GLOB pattern
+    matching the case-folded names. ``*`` and ``?`` are wildcards while brackets match
+    the array index brackets of symbol names literally.
+    """
+    return "".join(
+        {"[": "[[]", "]": "[]]"}.get(char, char) for char in fold_name(pattern)
+    )
+
+
+def fold_name(name: str) -> str:
+    """Return a symbol name in the case it is indexed and matched in."""
+    # TwinCAT symbol names are case-insensitive
+    return name.lower()
+
+
+class SymbolIndex:
+    """
+    SQLite index of the symbol tables of ADS targets.
+
+    A table is stored per (ams_net_id, ams_net_port, symbol_version), so it is only
+    uploaded from the PLC again once the PLC program changes. Symbols are stored with
+    the elements and members of their data types expanded, and queried with globs
+    like ``MAIN.*`` or ``GVL.aMotors[*].fPos``, ignoring case like TwinCAT does. Use
+    ``path=":memory:"`` for an index that is not persisted.
+    """
+
+    # Class-level metrics to be shared across instances
+    uploads = Counter(
+        name="ads_client_symbol_index_uploads",
+        documentation="Number of symbol tables uploaded from a target into the index",
+        labelnames=["ams_net_id"],
+    )
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_SYMBOL_INDEX_PATH):
+        self.path = path
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        with self._db:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                # The index is a cache of the PLCs, so it is rebuilt on upgrades
+                self._db.executescript(
+                    "DROP TABLE IF EXISTS symbols; DROP TABLE IF EXISTS symbol_tables;"
+                )
+            self._db.executescript(SCHEMA)
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def has_table(
+        self, ams_net_id: str, ams_net_port: int, symbol_version: int
+    ) -> bool:
+        """Whether the symbol table of a target and symbol version is indexed."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM symbol_tables "
+                "WHERE ams_net_id = ? AND ams_net_port = ? AND symbol_version = ?",
+                (ams_net_id, ams_net_port, symbol_version),
+            ).fetchone()
+        return row is not None
+
+    def store(
+        self, ams_net_id: str, ams_net_port: int, symbol_version: int, symbols
+    ) -> int:
+        """
+        Store the symbol table of a target, replacing the tables of other symbol
+        versions of the same target. Return the number of symbols stored.
+        """
+        key = (ams_net_id, ams_net_port)
+        rows = [
+            key
+            + (symbol_version, symbol.name, fold_name(symbol.name))
+            + tuple(symbol[1:7])
+            + (int(symbol.is_member),)
+            for symbol in symbols
+        ]
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM symbols WHERE ams_net_id = ? AND ams_net_port = ?", key
+            )
+            self._db.execute(
+                "DELETE FROM symbol_tables WHERE ams_net_id = ? AND ams_net_port = ?",
+                key,
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.execute(
+                "INSERT INTO symbol_tables VALUES (?, ?, ?, ?, ?)",
+                key + (symbol_version, len(rows), time.time()),
+            )
+        self.uploads.labels(ams_net_id).inc()
+        logger.info(
+            f"Indexed {len(rows)} symbols of {ams_net_id}:{ams_net_port} (version {symbol_version})"
+        )
+        return len(rows)
+
+    def query(
+        self,
+        ams_net_id: str,
+        ams_net_port: int,
+        symbol_version: int,
+        pattern: str = "*",
+        include_members: bool = True,
+    ) -> list:
+        """Return the indexed symbols whose names match a glob pattern."""
+        sql = (
+            "SELECT name, index_group, index_offset, size, data_type, symbol_type, "
+            "comment, is_member FROM symbols "
+            "WHERE ams_net_id = ? AND ams_net_port = ? AND symbol_version = ? "
+            "AND folded_name GLOB ?"
+        )
+        parameters = [ams_net_id, ams_net_port, symbol_version, glob_to_sqlite(pattern)]
+        # A literal prefix lets SQLite search the primary key instead of scanning
+        prefix = fold_name(pattern).split("*", 1)[0].split("?", 1)[0]
+        if prefix:
+            sql += " AND folded_name >= ? AND folded_name < ?"
+            parameters += [prefix, prefix + "\U0010ffff"]
+        if not include_members:
+            sql += " AND is_member = 0"
+        with self._lock:
+            rows = self._db.execute(
+                sql + " ORDER BY folded_name", parameters
+            ).fetchall()
+        return [IndexedSymbol(*row[:7], bool(row[7])) for row in rows]
+
+    def get(
+        self, ams_net_id: str, ams_net_port: int, symbol_version: int, name: str
+    ) -> Optional[IndexedSymbol]:
+        """Return a single indexed symbol by name, in any case, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT name, index_group, index_offset, size, data_type, symbol_type, "
+                "comment, is_member FROM symbols WHERE ams_net_id = ? "
+                "AND ams_net_port = ? AND symbol_version = ? AND folded_name = ?",
+                (ams_net_id, ams_net_port, symbol_version, fold_name(name)),
+            ).fetchone()
+        return None if row is None else IndexedSymbol(*row[:7], bool(row[7]))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,88 @@
+"""ADS target definitions loaded from config/ads_targets.yaml"""
+
+from pathlib import Path
+from typing import NamedTuple, Union
+import logging
+
+import pyads
+import yaml
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGETS_PATH = Path("config/ads_targets.yaml")
+DEFAULT_GROUP_NAME = "default"
+DEFAULT_UPDATE_INTERVAL = 1.0
+
+
+class TagGroup(NamedTuple):
+    """Variables of a target read together every ``update_interval`` seconds."""
+
+    name: str
+    update_interval: float
+    data_names: tuple
+
+
+class TargetConfig(NamedTuple):
+    """An ADS target and the groups of variables to read from it."""
+
+    name: str
+    ams_net_id: str
+    ip_address: str = None
+    ams_net_port: int = pyads.PORT_TC3PLC1
+    groups: tuple = ()
+
+    @property
+    def data_names(self) -> list:
+        """Return the variables of every group, without duplicates."""
+        return list(
+            dict.fromkeys(name for group in self.groups for name in group.data_names)
+        )
+
+
+def _tag_group(name: str, entry: dict, default_interval: float) -> TagGroup:
+    update_interval = float(entry.get("update_interval") or default_interval)
+    if update_interval <= 0:
+        raise ValueError(f"update_interval of group {name} must be positive")
+    return TagGroup(name, update_interval, tuple(entry.get("data_names") or ()))
+
+
+def parse_target(name: str, entry: dict) -> TargetConfig:
+    """
+    Parse the entry of one target. Variables listed directly under the target form
+    the default group, and further groups with their own rate go under ``groups``:
+
+    .. code:: yaml
+
+        PLC1:
+          ams_net_id: "5.109.60.19.1.1"
+          update_interval: 1
+          data_names: [MAIN.nVar1]
+          groups:
+            fast:
+              update_interval: 0.01
+              data_names: [MAIN.fPosition]
+    """
+    if not entry or "ams_net_id" not in entry:
+        raise ValueError(f"Target {name} has no ams_net_id")
+    default_interval = entry.get("update_interval") or DEFAULT_UPDATE_INTERVAL
+    groups = []
+    if entry.get("data_names"):
+        groups.append(_tag_group(DEFAULT_GROUP_NAME, entry, default_interval))
+    for group_name, group in (entry.get("groups") or {}).items():
+        groups.append(_tag_group(group_name, group or {}, default_interval))
+    return TargetConfig(
+        name=name,
+        ams_net_id=str(entry["ams_net_id"]),
+        ip_address=entry.get("ip_address"),
+        ams_net_port=int(entry.get("ams_net_port") or pyads.PORT_TC3PLC1),
+        groups=tuple(group for group in groups if group.data_names),
+    )
+
+
+def load_targets(path: Union[str, Path] = DEFAULT_TARGETS_PATH) -> dict:
+    """Load the targets of an ads_targets.yaml file, keyed by target name."""
+    with open(path, "r") as file:
+        entries = yaml.safe_load(file) or {}
+    targets = {name: parse_target(name, entry) for name, entry in entries.items()}
+    logger.debug(f"Loaded {len(targets)} ADS targets from {path}")
+    return targets
@@ -0,0 +1,386 @@
+"""Pure asyncio AMS/TCP transport with pipelined requests matched by invoke ID"""
+
+import asyncio
+import itertools
+import logging
+import socket
+import struct
+import threading
+from typing import Callable, Optional, Tuple
+
+import pyads
+from pyads import ADSError
+from pyads.filetimes import filetime_to_dt
+from pyads.structs import AdsVersion, NotificationAttrib, SAdsVersion
+
+logger = logging.getLogger(__name__)
+
+ADS_TCP_PORT = 0xBF02
+# ADS error raised by a request that received no response in time
+ADSERR_CLIENT_SYNCTIMEOUT = 0x745
+# ADS error raised by requests while the TCP connection is closed or lost
+ADSERR_PORT_NOT_CONNECTED = 0xD
+# First of the local AMS ports given to transports that are not configured with one
+DEFAULT_LOCAL_AMS_PORT = 32905
+_local_ams_ports = itertools.count(DEFAULT_LOCAL_AMS_PORT)
+
+AMS_TCP_HEADER = struct.Struct("<HI")
+AMS_HEADER = struct.Struct("<6sH6sHHHIII")
+# State flags of an ADS request over TCP, and the response bit
+AMS_STATE_REQUEST = 0x0004
+AMS_STATE_RESPONSE = 0x0001
+
+# Device notification stream sent by the target: header, stamps and their samples
+NOTIFICATION_STREAM_HEADER = struct.Struct("<II")
+NOTIFICATION_STAMP_HEADER = struct.Struct("<QI")
+NOTIFICATION_SAMPLE_HEADER = struct.Struct("<II")
+
+
+def _net_id_to_bytes(ams_net_id: str) -> bytes:
+    return bytes(int(part) for part in ams_net_id.split("."))
+
+
+class AsyncADSTransport:
+    """
+    ADS client speaking AMS/TCP directly over an asyncio stream.
+
+    Requests are written as soon as they are issued and matched to responses by their
+    AMS invoke ID, so many requests can be in flight on one socket at once. At most
+    ``max_in_flight`` requests are outstanding and each one fails with an `ADSError`
+    if no response arrives within ``timeout`` seconds. The transport must be used
+    from a single event loop.
+
+    Device notifications pushed by the target are dispatched from the receive loop to
+    the callbacks registered with `add_device_notification`.
+
+    Unless ``local_ams_port`` is given each transport uses a local AMS port of its
+    own, so responses to transports of one process sharing a local AMS Net ID are not
+    mixed up. Once the target or the network drops the socket the transport is no
+    longer `is_connected` and must be closed and connected again.
+    """
+
+    def __init__(
+        self,
+        ams_net_id: str,
+        ams_net_port: int = pyads.PORT_TC3PLC1,
+        ip_address: str = None,
+        tcp_port: int = ADS_TCP_PORT,
+        local_ams_net_id: str = None,
+        local_ams_port: int = None,
+        timeout: float = 5.0,
+        max_in_flight: int = 128,
+    ):
+        self.ams_net_id = ams_net_id
+        self.ams_net_port = ams_net_port
+        self.ip_address = ip_address or ".".join(ams_net_id.split(".")[:4])
+        self.tcp_port = tcp_port
+        self.local_ams_net_id = local_ams_net_id
+        if local_ams_port is None:
+            local_ams_port = next(_local_ams_ports)
+        self.local_ams_port = local_ams_port
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._receive_task: Optional[asyncio.Task] = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._invoke_id = 0
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._addresses: tuple = ()
+        self._notification_callbacks: dict[int, Callable] = {}
+
+    @property
+    def is_connected(self) -> bool:
+        """Return whether the socket is open, False once the connection was lost."""
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> None:
+        """Open the TCP connection to the target and start receiving responses."""
+        if self.is_connected:
+            return
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.ip_address, self.tcp_port), self.timeout
+        )
+        sock = self._writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.local_ams_net_id is None:
+            local_ip = self._writer.get_extra_info("sockname")[0]
+            self.local_ams_net_id = f"{local_ip}.1.1"
+        self._addresses = (
+            _net_id_to_bytes(self.ams_net_id),
+            self.ams_net_port,
+            _net_id_to_bytes(self.local_ams_net_id),
+            self.local_ams_port,
+        )
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._receive_task = asyncio.get_running_loop().create_task(
+            self._receive_loop()
+        )
+        logger.debug(
+            f"AMS/TCP transport connected to {self.ip_address}:{self.tcp_port}"
+        )
+
+    async def close(self) -> None:
+        """Close the connection, failing any request still in flight."""
+        if self._receive_task is not None:
+            self._receive_task.cancel()
+            try:
+                await self._receive_task
+            except asyncio.CancelledError:
+                pass
+            self._receive_task = None
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self._writer = None
+            self._reader = None
+        # Notification handles do not survive the connection
+        self._notification_callbacks.clear()
+        self._fail_pending(
+            ADSError(ADSERR_PORT_NOT_CONNECTED, "AMS/TCP connection closed")
+        )
+
+    def _next_invoke_id(self) -> int:
+        while True:
+            self._invoke_id = (self._invoke_id + 1) & 0xFFFFFFFF
+            if self._invoke_id and self._invoke_id not in self._pending:
+                return self._invoke_id
+
+    async def request(
+        self, command_id: int, payload: bytes = b"", timeout: float = None
+    ) -> bytes:
+        """Send an ADS command and return the data of its response."""
+        if not self.is_connected:
+            raise ADSError(
+                ADSERR_PORT_NOT_CONNECTED, "AMS/TCP transport is not connected"
+            )
+        timeout = self.timeout if timeout is None else timeout
+        async with self._in_flight:
+            invoke_id = self._next_invoke_id()
+            future = asyncio.get_running_loop().create_future()
+            self._pending[invoke_id] = future
+            target_net_id, target_port, source_net_id, source_port = self._addresses
+            header = AMS_HEADER.pack(
+                target_net_id,
+                target_port,
+                source_net_id,
+                source_port,
+                command_id,
+                AMS_STATE_REQUEST,
+                len(payload),
+                0,
+                invoke_id,
+            )
+            self._writer.write(
+                AMS_TCP_HEADER.pack(0, len(header) + len(payload)) + header + payload
+            )
+            try:
+                await self._writer.drain()
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                raise ADSError(
+                    ADSERR_CLIENT_SYNCTIMEOUT,
+                    f"No response to invoke ID {invoke_id} within {timeout}s",
+                ) from None
+            finally:
+                self._pending.pop(invoke_id, None)
+
+    async def _receive_loop(self):
+        try:
+            while True:
+                tcp_header = await self._reader.readexactly(AMS_TCP_HEADER.size)
+                _, length = AMS_TCP_HEADER.unpack(tcp_header)
+                frame = await self._reader.readexactly(length)
+                (
+                    _,
+                    _,
+                    _,
+                    _,
+                    command_id,
+                    state_flags,
+                    data_length,
+                    error_code,
+                    invoke_id,
+                ) = AMS_HEADER.unpack_from(frame)
+                if not state_flags & AMS_STATE_RESPONSE:
+                    # Device notifications are requests sent by the target
+                    if command_id == pyads.constants.ADSCOMMAND_DEVICENOTE:
+                        self._dispatch_notifications(
+                            frame[AMS_HEADER.size : AMS_HEADER.size + data_length]
+                        )
+                    else:
+                        logger.debug(f"Ignoring AMS command {command_id} from target")
+                    continue
+                future = self._pending.get(invoke_id)
+                if future is None or future.done():
+                    logger.debug(
+                        f"Discarding response to unknown invoke ID {invoke_id}"
+                    )
+                    continue
+                if error_code:
+                    future.set_exception(ADSError(error_code))
+                else:
+                    future.set_result(
+                        frame[AMS_HEADER.size : AMS_HEADER.size + data_length]
+                    )
+        except asyncio.CancelledError:
+            raise
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            logger.warning(f"AMS/TCP connection to {self.ip_address} lost: {e}")
+            self._fail_pending(
+                ADSError(ADSERR_PORT_NOT_CONNECTED, f"AMS/TCP connection lost: {e}")
+            )
+            if self._writer is not None:
+                self._writer.close()
+
+    def _dispatch_notifications(self, data: bytes):
+        """Call the notification callbacks for every sample of a notification stream."""
+        _, stamps = NOTIFICATION_STREAM_HEADER.unpack_from(data)
+        offset = NOTIFICATION_STREAM_HEADER.size
+        for _ in range(stamps):
+            timestamp, samples = NOTIFICATION_STAMP_HEADER.unpack_from(data, offset)
+            offset += NOTIFICATION_STAMP_HEADER.size
+            timestamp = filetime_to_dt(timestamp)
+            for _ in range(samples):
+                handle, size = NOTIFICATION_SAMPLE_HEADER.unpack_from(data, offset)
+                offset += NOTIFICATION_SAMPLE_HEADER.size
+                callback = self._notification_callbacks.get(handle)
+                if callback is not None:
+                    try:
+                        callback(timestamp, data[offset : offset + size])
+                    except Exception:
+                        logger.exception(f"Notification callback of {handle} failed")
+                offset += size
+
+    def _fail_pending(self, exception: Exception):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(exception)
+        self._pending.clear()
+
+    @staticmethod
+    def _check_result(data: bytes) -> None:
+        result = struct.unpack_from("<I", data)[0]
+        if result:
+            raise ADSError(result)
+
+    async def read(self, index_group: int, index_offset: int, length: int) -> bytes:
+        """Read ``length`` bytes from an index group and offset."""
+        data = await self.request(
+            pyads.constants.ADSCOMMAND_READ,
+            struct.pack("<III", index_group, index_offset, length),
+        )
+        self._check_result(data)
+        read_length = struct.unpack_from("<I", data, 4)[0]
+        return data[8 : 8 + read_length]
+
+    async def write(self, index_group: int, index_offset: int, value: bytes) -> None:
+        """Write bytes to an index group and offset."""
+        data = await self.request(
+            pyads.constants.ADSCOMMAND_WRITE,
+            struct.pack("<III", index_group, index_offset, len(value)) + bytes(value),
+        )
+        self._check_result(data)
+
+    async def read_write(
+        self, index_group: int, index_offset: int, read_length: int, value: bytes
+    ) -> bytes:
+        """Write bytes to an index group and offset and read the response."""
+        data = await self.request(
+            pyads.constants.ADSCOMMAND_READWRITE,
+            struct.pack("<IIII", index_group, index_offset, read_length, len(value))
+            + bytes(value),
+        )
+        self._check_result(data)
+        length = struct.unpack_from("<I", data, 4)[0]
+        return data[8 : 8 + length]
+
+    async def add_device_notification(
+        self,
+        index_group: int,
+        index_offset: int,
+        attrib: NotificationAttrib,
+        callback: Callable,
+    ) -> int:
+        """
+        Add a device notification and return its handle.
+        ``callback(timestamp, data)`` is called on the event loop for every sample.
+        """
+        attrib = attrib.notificationAttribStruct()
+        data = await self.request(
+            pyads.constants.ADSCOMMAND_ADDDEVICENOTE,
+            struct.pack(
+                "<IIIIII",
+                index_group,
+                index_offset,
+                attrib.cbLength,
+                attrib.nTransMode,
+                attrib.nMaxDelay,
+                attrib.nCycleTime,
+            )
+            + bytes(16),
+        )
+        self._check_result(data)
+        handle = struct.unpack_from("<I", data, 4)[0]
+        self._notification_callbacks[handle] = callback
+        return handle
+
+    async def delete_device_notification(self, handle: int) -> None:
+        """Delete a device notification."""
+        self._notification_callbacks.pop(handle, None)
+        data = await self.request(
+            pyads.constants.ADSCOMMAND_DELDEVICENOTE, struct.pack("<I", handle)
+        )
+        self._check_result(data)
+
+    async def read_state(self) -> Tuple[int, int]:
+        """Read the ADS state and device state of the target."""
+        data = await self.request(pyads.constants.ADSCOMMAND_READSTATE)
+        self._check_result(data)
+        return struct.unpack_from("<HH", data, 4)
+
+    async def read_device_info(self) -> Tuple[str, AdsVersion]:
+        """Read the name and version of the target device."""
+        data = await self.request(pyads.constants.ADSCOMMAND_READDEVICEINFO)
+        self._check_result(data)
+        version = SAdsVersion.from_buffer_copy(data[4:8].ljust(4, b"\x00"))
+        name = data[8:24].split(b"\x00", 1)[0].decode("utf-8")
+        return name, AdsVersion(version)
+
+
+class TransportLoop:
+    """Event loop running on a daemon thread, used to drive transports from sync code."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="ads-transport-loop", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the loop and return a concurrent future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine):
+        """Run a coroutine on the loop and block until it completes."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Cannot block on the transport loop from within it")
+        return self.submit(coroutine).result()
+
+
+_transport_loop = None
+_transport_loop_lock = threading.Lock()
+
+
+def get_transport_loop() -> TransportLoop:
+    """Return the process-wide transport loop, starting it on first use."""
+    global _transport_loop
+    with _transport_loop_lock:
+        if _transport_loop is None:
+            _transport_loop = TransportLoop()
+        return _transport_loop
@@ -0,0 +1,132 @@
+"""Read-through cache of variable values of an ADS target with per-variable TTLs"""
+
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from typing import Any, Iterable
+import threading
+import time
+
+from prometheus_client import Counter
+
+DEFAULT_VALUE_CACHE_SIZE = 10_000
+
+# Returned by `ValueCache.get` when a variable has no fresh cached value
+MISSING = object()
+
+
+class ValueCache:
+    """
+    Values read from one ADS target, kept for a time-to-live set per variable.
+
+    ``ttls`` maps variable names or fnmatch patterns such as ``"GVL_Config.*"`` to
+    their TTL in seconds. A variable's own name takes precedence over patterns, which
+    are matched in the order given. Variables matching neither are not cached. At most
+    ``max_entries`` values are kept, dropping the least recently used first.
+    """
+
+    # Class-level metrics to be shared across instances
+    hits = Counter(
+        name="ads_client_value_cache_hits",
+        documentation="Number of variable reads served from the value cache",
+        labelnames=["ams_net_id"],
+    )
+    misses = Counter(
+        name="ads_client_value_cache_misses",
+        documentation="Number of cacheable variable reads sent to the target",
+        labelnames=["ams_net_id"],
+    )
+    evictions = Counter(
+        name="ads_client_value_cache_evictions",
+        documentation="Number of values dropped from the value cache to bound its size",
+        labelnames=["ams_net_id"],
+    )
+
+    def __init__(
+        self,
+        ams_net_id: str,
+        ttls: dict = None,
+        max_entries: int = DEFAULT_VALUE_CACHE_SIZE,
+    ):
+        self.ams_net_id = ams_net_id
+        self.max_entries = max_entries
+        self.ttls = dict(ttls or {})
+        # TTL resolved for each variable name, as matching patterns is comparatively slow
+        self._resolved_ttls: dict[str, float] = {}
+        self._values: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.ttls)
+
+    def set_ttl(self, pattern: str, ttl: float):
+        """Set the TTL of a variable name or pattern, or stop caching it with 0."""
+        with self._lock:
+            if ttl:
+                self.ttls[pattern] = ttl
+            else:
+                self.ttls.pop(pattern, None)
+            self._resolved_ttls.clear()
+
+    def ttl(self, data_name: str) -> float:
+        """Return the TTL of a variable, 0 if it is not cached."""
+        ttl = self._resolved_ttls.get(data_name)
+        if ttl is None:
+            ttl = self.ttls.get(data_name)
+            if ttl is None:
+                ttl = next(
+                    (
+                        ttl
+                        for pattern, ttl in self.ttls.items()
+                        if fnmatchcase(data_name, pattern)
+                    ),
+                    0.0,
+                )
+            self._resolved_ttls[data_name] = ttl
+        return ttl
+
+    def get(self, data_name: str, plc_datatype=None) -> Any:
+        """Return the fresh cached value of a variable read as a PLC type, or MISSING."""
+        if not self.ttls or not self.ttl(data_name):
+            return MISSING
+        with self._lock:
+            entry = self._values.get(data_name)
+            if (
+                entry is not None
+                and entry[0] > time.monotonic()
+                and entry[1] is plc_datatype
+            ):
+                self._values.move_to_end(data_name)
+                self.hits.labels(self.ams_net_id).inc()
+                return entry[2]
+        self.misses.labels(self.ams_net_id).inc()
+        return MISSING
+
+    def put(self, data_name: str, value: Any, plc_datatype=None):
+        """Cache a value read from the target, if the variable is cached."""
+        if not self.ttls:
+            return
+        ttl = self.ttl(data_name)
+        if not ttl:
+            return
+        with self._lock:
+            self._values[data_name] = (time.monotonic() + ttl, plc_datatype, value)
+            self._values.move_to_end(data_name)
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+                self.evictions.labels(self.ams_net_id).inc()
+
+    def invalidate(self, data_names: Iterable[str] = None):
+        """Drop the cached values of variables, or of every variable."""
+        with self._lock:
+            if data_names is None:
+                self._values.clear()
+                return
+            for data_name in data_names:
+                self._values.pop(data_name, None)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, data_name: str):
+        return data_name in self._values
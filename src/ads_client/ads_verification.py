@@ -0,0 +1,122 @@
+"""Verification of written PLC variables against the values read back"""
+
+from typing import Any, NamedTuple
+import math
+import threading
+
+import pyads
+
+# Relative tolerance of floating point types. A REAL holds a python float rounded to
+# single precision, so the value read back differs by up to half a unit of its 24 bit
+# mantissa.
+DEFAULT_TOLERANCES = {
+    pyads.PLCTYPE_REAL: 1e-6,
+    pyads.PLCTYPE_LREAL: 1e-12,
+}
+
+
+class Mismatch(NamedTuple):
+    """A written value and the different value read back."""
+
+    written: Any
+    read: Any
+
+
+class VerificationReport(NamedTuple):
+    """
+    Outcome of verifying written variables: the number of variables checked, the
+    variables whose value read back differs, and the ADS error codes of variables that
+    could not be read back.
+    """
+
+    checked: int
+    mismatches: dict
+    errors: dict
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatches and not self.errors
+
+
+class WriteVerificationError(AssertionError):
+    """
+    Raised when variables read back after a write differ from the values written.
+    The ADS error codes of variables the write itself failed for are kept in
+    ``write_errors``.
+    """
+
+    def __init__(self, report: VerificationReport, write_errors: dict = None):
+        super().__init__(
+            f"Verification of {report.checked} written variables failed: "
+            f"mismatches {report.mismatches}, errors {report.errors}"
+        )
+        self.report = report
+        self.write_errors = dict(write_errors or {})
+
+
+class WriteVerifier:
+    """
+    Compare written values with the values read back.
+
+    Floating point values are compared within the relative tolerance of their PLC type
+    in ``tolerances``, and values of other types must be equal. Floats whose PLC type
+    is not known are compared with the tolerance of a REAL. With ``sample_every`` set
+    to N only one in N writes is verified.
+    """
+
+    def __init__(self, sample_every: int = 1, tolerances: dict = None):
+        if sample_every < 1:
+            raise ValueError("sample_every must be at least 1")
+        self.sample_every = sample_every
+        self.tolerances = {**DEFAULT_TOLERANCES, **(tolerances or {})}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def due(self) -> bool:
+        """Count a write and return whether it is to be verified."""
+        with self._lock:
+            self._writes += 1
+            return self._writes % self.sample_every == 0
+
+    def tolerance(self, plc_datatype) -> float:
+        # Arrays are compared element by element with the tolerance of their elements
+        while type(plc_datatype).__name__ == "PyCArrayType":
+            plc_datatype = plc_datatype._type_
+        if plc_datatype is None:
+            return self.tolerances[pyads.PLCTYPE_REAL]
+        return self.tolerances.get(plc_datatype, 0.0)
+
+    def matches(self, written: Any, read: Any, tolerance: float = 0.0) -> bool:
+        """Whether a value read back matches the value written."""
+        if isinstance(written, float) and isinstance(read, (int, float)):
+            return math.isclose(written, read, rel_tol=tolerance)
+        if isinstance(written, dict) and isinstance(read, dict):
+            return written.keys() == read.keys() and all(
+                self.matches(value, read[key], tolerance)
+                for key, value in written.items()
+            )
+        if isinstance(written, (list, tuple)) and isinstance(read, (list, tuple)):
+            return len(written) == len(read) and all(
+                self.matches(value, read_value, tolerance)
+                for value, read_value in zip(written, read)
+            )
+        return written == read
+
+    def compare(
+        self,
+        variables: dict,
+        read_values: dict,
+        errors: dict = None,
+        plc_datatypes: dict = None,
+    ) -> VerificationReport:
+        """Compare written variables with the values read back."""
+        plc_datatypes = plc_datatypes or {}
+        mismatches = {}
+        for data_name, value in variables.items():
+            if data_name not in read_values:
+                continue
+            read = read_values[data_name]
+            tolerance = self.tolerance(plc_datatypes.get(data_name))
+            if not self.matches(value, read, tolerance):
+                mismatches[data_name] = Mismatch(value, read)
+        return VerificationReport(len(variables), mismatches, dict(errors or {}))
@@ -163,8 +163,36 @@ def add_variables(handler, variables):
                 )
 
 
+def add_symbol_variables(handler, symbol_version: int = 1):
+    """
+    Add the variables a PLC serves for its symbol version and for releasing handles
+    with sum commands, which pyads' AdvancedHandler does not emulate.
+    """
+    symbol_version_variable = pyads.testserver.PLCVariable(
+        "SymbolVersion",
+        value=bytes([symbol_version]),
+        ads_type=pyads.constants.ADST_UINT8,
+        symbol_type="BYTE",
+        index_group=pyads.constants.ADSIGRP_SYM_VERSION,
+        index_offset=0,
+    )
+    handler.add_variable(symbol_version_variable)
+    handler.add_variable(
+        pyads.testserver.PLCVariable(
+            "ReleaseHandles",
+            value=bytes(4),
+            ads_type=pyads.constants.ADST_UINT32,
+            symbol_type="UDINT",
+            index_group=pyads.constants.ADSIGRP_SYM_RELEASEHND,
+            index_offset=0,
+        )
+    )
+    return symbol_version_variable
+
+
 def init_testserver_advanced(variables):
     handler = pyads.testserver.AdvancedHandler()
+    add_symbol_variables(handler)
     if isinstance(variables, list):
         for vars in variables:
             add_variables(handler, vars)
@@ -185,5 +213,7 @@ def testserver_advanced():
         # TEST_DATASET["array_large"],
     ]
     with init_testserver_advanced(datasets) as testserver:
+        # Give the server thread time to accept connections
+        time.sleep(1)
         testserver.total_variables = get_total_length(datasets)
         yield testserver
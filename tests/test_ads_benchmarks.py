@@ -0,0 +1,254 @@
+"""
+Benchmarks of ADSConnection and the clients against the pyads testserver.
+
+They need pytest-benchmark. A normal test run only runs the smoke cases in
+``SMOKE_BENCHMARKS`` once, untimed, to check the benchmarks still work. All of them
+are timed when pytest runs with ``--benchmark-only``::
+
+    pytest tests/test_ads_benchmarks.py --benchmark-only
+
+Comparing with baselines is opt-in, as the times depend on the machine. With
+``ADS_BENCHMARK_BASELINES=1`` the median of each benchmark is compared with
+tests/benchmarks/baselines.json and the run fails if it is more than
+``ADS_BENCHMARK_TOLERANCE`` (default 0.5, i.e. 50%) slower. Set
+``ADS_BENCHMARK_UPDATE=1`` to record the medians of the run as the new baselines.
+The baselines in the repository were recorded on a development machine, so record
+your own before comparing against them.
+"""
+
+from collections import deque
+from pathlib import Path
+import asyncio
+import json
+import os
+import time
+
+import pyads
+import pyads.testserver
+import pytest
+
+from ads_client import ADSConnection, ADSConnectionPool
+from ads_client.ads_client import ADSReaderClient
+from ads_client.ads_codec import get_structure_codec
+from ads_client.ads_resilience import CircuitBreaker
+from ads_client.constants import ERROR_STRUCTURE, MAGNET_STRUCTURE
+from conftest import (
+    PYADS_TESTSERVER_ADS_PORT,
+    add_symbol_variables,
+    get_variable_kwargs,
+)
+
+pytest.importorskip("pytest_benchmark")
+
+BENCHMARK_TESTSERVER_IP_ADDRESS = "127.0.0.5"
+BENCHMARK_TESTSERVER_ADS_ADDRESS = "127.0.0.5.1.1"
+BASELINES_PATH = Path(__file__).parent / "benchmarks" / "baselines.json"
+DEFAULT_TOLERANCE = 0.5
+
+VARIABLE_COUNTS = (1, 10, 100, 1000, 10000)
+ARRAY_SIZES = (16, 256)
+# The testserver reads each request with a single 4 kB recv
+MAX_SUM_PAYLOAD = 3000
+READER_VARIABLE_COUNT = 100
+# Benchmarks run once without timing them when not running with --benchmark-only
+SMOKE_BENCHMARKS = frozenset(("test_reader_client_cycle",))
+
+
+class IndexedHandler(pyads.testserver.AdvancedHandler):
+    """Handler looking variables up by name in a dict instead of a linear search."""
+
+    def __init__(self):
+        super().__init__()
+        self._names = {}
+
+    def add_variable(self, var):
+        super().add_variable(var)
+        self._names[var.name] = var
+
+    def get_variable_by_name(self, name):
+        try:
+            return self._names[name.strip("\x00")]
+        except KeyError:
+            return super().get_variable_by_name(name)
+
+
+def variable_names(count: int) -> list:
+    return [f"GVL.fValue{n}" for n in range(count)]
+
+
+@pytest.fixture(autouse=True)
+def benchmarks_enabled(request):
+    if request.config.getoption("benchmark_only"):
+        return
+    if request.node.name not in SMOKE_BENCHMARKS:
+        pytest.skip("Benchmarks only run with --benchmark-only")
+    # Smoke cases call the benchmarked function once
+    request.getfixturevalue("benchmark").disabled = True
+
+
+@pytest.fixture(scope="session")
+def baselines():
+    baselines = {}
+    if BASELINES_PATH.exists():
+        baselines = json.loads(BASELINES_PATH.read_text())
+    recorded = {}
+    yield baselines, recorded
+    if os.environ.get("ADS_BENCHMARK_UPDATE") and recorded:
+        BASELINES_PATH.parent.mkdir(exist_ok=True)
+        BASELINES_PATH.write_text(
+            json.dumps({**baselines, **recorded}, indent=2, sort_keys=True) + "\n"
+        )
+
+
+@pytest.fixture(autouse=True)
+def check_baseline(request, benchmarks_enabled, baselines, benchmark):
+    """Fail a benchmark whose median is slower than its baseline allows."""
+    yield
+    if benchmark.stats is None:
+        return
+    comparing = os.environ.get("ADS_BENCHMARK_BASELINES")
+    updating = os.environ.get("ADS_BENCHMARK_UPDATE")
+    baselines, recorded = baselines
+    name = request.node.name
+    median = benchmark.stats.stats.median
+    recorded[name] = round(median, 7)
+    baseline = baselines.get(name)
+    if baseline is None or updating or not comparing:
+        return
+    tolerance = float(os.environ.get("ADS_BENCHMARK_TOLERANCE", DEFAULT_TOLERANCE))
+    assert median <= baseline * (1 + tolerance), (
+        f"{name} took {median * 1e3:.3f} ms, "
+        f"{median / baseline - 1:.0%} slower than its baseline of {baseline * 1e3:.3f} ms"
+    )
+
+
+@pytest.fixture(scope="module")
+def benchmark_handler():
+    handler = IndexedHandler()
+    add_symbol_variables(handler)
+    for name in variable_names(max(VARIABLE_COUNTS)):
+        handler.add_variable(
+            pyads.testserver.PLCVariable(name, **get_variable_kwargs("reals"))
+        )
+    for size in ARRAY_SIZES:
+        handler.add_variable(
+            pyads.testserver.PLCVariable(
+                f"GVL.aValues{size}",
+                value=bytes(8 * size),
+                ads_type=pyads.constants.ADST_REAL64,
+                symbol_type=f"ARRAY [0..{size - 1}] OF LREAL",
+            )
+        )
+    testserver = pyads.testserver.AdsTestServer(
+        handler, ip_address=BENCHMARK_TESTSERVER_IP_ADDRESS
+    )
+    testserver.start()
+    time.sleep(1)
+    yield handler
+    testserver.close()
+
+
+def connection(backend: str, **kwargs) -> ADSConnection:
+    return ADSConnection(
+        ams_net_id=BENCHMARK_TESTSERVER_ADS_ADDRESS,
+        ip_address=BENCHMARK_TESTSERVER_IP_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        backend=backend,
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT, "max_in_flight": 1},
+        max_sum_payload=MAX_SUM_PAYLOAD,
+        **kwargs,
+    )
+
+
+@pytest.fixture(params=["pyads", "asyncio"])
+def target(request, benchmark_handler):
+    target = connection(request.param, idle_timeout=0)
+    with target:
+        yield target
+    target.ensure_closed()
+
+
+@pytest.mark.parametrize("count", VARIABLE_COUNTS)
+def test_read_list_by_name(benchmark, target, count):
+    data_names = variable_names(count)
+    # Symbol information is cached by the first read
+    target.read_list_by_name(data_names)
+    result = benchmark(target.read_list_by_name, data_names)
+    assert len(result) == count and not result.errors
+
+
+@pytest.mark.parametrize("count", VARIABLE_COUNTS)
+def test_write_list_by_name(benchmark, target, count):
+    variables = {name: n * 0.5 for n, name in enumerate(variable_names(count))}
+    target.write_list_by_name(variables)
+    assert benchmark(target.write_list_by_name, variables) == {}
+
+
+@pytest.mark.parametrize("backend", ["pyads", "asyncio"])
+def test_open_close(benchmark, benchmark_handler, backend):
+    target = connection(backend, idle_timeout=0)
+
+    def open_close():
+        target.open()
+        target.ensure_closed()
+
+    benchmark(open_close)
+
+
+@pytest.mark.parametrize("size", ARRAY_SIZES)
+def test_read_array_by_name(benchmark, target, size):
+    data_name = f"GVL.aValues{size}"
+    result = benchmark(target.read_array_by_name, data_name, pyads.PLCTYPE_LREAL, size)
+    assert len(result) == size
+
+
+@pytest.mark.parametrize("size", ARRAY_SIZES)
+def test_write_array_by_name(benchmark, target, size):
+    values = [n * 0.5 for n in range(size)]
+    benchmark(
+        target.write_array_by_name,
+        f"GVL.aValues{size}",
+        values,
+        pyads.PLCTYPE_LREAL,
+    )
+
+
+@pytest.mark.parametrize(
+    "structure_def, array_size",
+    [(ERROR_STRUCTURE, 1), (ERROR_STRUCTURE, 100), (MAGNET_STRUCTURE, 1)],
+    ids=["error", "error_array", "magnet"],
+)
+def test_structure_codec(benchmark, structure_def, array_size):
+    codec = get_structure_codec(structure_def)
+    data = bytes(codec.size * array_size)
+    values = codec.decode(data, array_size)
+
+    def round_trip():
+        return codec.decode(codec.encode(values, array_size), array_size)
+
+    assert benchmark(round_trip) == values
+
+
+def test_reader_client_cycle(benchmark, benchmark_handler):
+    pool = ADSConnectionPool(idle_timeout=0)
+    reader = ADSReaderClient(
+        buffer=deque(maxlen=1),
+        ams_net_id=BENCHMARK_TESTSERVER_ADS_ADDRESS,
+        ip_address=BENCHMARK_TESTSERVER_IP_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        data_names=variable_names(READER_VARIABLE_COUNT),
+        retain_connection=True,
+        connection_pool=pool,
+        circuit_breaker=CircuitBreaker(BENCHMARK_TESTSERVER_ADS_ADDRESS),
+    )
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(reader.do_work())
+        benchmark(lambda: loop.run_until_complete(reader.do_work()))
+    finally:
+        loop.close()
+        target = reader.target
+        reader.close()
+        target.retain_connection = False
+        target.ensure_closed()
+    assert len(reader.buffer[-1]) == READER_VARIABLE_COUNT
@@ -1,21 +1,31 @@
 import pytest
 import asyncio
+import sys
 from unittest.mock import patch
 from collections import deque
 from ads_client.ads_client import ADSClient, ADSReaderClient, ADSWriterClient, ADSError
+from ads_client.ads_connection import SumResult
+from ads_client.ads_resilience import Backoff
+from ads_client.ads_verification import (
+    Mismatch,
+    VerificationReport,
+    WriteVerificationError,
+)
 
 import pyads.testserver
 import time
-from conftest import get_variable_kwargs
+from conftest import add_symbol_variables, get_variable_kwargs
 
 # Global variables for ams_net_id and ip_address
 AMS_NET_ID = "127.0.0.1.1.1"
 IP_ADDRESS = "127.0.0.1"
 AMS_NET_PORT = 48898
+ADSERR_SYMBOL_NOT_FOUND = 0x710
 
 
 def init_testserver_advanced_client(variables):
     handler = pyads.testserver.AdvancedHandler()
+    add_symbol_variables(handler)
     for var in variables:
         handler.add_variable(
             pyads.testserver.PLCVariable(var, **get_variable_kwargs("integers"))
@@ -30,9 +40,44 @@ def init_testserver_advanced_client(variables):
 def testserver_advanced_client():
     variables = {"Var1": 0, "Var2": 0}
     with init_testserver_advanced_client(variables) as testserver:
+        # Give the server thread time to accept connections
+        time.sleep(1)
         yield testserver
 
 
+# Slow test servers, each on its own loopback address so that requests to them are
+# not serialised over a single router connection
+SLOW_TESTSERVER_DELAY = 0.2
+SLOW_TESTSERVER_IP_ADDRESSES = ["127.0.0.2", "127.0.0.3"]
+
+
+class SlowHandler(pyads.testserver.AdvancedHandler):
+    """Handler delaying every read-write request to emulate a slow PLC."""
+
+    def handle_request(self, request):
+        time.sleep(SLOW_TESTSERVER_DELAY)
+        return super().handle_request(request)
+
+
+@pytest.fixture(scope="session")
+def slow_testservers():
+    testservers = []
+    for ip_address in SLOW_TESTSERVER_IP_ADDRESSES:
+        handler = SlowHandler()
+        add_symbol_variables(handler)
+        for var in ("Var1", "Var2"):
+            handler.add_variable(
+                pyads.testserver.PLCVariable(var, **get_variable_kwargs("integers"))
+            )
+        testserver = pyads.testserver.AdsTestServer(handler, ip_address=ip_address)
+        testserver.start()
+        testservers.append(testserver)
+    time.sleep(1)
+    yield testservers
+    for testserver in testservers:
+        testserver.close()
+
+
 class TestADSClient:
     @pytest.fixture
     def ads_client(self, testserver_advanced_client):
@@ -62,8 +107,9 @@ class TestADSClient:
         async def failing_operation():
             raise ADSError("ADS Error")
 
-        with pytest.raises(SystemExit):  # Expecting the system to exit after retries
-            await ads_client._perform_operation(failing_operation)
+        ads_client.backoff = Backoff(initial=0.001)
+        # The operation gives up after its retries instead of exiting
+        assert not await ads_client._perform_operation(failing_operation)
 
 
 class TestADSReaderClient:
@@ -88,14 +134,89 @@ class TestADSReaderClient:
         await ads_reader_client.do_work()
         assert len(ads_reader_client.buffer) > 0  # Check if data is appended to buffer
 
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(
+        sys.platform != "linux", reason="Requires the 127.0.0.0/8 loopback range"
+    )
+    async def test_do_work_concurrent(self, slow_testservers):
+        """Readers of different slow targets should not block each other."""
+        readers = [
+            ADSReaderClient(
+                buffer=deque(),
+                ams_net_id=f"{ip_address}.1.1",
+                ip_address=ip_address,
+                ams_net_port=AMS_NET_PORT,
+                data_names=["Var1", "Var2"],
+            )
+            for ip_address in SLOW_TESTSERVER_IP_ADDRESSES
+        ]
+        intervals = []
+
+        async def timed_do_work(reader):
+            start = time.perf_counter()
+            await reader.do_work()
+            intervals.append((start, time.perf_counter()))
+
+        await asyncio.gather(*(timed_do_work(reader) for reader in readers))
+
+        (start_a, end_a), (start_b, end_b) = intervals
+        # Both reads were in flight at the same time
+        assert start_a < end_b and start_b < end_a
+        # Total time is that of one read, not the sum of both
+        durations = [end - start for start, end in intervals]
+        assert max(end_a, end_b) - min(start_a, start_b) < 0.75 * sum(durations)
+        assert all(len(reader.buffer) == 1 for reader in readers)
+        for reader in readers:
+            reader.close()
+
+    @pytest.mark.asyncio
+    async def test_do_work_report_on_change(self, testserver_advanced_client):
+        reader = ADSReaderClient(
+            buffer=deque(),
+            ams_net_id=AMS_NET_ID,
+            ip_address=IP_ADDRESS,
+            ams_net_port=AMS_NET_PORT,
+            data_names=["Var1", "Var2"],
+            report_on_change=True,
+        )
+        await reader.do_work()
+        await reader.do_work()
+        # The unchanged values of the second read are not buffered
+        assert len(reader.buffer) == 1
+
+        reader.target.write_by_name("Var2", reader.buffer[0]["Var2"] + 1)
+        await reader.do_work()
+        assert len(reader.buffer) == 2
+        assert list(reader.buffer[1]) == ["Var2"]
+
     @pytest.mark.asyncio
     async def test_do_work_failure(self, ads_reader_client, testserver_advanced_client):
-        # Simulate failure by attempting to read non-existent data
-        pytest.skip("Skipping this test as mock doesn't handle this case properly")
-        ads_reader_client.data_names = ["InvalidVar"]
+        # The testserver does not answer reads of unknown variables, so the sum read
+        # of a PLC failing every variable is simulated
+        ads_reader_client.retry_attempts = 2
+        ads_reader_client.backoff = Backoff(initial=0.01)
+        result = SumResult(errors={"Var1": ADSERR_SYMBOL_NOT_FOUND})
+
+        with patch.object(
+            ads_reader_client.target, "read_list_by_name", return_value=result
+        ), patch.object(ads_reader_client, "report_failure") as report_failure:
+            assert await ads_reader_client.do_work() is False
+        assert report_failure.call_count == 2
+        assert report_failure.call_args[0][0].error_code == ADSERR_SYMBOL_NOT_FOUND
+        assert len(ads_reader_client.buffer) == 0
 
-        with pytest.raises(SystemExit):
-            await ads_reader_client.do_work()
+    @pytest.mark.asyncio
+    async def test_do_work_partial_failure(
+        self, ads_reader_client, testserver_advanced_client, caplog
+    ):
+        result = SumResult({"Var1": 1}, {"Var2": ADSERR_SYMBOL_NOT_FOUND})
+
+        with patch.object(
+            ads_reader_client.target, "read_list_by_name", return_value=result
+        ):
+            assert await ads_reader_client.do_work() is True
+        assert list(ads_reader_client.buffer) == [{"Var1": 1}]
+        assert "Var2" in caplog.text
 
 
 class TestADSWriterClient:
@@ -121,11 +242,97 @@ class TestADSWriterClient:
         # Check if buffer has been written and emptied
         assert len(ads_writer_client.buffer) == 0
 
+    @pytest.mark.asyncio
+    async def test_do_work_coalesces_updates(
+        self, ads_writer_client, testserver_advanced_client
+    ):
+        ads_writer_client.write_batch_size = 0
+        ads_writer_client.buffer.extend([{"Var1": 3}, {"Var2": 4, "Var1": 5}])
+        sum_writes = []
+        write_list_by_name_async = ads_writer_client.target.write_list_by_name_async
+
+        async def record_sum_write(variables, verify=False):
+            sum_writes.append(dict(variables))
+            return await write_list_by_name_async(variables, verify=verify)
+
+        with patch.object(
+            ads_writer_client.target, "write_list_by_name_async", record_sum_write
+        ):
+            await ads_writer_client.do_work()
+
+        # All queued updates are written with one sum write, the latest value winning
+        assert sum_writes == [{"Var1": 5, "Var2": 4}]
+        assert len(ads_writer_client.buffer) == 0
+        assert ads_writer_client.pending == {}
+        assert ads_writer_client.target.read_by_name("Var1") == 5
+
+    @pytest.mark.asyncio
+    async def test_do_work_keeps_failed_writes_pending(
+        self, ads_writer_client, testserver_advanced_client
+    ):
+        ads_writer_client.retry_attempts = 1
+
+        async def failing_write(variables, verify=False):
+            raise ADSError("ADS Error")
+
+        with patch.object(
+            ads_writer_client.target, "write_list_by_name_async", failing_write
+        ):
+            await ads_writer_client.do_work()
+        assert ads_writer_client.pending == {"Var1": 1, "Var2": 2}
+
+        # The next update merges newer values into the pending ones
+        ads_writer_client.buffer.append({"Var2": 7})
+        await ads_writer_client.do_work()
+        assert ads_writer_client.pending == {}
+        assert ads_writer_client.target.read_by_name("Var2") == 7
+
+    @pytest.mark.asyncio
+    async def test_do_work_keeps_failed_variables_pending(
+        self, ads_writer_client, testserver_advanced_client
+    ):
+        ads_writer_client.write_batch_size = 0
+        ads_writer_client.buffer.append({"Var3": 3})
+
+        async def partly_failing_write(variables, verify=False):
+            return {"Var2": ADSERR_SYMBOL_NOT_FOUND}
+
+        with patch.object(
+            ads_writer_client.target, "write_list_by_name_async", partly_failing_write
+        ):
+            assert await ads_writer_client.do_work()
+        assert ads_writer_client.pending == {"Var2": 2}
+
+        async def mismatched_write(variables, verify=False):
+            report = VerificationReport(
+                len(variables), {"Var4": Mismatch(4, 0)}, {"Var5": 0x745}
+            )
+            raise WriteVerificationError(report, {"Var2": ADSERR_SYMBOL_NOT_FOUND})
+
+        ads_writer_client.buffer.append({"Var4": 4, "Var5": 5, "Var6": 6})
+        with patch.object(
+            ads_writer_client.target, "write_list_by_name_async", mismatched_write
+        ):
+            assert await ads_writer_client.do_work()
+        # Values that were not read back as written are written again
+        assert ads_writer_client.pending == {"Var2": 2, "Var4": 4, "Var5": 5}
+
+    @pytest.mark.asyncio
+    async def test_do_work_drains_list_buffer(
+        self, ads_writer_client, testserver_advanced_client
+    ):
+        ads_writer_client.buffer = [{"Var1": 3}, {"Var2": 4}]
+        await ads_writer_client.do_work()
+        assert ads_writer_client.buffer == [{"Var2": 4}]
+        await ads_writer_client.do_work()
+        assert ads_writer_client.buffer == []
+        assert ads_writer_client.pending == {}
+        assert ads_writer_client.target.read_by_name("Var2") == 4
+
     @pytest.mark.asyncio
     async def test_do_work_failure(self, ads_writer_client, testserver_advanced_client):
         # Simulate failure by attempting to write non-existent data
         pytest.skip("Skipping this test as mock doesn't handle this case properly")
         ads_writer_client.buffer = deque([{"InvalidVar": 999}])
 
-        with pytest.raises(SystemExit):
-            await ads_writer_client.do_work()
+        await ads_writer_client.do_work()
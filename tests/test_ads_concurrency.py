@@ -0,0 +1,113 @@
+"""
+Stress tests of one ADSConnection shared by many threads, against the pyads
+testserver.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pyads
+import pytest
+from prometheus_client import REGISTRY
+
+from ads_client import ADSConnection
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+THREADS = 32
+OPERATIONS_PER_THREAD = 50
+
+
+def sample(name: str) -> float:
+    return (
+        REGISTRY.get_sample_value(name, {"ams_net_id": PYADS_TESTSERVER_ADS_ADDRESS})
+        or 0
+    )
+
+
+@pytest.fixture(params=["pyads", "asyncio"])
+def target(request, testserver_advanced):
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        backend=request.param,
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT},
+        # The testserver answers one request at a time
+        serialize_requests=True,
+    )
+    yield target
+    target.ensure_closed()
+
+
+def run_threads(threads: int, operation) -> float:
+    """Run ``operation(thread, n)`` from many threads and return operations per second."""
+    start = threading.Barrier(threads)
+
+    def worker(thread):
+        start.wait()
+        for n in range(OPERATIONS_PER_THREAD):
+            operation(thread, n)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # Raise the first error of any thread
+        list(executor.map(worker, range(threads)))
+    return threads * OPERATIONS_PER_THREAD / (time.perf_counter() - started)
+
+
+def test_shared_connection(target):
+    data_names = [f"real{n}" for n in range(10)]
+    closes = sample("ads_client_connection_close_events_total")
+
+    def operation(thread, n):
+        data_name = data_names[thread % len(data_names)]
+        # Nested sessions of many threads
+        with target:
+            with target:
+                target.write_by_name(data_name, float(n), pyads.PLCTYPE_LREAL)
+                target.read_by_name(data_name, pyads.PLCTYPE_LREAL)
+            result = target.read_list_by_name(data_names)
+            assert not result.errors
+
+    run_threads(THREADS, operation)
+    # No thread's session was closed under it, and no handle was leaked
+    assert sample("ads_client_connection_close_events_total") == closes
+    assert target.is_open and target.session_depth == 0
+    assert len(target.symbol_cache.handles) <= len(data_names)
+
+
+def test_close_waits_for_sessions(target):
+    sessions = threading.Barrier(THREADS + 1)
+    done = threading.Event()
+
+    def session():
+        with target:
+            sessions.wait()
+            done.wait()
+            target.read_by_name("real0", pyads.PLCTYPE_LREAL)
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        futures = [executor.submit(session) for _ in range(THREADS)]
+        sessions.wait()
+        # Closing while threads are in sessions is deferred to the last one
+        target.close()
+        assert target.is_open
+        done.set()
+        for future in futures:
+            future.result()
+    assert not target.is_open
+
+
+def test_throughput_scales_to_target_limit(target):
+    data_names = [f"real{n}" for n in range(10)]
+
+    def operation(thread, n):
+        target.read_list_by_name(data_names)
+
+    with target:
+        target.read_list_by_name(data_names)
+        single = run_threads(1, operation)
+        shared = run_threads(THREADS, operation)
+    # The testserver handles one request at a time, so many threads cannot read
+    # faster than one, but sharing the connection must not slow them down
+    assert shared >= 0.5 * single
@@ -2,8 +2,11 @@ import pyads
 import pytest
 import time
 
+from ads_client import get_connection_pool
 from ads_client.ads_connection_labview import (
     LabviewADSConnection,
+    close_all,
+    close_connection,
     get_connection_object,
     read_from_plc,
 )
@@ -12,12 +15,14 @@ from conftest import (
     PYADS_TESTSERVER_ADS_ADDRESS,
     PYADS_TESTSERVER_IP_ADDRESS,
     PYADS_TESTSERVER_ADS_PORT,
+    add_symbol_variables,
     get_variable_kwargs,
 )
 
 
 def init_testserver_advanced_client(variables):
     handler = pyads.testserver.AdvancedHandler()
+    add_symbol_variables(handler)
     for var in variables:
         handler.add_variable(
             pyads.testserver.PLCVariable(var, **get_variable_kwargs("integers"))
@@ -32,9 +37,19 @@ def init_testserver_advanced_client(variables):
 def testserver_advanced_client():
     variables = {"Var1": 0, "Var2": 0}
     with init_testserver_advanced_client(variables) as testserver:
+        # Give the server thread time to accept connections
+        time.sleep(1)
         yield testserver
 
 
+@pytest.fixture(autouse=True)
+def empty_registry():
+    """Start and end every test without pooled connections."""
+    close_all()
+    yield
+    close_all()
+
+
 @pytest.fixture
 def testserver_target(testserver_advanced_client):
     """Fixture to create a LabviewADSConnection object for testing."""
@@ -84,3 +99,76 @@ def test_read_from_plc(testserver_target):
     result = read_from_plc(var_name, target=testserver_target)
     assert result is not None
     # Assuming the test server mock returns a valid result for the read operation
+
+
+def test_registered_connection_is_reused(testserver_advanced_client):
+    """Test that calls with the same target share one open connection."""
+    kwargs = dict(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ip_address=PYADS_TESTSERVER_IP_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+    )
+    target = get_connection_object(**kwargs)
+    assert get_connection_object(**kwargs) is target
+    assert get_connection_object(**{**kwargs, "ams_net_port": 852}) is not target
+
+    read_from_plc("Var1", ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+    read_from_plc("Var1", ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+    # The port stays open between calls
+    registered = get_connection_object(ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+    assert registered.is_open
+
+
+def test_close_connection(testserver_advanced_client):
+    """Test closing registered connections by ams_net_id and all at once."""
+    read_from_plc("Var1", ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+    target = get_connection_object(ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+    close_connection(ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+    assert not target.is_open
+    assert get_connection_object(ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS) is not target
+
+    read_from_plc("Var1", ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+    target = get_connection_object(ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+    close_all()
+    assert not target.is_open
+    assert get_connection_object(ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS) is not target
+
+
+def test_idle_connections_expire(testserver_advanced_client, monkeypatch):
+    """Test that the pool closes and removes connections left unused for its idle timeout."""
+    pool = get_connection_pool()
+    monkeypatch.setattr(pool, "idle_timeout", 0.1)
+    read_from_plc("Var1", ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+    target = pool.get(PYADS_TESTSERVER_ADS_ADDRESS)
+    assert target.is_open
+
+    # Expired without any further calls
+    time.sleep(0.3)
+    assert pool.get(PYADS_TESTSERVER_ADS_ADDRESS) is None
+    assert not target.is_open
+
+    # Connections handed out stay leased until they are closed
+    target = get_connection_object(ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+    read_from_plc("Var1", ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+    time.sleep(0.3)
+    assert pool.get(PYADS_TESTSERVER_ADS_ADDRESS) is target
+    close_connection(target)
+    assert pool.get(PYADS_TESTSERVER_ADS_ADDRESS) is None
+    assert not target.is_open
+
+
+def test_connections_are_shared_with_clients(testserver_advanced_client):
+    """Test that the helpers use the pooled connection of the clients of a PLC."""
+    pool = get_connection_pool()
+    with pool.lease(PYADS_TESTSERVER_ADS_ADDRESS) as leased:
+        assert get_connection_object(ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS) is leased
+        read_from_plc("Var1", ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+        assert leased.is_open
+        # Closing the helper's connection leaves the one of the client open
+        close_connection(ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS)
+        close_all()
+        assert pool.get(PYADS_TESTSERVER_ADS_ADDRESS) is leased
+        assert leased.is_open
+        assert leased.read_by_name("Var1") is not None
+    close_connection(leased)
+    assert not leased.is_open
@@ -0,0 +1,159 @@
+import pyads
+import pytest
+import threading
+import time
+from collections import deque
+from prometheus_client import REGISTRY
+
+from ads_client import ADSConnection, ADSConnectionPool
+from ads_client.ads_client import ADSReaderClient, ADSWriterClient
+from ads_client.ads_connection_pool import ConnectionPoolExhaustedError
+from conftest import (
+    PYADS_TESTSERVER_ADS_ADDRESS,
+    PYADS_TESTSERVER_ADS_PORT,
+    TEST_DATASET,
+)
+
+
+def _sample(name):
+    return (
+        REGISTRY.get_sample_value(
+            f"ads_client_connection_pool_{name}_total",
+            {"ams_net_id": PYADS_TESTSERVER_ADS_ADDRESS},
+        )
+        or 0
+    )
+
+
+@pytest.fixture
+def pool():
+    pool = ADSConnectionPool(max_size=2)
+    yield pool
+    pool.close_all()
+
+
+def test_lease_shares_connection(testserver_advanced, pool):
+    """Leases of the same target should receive the same connection."""
+    hits, misses = _sample("hits"), _sample("misses")
+    with pool.lease(PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT) as first:
+        with pool.lease(
+            PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+        ) as second:
+            assert first is second
+            variables = TEST_DATASET["single_small"]["reals"]
+            second.write_list_by_name(variables)
+            assert first.read_list_by_name(list(variables)) == variables
+    assert _sample("hits") - hits == 1
+    assert _sample("misses") - misses == 1
+    assert len(pool) == 1
+
+
+def test_clients_share_pooled_connection(testserver_advanced, pool):
+    """Reader and writer clients of one target should share a connection."""
+    kwargs = dict(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        connection_pool=pool,
+    )
+    reader = ADSReaderClient(buffer=deque(), data_names=["real0"], **kwargs)
+    writer = ADSWriterClient(buffer=deque(), **kwargs)
+    assert reader.target is writer.target
+    reader.close()
+    writer.close()
+    assert reader.target is None
+
+
+def test_idle_connections_are_evicted(testserver_advanced, pool):
+    """Unleased connections should be closed once idle for idle_timeout."""
+    pool.idle_timeout = 0
+    connection = pool.acquire(PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT)
+    connection.read_device_info()
+    pool.release(connection)
+    pool.evict_idle()
+    assert len(pool) == 0
+    assert not connection.is_open
+
+
+def test_idle_connections_are_evicted_by_timer(testserver_advanced, pool):
+    """Unleased connections should be evicted without further calls to the pool."""
+    pool.idle_timeout = 0.05
+    connection = pool.acquire(PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT)
+    connection.read_device_info()
+    pool.release(connection)
+    assert len(pool) == 1
+    time.sleep(0.2)
+    assert len(pool) == 0
+    assert not connection.is_open
+
+
+def test_discard(pool):
+    """Discarded connections should be removed even while leased."""
+    connection = pool.acquire("127.0.0.1.1.1", 851)
+    assert pool.get("127.0.0.1.1.1", 851) is connection
+    assert pool.discard(connection)
+    assert pool.get("127.0.0.1.1.1", 851) is None
+    assert not pool.discard(connection)
+
+    # Without force, a connection is only closed once it is no longer leased
+    connection = pool.acquire("127.0.0.1.1.1", 851)
+    assert pool.discard(connection, force=False)
+    assert pool.get("127.0.0.1.1.1", 851) is connection
+    pool.release(connection)
+    assert pool.discard(connection, force=False)
+    assert pool.get("127.0.0.1.1.1", 851) is None
+
+
+def test_pool_exhausted(pool):
+    """Acquiring a new target from a full pool of leased connections should fail."""
+    pool.acquire("127.0.0.1.1.1", 851)
+    pool.acquire("127.0.0.1.1.1", 852)
+    with pytest.raises(ConnectionPoolExhaustedError):
+        pool.acquire("127.0.0.1.1.1", 853)
+
+
+def test_options_are_part_of_key(pool):
+    """Lessees asking for other options should not share a connection."""
+    first = pool.acquire("127.0.0.1.1.1", 851)
+    assert pool.acquire("127.0.0.1.1.1", 851, retain_connection=False) is first
+    assert pool.acquire("127.0.0.1.1.1", 851, ip_address="127.0.0.2") is not first
+    pool.max_size = 3
+    assert pool.acquire("127.0.0.1.1.1", 851, backend="asyncio") is not first
+
+
+def test_default_address_is_part_of_key(pool):
+    """Lessees leaving out the port or IP address should share the default target."""
+    first = pool.acquire("127.0.0.1.1.1", None)
+    assert pool.acquire("127.0.0.1.1.1", ip_address="127.0.0.1") is first
+    assert first.ams_net_port == pyads.PORT_TC3PLC1
+
+
+class _SlowHealthCheckConnection(ADSConnection):
+    probing = threading.Event()
+    proceed = threading.Event()
+
+    def read_state(self):
+        self.probing.set()
+        self.proceed.wait(5)
+        return super().read_state()
+
+
+def test_health_check_does_not_block_pool(testserver_advanced):
+    """Leases of other targets should not wait for the health check of a slow one."""
+    pool = ADSConnectionPool(
+        health_check_interval=0, connection_class=_SlowHealthCheckConnection
+    )
+    connection = pool.acquire(PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT)
+    connection.read_device_info()
+    probe = threading.Thread(
+        target=pool.acquire,
+        args=(PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT),
+    )
+    probe.start()
+    try:
+        assert _SlowHealthCheckConnection.probing.wait(5)
+        other = pool.acquire(PYADS_TESTSERVER_ADS_ADDRESS, 852)
+        assert other is not connection
+    finally:
+        _SlowHealthCheckConnection.proceed.set()
+        probe.join()
+        pool.close_all()
@@ -0,0 +1,57 @@
+from ads_client import ChangeFilter, Deadband
+
+
+def test_report_on_change():
+    change_filter = ChangeFilter()
+    assert change_filter.filter({"bEnable": False, "nCount": 1, "sName": "a"}) == {
+        "bEnable": False,
+        "nCount": 1,
+        "sName": "a",
+    }
+    assert change_filter.filter({"bEnable": False, "nCount": 1, "sName": "a"}) == {}
+    assert change_filter.filter({"bEnable": True, "nCount": 2, "sName": "a"}) == {
+        "bEnable": True,
+        "nCount": 2,
+    }
+    change_filter.reset()
+    assert len(change_filter.filter({"bEnable": True})) == 1
+
+
+def test_absolute_deadband():
+    change_filter = ChangeFilter({"GVL.f*": 0.5})
+    assert change_filter.filter({"GVL.fTemp": 20.0}) == {"GVL.fTemp": 20.0}
+    assert change_filter.filter({"GVL.fTemp": 20.4}) == {}
+    # The change is measured from the value last reported, not the last read
+    assert change_filter.filter({"GVL.fTemp": 20.6}) == {"GVL.fTemp": 20.6}
+    assert change_filter.filter({"GVL.fTemp": 20.1}) == {}
+
+
+def test_percent_deadband():
+    change_filter = ChangeFilter(
+        {"GVL.*": Deadband(percent=1.0), "GVL.fFlow": Deadband(absolute=5.0)}
+    )
+    change_filter.filter({"GVL.fPressure": 200.0, "GVL.fFlow": 10.0})
+    assert change_filter.filter({"GVL.fPressure": 201.5, "GVL.fFlow": 14.0}) == {}
+    assert change_filter.filter({"GVL.fPressure": 202.5, "GVL.fFlow": 15.5}) == {
+        "GVL.fPressure": 202.5,
+        "GVL.fFlow": 15.5,
+    }
+
+
+def test_nan_is_unchanged():
+    change_filter = ChangeFilter()
+    change_filter.filter({"fValue": float("nan")})
+    assert change_filter.filter({"fValue": float("nan")}) == {}
+    assert change_filter.filter({"fValue": 1.0}) == {"fValue": 1.0}
+
+
+def test_heartbeat():
+    change_filter = ChangeFilter({"fValue": 1.0}, heartbeat_interval=10)
+    change_filter.filter({"fValue": 1.0, "bOn": True}, now=0)
+    assert change_filter.filter({"fValue": 1.5, "bOn": True}, now=5) == {}
+    # Unchanged values are reported again once the heartbeat is due
+    assert change_filter.filter({"fValue": 1.5, "bOn": True}, now=10) == {
+        "fValue": 1.5,
+        "bOn": True,
+    }
+    assert change_filter.filter({"fValue": 1.5, "bOn": True}, now=15) == {}
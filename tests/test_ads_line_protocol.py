@@ -0,0 +1,161 @@
+import gzip
+import io
+import socket
+import time
+
+import pytest
+
+from ads_client import LineProtocolEncoder, LineProtocolSink
+from ads_client.ads_resilience import Backoff
+
+
+@pytest.fixture
+def encoder():
+    return LineProtocolEncoder("plc data", tags={"site": "hall,1", "device": "A=1"})
+
+
+def test_escaping(encoder):
+    assert encoder.prefix == "plc\\ data,device=A\\=1,site=hall\\,1 "
+    assert encoder.key("GVL.f Value") == "GVL.f\\ Value="
+    assert encoder.fields({"sName": 'say "hi"\\'}) == 'sName="say \\"hi\\"\\\\"'
+
+
+def test_encode(encoder):
+    data = encoder.encode(
+        [
+            (1000, {"fValue": 1.5, "nCount": 3, "bOn": True}),
+            # Lines without fields are left out
+            (2000, {"fValue": float("nan")}),
+            (3000, {"aValues": [1.0, 2.0], "stError": {"nCode": 7}}),
+        ]
+    )
+    assert data.decode().splitlines() == [
+        f"{encoder.prefix}fValue=1.5,nCount=3i,bOn=true 1000",
+        f"{encoder.prefix}aValues[0]=1.0,aValues[1]=2.0,stError.nCode=7i 3000",
+    ]
+
+
+def test_encode_columns(encoder):
+    numpy = pytest.importorskip("numpy")
+    columns = {
+        "timestamp": numpy.array([1000, 2000, 3000], dtype=numpy.int64),
+        "fValue": numpy.ma.MaskedArray([1.5, numpy.nan, 2.5], mask=[0, 0, 1]),
+        "nCount": numpy.array([1, 2, 3], dtype=numpy.int16),
+        "bOn": numpy.array([True, False, True]),
+    }
+    samples = [
+        (1000, {"fValue": 1.5, "nCount": 1, "bOn": True}),
+        (2000, {"nCount": 2, "bOn": False}),
+        (3000, {"nCount": 3, "bOn": True}),
+    ]
+    # Columns encode as the same samples given one by one
+    assert encoder.encode_columns(columns) == encoder.encode(samples)
+
+
+def test_file_sink_flushes_by_size(tmp_path, encoder):
+    path = tmp_path / "samples.lp"
+    sink = LineProtocolSink(encoder, path, flush_size=300, flush_interval=60)
+    for n in range(4):
+        sink.append({"fValue": 1.0}, n)
+    assert path.read_bytes() == b""
+    sink.append({"fValue": 1.0}, 4)
+    assert len(sink) == 0
+    # Batches are sent by a background thread, waited for by flushing
+    sink.flush()
+    assert path.read_bytes().count(b"\n") == sink.lines_written == 5
+    sink.append({"fValue": 1.0}, 5)
+    sink.close()
+    assert path.read_bytes().count(b"\n") == 6
+
+
+def test_stream_sink_flushes_by_time(encoder):
+    stream = io.BytesIO()
+    sink = LineProtocolSink(encoder, stream, flush_interval=0, compress=True)
+    sink.append({"nCount": 1}, 1000)
+    sink.flush()
+    assert (
+        gzip.decompress(stream.getvalue())
+        == f"{encoder.prefix}nCount=1i 1000\n".encode()
+    )
+
+
+def test_sink_flushes_without_appends(encoder):
+    stream = io.BytesIO()
+    sink = LineProtocolSink(encoder, stream, flush_interval=0.2)
+    sink.append({"nCount": 1}, 1000)
+    assert stream.getvalue() == b""
+    # The last samples are sent at the flush interval without waiting for more
+    deadline = time.monotonic() + 5
+    while sink.lines_written < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stream.getvalue() == f"{encoder.prefix}nCount=1i 1000\n".encode()
+    sink.close()
+    assert sink._flush_timer is None
+
+
+def test_udp_sink(encoder):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver:
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(1)
+        port = receiver.getsockname()[1]
+        with LineProtocolSink(
+            encoder, f"udp://127.0.0.1:{port}", flush_interval=60
+        ) as sink:
+            sink.append({"nCount": 1}, 1000)
+            sink.append({"nCount": 2}, 2000)
+        assert receiver.recv(65536).count(b"\n") == 2
+
+
+def test_tcp_sink(encoder):
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+        sink = LineProtocolSink(encoder, f"tcp://127.0.0.1:{port}", flush_interval=60)
+        connection, _ = server.accept()
+        with connection:
+            sink.append({"nCount": 1}, 1000)
+            sink.close()
+            assert (
+                connection.recv(65536) == f"{encoder.prefix}nCount=1i 1000\n".encode()
+            )
+
+
+def test_tcp_sink_reconnects(encoder):
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+        sink = LineProtocolSink(encoder, f"tcp://127.0.0.1:{port}", flush_interval=60)
+        server.accept()[0].close()
+        # The connection breaks while sending
+        sink._socket.close()
+        sink.append({"nCount": 1}, 1000)
+        sink.flush()
+        assert sink.lines_dropped == 1
+
+        sink.append({"nCount": 2}, 2000)
+        sink.flush()
+        connection, _ = server.accept()
+        with connection:
+            sink.close()
+            assert (
+                connection.recv(65536) == f"{encoder.prefix}nCount=2i 2000\n".encode()
+            )
+    assert sink.lines_written == 1
+
+
+def test_tcp_sink_backs_off_reconnecting(encoder):
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+        sink = LineProtocolSink(
+            encoder,
+            f"tcp://127.0.0.1:{port}",
+            flush_interval=60,
+            reconnect_backoff=Backoff(initial=60, jitter=0),
+        )
+        server.accept()[0].close()
+    sink._socket.close()
+    for n in range(3):
+        sink.append({"nCount": n}, n)
+        sink.flush()
+    assert sink.lines_dropped == 3
+    # Only the batch after the failed send tried to reconnect
+    assert sink._reconnect_attempts == 1
+    sink.close()
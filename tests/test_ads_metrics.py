@@ -0,0 +1,116 @@
+import socket
+import urllib.request
+
+import pyads
+import pytest
+from prometheus_client import REGISTRY
+
+from ads_client import ADSConnection, start_metrics_server
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+ADSERR_DEVICE_SYMBOLNOTFOUND = 0x710
+
+
+def sample(name, **labels):
+    labels.setdefault("ams_net_id", PYADS_TESTSERVER_ADS_ADDRESS)
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture(params=["pyads", "asyncio"])
+def target(request, testserver_advanced):
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+        backend=request.param,
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT, "max_in_flight": 1},
+    )
+    with target:
+        yield target
+    target.ensure_closed()
+
+
+def test_sum_read_metrics(target):
+    reads = sample("ads_client_connection_read_events_total")
+    durations = sample(
+        "ads_client_connection_operation_duration_seconds_count", operation="sum_read"
+    )
+    batches = sample("ads_client_connection_batch_size_sum", operation="sum_read")
+    requests = sample("ads_client_connection_request_duration_seconds_count")
+    received = sample("ads_client_connection_bytes_received_total")
+
+    target.read_list_by_name(["real0", "real1", "real2"])
+
+    assert sample("ads_client_connection_read_events_total") == reads + 3
+    assert (
+        sample(
+            "ads_client_connection_operation_duration_seconds_count",
+            operation="sum_read",
+        )
+        == durations + 1
+    )
+    assert (
+        sample("ads_client_connection_batch_size_sum", operation="sum_read")
+        == batches + 3
+    )
+    assert sample("ads_client_connection_request_duration_seconds_count") > requests
+    # Three LREALs and their error codes
+    assert sample("ads_client_connection_bytes_received_total") >= received + 36
+
+
+def test_write_metrics(target):
+    writes = sample("ads_client_connection_write_events_total")
+    sent = sample("ads_client_connection_bytes_sent_total")
+
+    target.write_by_name("real0", 1.5, pyads.PLCTYPE_LREAL)
+    target.write_list_by_name({"real1": 2.5, "real2": 3.5})
+
+    assert sample("ads_client_connection_write_events_total") == writes + 3
+    assert sample("ads_client_connection_bytes_sent_total") >= sent + 24
+
+
+def test_untyped_request_bytes(target):
+    received = sample("ads_client_connection_bytes_received_total")
+    sent = sample("ads_client_connection_bytes_sent_total")
+
+    # Without a type the sizes come from the symbol information of the LREALs
+    target.write_by_name("real0", 4.5)
+    assert target.read_by_name("real0") == 4.5
+
+    assert sample("ads_client_connection_bytes_sent_total") == sent + 8
+    assert sample("ads_client_connection_bytes_received_total") == received + 8
+
+
+def test_error_codes_are_counted(target):
+    labels = {"error_code": hex(ADSERR_DEVICE_SYMBOLNOTFOUND)}
+    errors = sample("ads_client_connection_errors_total", **labels)
+    durations = sample(
+        "ads_client_connection_operation_duration_seconds_count",
+        operation="read_by_name",
+    )
+    # The testserver cannot answer with an error, so the operation raises it
+    with pytest.raises(pyads.ADSError):
+        with target._measure("read_by_name", reads=1):
+            raise pyads.ADSError(err_code=ADSERR_DEVICE_SYMBOLNOTFOUND)
+    assert sample("ads_client_connection_errors_total", **labels) == errors + 1
+    # Failed operations are timed too
+    assert (
+        sample(
+            "ads_client_connection_operation_duration_seconds_count",
+            operation="read_by_name",
+        )
+        == durations + 1
+    )
+
+
+def test_metrics_server():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = start_metrics_server(port, addr="127.0.0.1")
+    # Starting it again on the same port is a no-op
+    assert start_metrics_server(port, addr="127.0.0.1") is server
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        body = response.read().decode()
+    assert "ads_client_connection_operation_duration_seconds" in body
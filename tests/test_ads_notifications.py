@@ -0,0 +1,154 @@
+import asyncio
+import struct
+from collections import deque
+from datetime import datetime, timezone
+
+import pytest
+
+from ads_client import ADSConnection, ADSConnectionPool
+from ads_client.ads_client import ADSReaderClient
+from ads_client.ads_transport import (
+    NOTIFICATION_SAMPLE_HEADER,
+    NOTIFICATION_STAMP_HEADER,
+    NOTIFICATION_STREAM_HEADER,
+    AsyncADSTransport,
+)
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+# 2024-01-01 00:00:00 UTC as a Windows FILETIME
+FILETIME_2024 = 133485408000000000
+
+
+@pytest.fixture
+def target(testserver_advanced):
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+    )
+    yield target
+    target.remove_notifications()
+    target.ensure_closed()
+
+
+def test_notifications_keep_connection_open(target):
+    samples = []
+    target.add_notifications(
+        "real0", lambda *sample: samples.append(sample), cycle_time=0.01
+    )
+    assert target.is_open
+    assert target.notifications == ["real0"]
+
+    target.write_by_name("real0", 2.5)
+    target.write_by_name("real0", 3.5)
+    assert [(name, value) for name, _, value in samples] == [
+        ("real0", 2.5),
+        ("real0", 3.5),
+    ]
+    assert isinstance(samples[0][1], datetime)
+    # The connection is kept open by the subscription rather than a session
+    assert target.session_depth == 0 and target.is_open
+
+    target.remove_notifications("real0")
+    assert not target.is_open
+    target.write_by_name("real0", 4.5)
+    assert len(samples) == 2
+
+
+def test_notifications_restored_after_reconnect(target):
+    samples = []
+    target.add_notifications("real1", lambda *sample: samples.append(sample))
+    target.ensure_closed()
+    assert not target.is_open
+
+    target.open()
+    target.write_by_name("real1", 1.25)
+    assert [value for _, _, value in samples] == [1.25]
+
+
+def test_notifications_fan_out_to_subscribers(target):
+    first, second = [], []
+    first_token = target.add_notifications(
+        "real0", lambda *sample: first.append(sample[2])
+    )
+    second_token = target.add_notifications(
+        "real0", lambda *sample: second.append(sample[2])
+    )
+    assert first_token != second_token
+    assert target.notifications == ["real0"]
+
+    target.write_by_name("real0", 5.5)
+    assert first == second == [5.5]
+
+    # The notification on the target stays until its last subscriber is gone
+    target.remove_notifications("real0", first_token)
+    assert target.notifications == ["real0"] and target.is_open
+    target.write_by_name("real0", 6.5)
+    assert first == [5.5]
+    assert second == [5.5, 6.5]
+
+    target.remove_notifications("real0", second_token)
+    assert target.notifications == []
+    assert not target.is_open
+
+
+def test_transport_dispatches_notification_stream():
+    transport = AsyncADSTransport(PYADS_TESTSERVER_ADS_ADDRESS)
+    received = {1: [], 2: []}
+    for handle, samples in received.items():
+        transport._notification_callbacks[
+            handle
+        ] = lambda timestamp, data, samples=samples: samples.append((timestamp, data))
+    stamp = (
+        NOTIFICATION_STAMP_HEADER.pack(FILETIME_2024, 2)
+        + NOTIFICATION_SAMPLE_HEADER.pack(1, 4)
+        + struct.pack("<f", 1.5)
+        + NOTIFICATION_SAMPLE_HEADER.pack(2, 2)
+        + struct.pack("<h", -3)
+    )
+    data = NOTIFICATION_STREAM_HEADER.pack(len(stamp) + 4, 1) + stamp
+    transport._dispatch_notifications(data)
+
+    timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert [(t.astimezone(timezone.utc), v) for t, v in received[1]] == [
+        (timestamp, struct.pack("<f", 1.5))
+    ]
+    assert [v for _, v in received[2]] == [struct.pack("<h", -3)]
+
+
+@pytest.mark.asyncio
+async def test_reader_client_notification_mode(testserver_advanced):
+    buffer = deque()
+    client = ADSReaderClient(
+        buffer=buffer,
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        # The testserver numbers notification handles per variable, so only one
+        # variable can be subscribed to at a time
+        data_names=["real2"],
+        notification_mode="on_change",
+        connection_pool=ADSConnectionPool(idle_timeout=0),
+    )
+    target = client.target
+    try:
+        await client.do_work()
+        assert target.notifications == ["real2"]
+        await target.write_by_name_async("real2", -17.25)
+        await target.write_by_name_async("real2", -18.25)
+        # Samples are queued from the notification thread
+        await asyncio.sleep(0.1)
+        assert not buffer
+        await client.do_work()
+        assert list(buffer) == [{"real2": -17.25}, {"real2": -18.25}]
+    finally:
+        client.close()
+    assert target.notifications == []
+
+
+def test_reader_client_notification_mode_validated():
+    with pytest.raises(ValueError):
+        ADSReaderClient(
+            buffer=deque(),
+            ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+            notification_mode="sometimes",
+        )
@@ -0,0 +1,111 @@
+import array
+
+import pyads
+import pyads.testserver
+import pytest
+
+from ads_client import ADSConnection
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+numpy = pytest.importorskip("numpy")
+
+# The testserver reads each request with a single 4 kB recv
+WAVEFORM_LENGTH = 256
+
+
+@pytest.fixture
+def waveform(testserver_advanced):
+    handler = testserver_advanced.handler
+    try:
+        # The testserver stores whatever was last written, whatever its size
+        handler.get_variable_by_name("GVL.aWaveform").value = bytes(8 * WAVEFORM_LENGTH)
+    except KeyError:
+        handler.add_variable(
+            pyads.testserver.PLCVariable(
+                "GVL.aWaveform",
+                value=bytes(8 * WAVEFORM_LENGTH),
+                ads_type=pyads.constants.ADST_REAL64,
+                symbol_type=f"ARRAY [0..{WAVEFORM_LENGTH - 1}] OF LREAL",
+            )
+        )
+    yield "GVL.aWaveform"
+
+
+@pytest.fixture(params=["pyads", "asyncio"])
+def target(request, testserver_advanced):
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+        backend=request.param,
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT, "max_in_flight": 1},
+    )
+    with target:
+        yield target
+    target.ensure_closed()
+
+
+def test_ndarray_round_trip(waveform, target):
+    values = numpy.linspace(-1.0, 1.0, WAVEFORM_LENGTH)
+    target.write_array_by_name(waveform, values, verify=True)
+
+    result = target.read_array_by_name(waveform, as_numpy=True)
+    assert isinstance(result, numpy.ndarray)
+    assert result.dtype == numpy.float64
+    numpy.testing.assert_array_equal(result, values)
+
+    # The PLC type given by the caller takes precedence over the symbol type
+    result = target.read_array_by_name(
+        waveform, pyads.PLCTYPE_LREAL, array_size=WAVEFORM_LENGTH, as_numpy=True
+    )
+    numpy.testing.assert_array_equal(result, values)
+    assert (
+        target.read_array_by_name(waveform, pyads.PLCTYPE_LREAL, WAVEFORM_LENGTH)
+        == values.tolist()
+    )
+
+
+def test_write_buffer_objects(waveform, target):
+    # Buffers are converted to the PLC type as a whole
+    target.write_array_by_name(
+        waveform, numpy.arange(WAVEFORM_LENGTH), plc_datatype=pyads.PLCTYPE_LREAL
+    )
+    result = target.read_array_by_name(waveform, as_numpy=True)
+    numpy.testing.assert_array_equal(result, numpy.arange(WAVEFORM_LENGTH))
+
+    target.write_array_by_name(waveform, array.array("d", [0.5] * WAVEFORM_LENGTH))
+    result = target.read_array_by_name(waveform, as_numpy=True)
+    assert result.tolist() == [0.5] * WAVEFORM_LENGTH
+
+
+def test_write_converts_to_symbol_type(waveform, target):
+    # Without a PLC type, elements are converted to the type of the symbol
+    target.write_array_by_name(waveform, array.array("i", range(WAVEFORM_LENGTH)))
+    result = target.read_array_by_name(waveform, as_numpy=True)
+    numpy.testing.assert_array_equal(result, numpy.arange(WAVEFORM_LENGTH))
+
+    target.write_array_by_name(waveform, [1.5] * WAVEFORM_LENGTH)
+    assert target.read_array_by_name(waveform, as_numpy=True).tolist() == (
+        [1.5] * WAVEFORM_LENGTH
+    )
+
+
+def test_write_checks_size(waveform, target):
+    target.write_array_by_name(waveform, numpy.zeros(WAVEFORM_LENGTH))
+    # Writing past the end of the variable would overwrite the memory after it
+    with pytest.raises(ValueError):
+        target.write_array_by_name(waveform, numpy.ones(WAVEFORM_LENGTH + 1))
+    with pytest.raises(ValueError):
+        target.write_array_by_name(waveform, [1.0] * (WAVEFORM_LENGTH + 1))
+    with pytest.raises(ValueError):
+        target.write_array_by_name(waveform, numpy.ones(4), partial=False)
+    with pytest.raises(ValueError):
+        target.write_array_by_name(waveform, [1.0] * 4, partial=False)
+    assert not target.read_array_by_name(waveform, as_numpy=True).any()
+
+    # Shorter arrays are written to the start of the variable
+    target.write_array_by_name(waveform, numpy.ones(4))
+    target.write_array_by_name(waveform, [2.0] * 2)
+    # The testserver keeps only the bytes written last
+    result = target.read_array_by_name(waveform, pyads.PLCTYPE_LREAL, array_size=2)
+    assert result == [2.0, 2.0]
@@ -0,0 +1,96 @@
+import asyncio
+import os
+
+import pytest
+from prometheus_client import REGISTRY
+
+from ads_client import ADSConnectionPool, ADSOrchestrator, Backoff
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+# Nothing listens on this address, so reads from it fail
+UNREACHABLE_ADS_ADDRESS = "127.0.0.9.1.1"
+
+TARGETS_YAML = """
+testserver:
+  ams_net_id: "{ams_net_id}"
+  ams_net_port: {ams_net_port}
+  update_interval: 0.05
+  data_names: [{data_names}]
+unreachable:
+  ams_net_id: "{unreachable}"
+  ip_address: "127.0.0.9"
+  ams_net_port: {ams_net_port}
+  update_interval: 0.05
+  data_names: [real0]
+"""
+
+
+def write_targets(path, data_names="real0, real1", unreachable=True):
+    text = TARGETS_YAML.format(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        unreachable=UNREACHABLE_ADS_ADDRESS,
+        data_names=data_names,
+    )
+    if not unreachable:
+        text = text.split("unreachable:")[0]
+    path.write_text(text)
+    # Make sure the change is seen even within the resolution of the file system
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def _failures():
+    return (
+        REGISTRY.get_sample_value(
+            "ads_client_operation_failures_total",
+            {"ams_net_id": UNREACHABLE_ADS_ADDRESS},
+        )
+        or 0
+    )
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_isolates_and_reloads_targets(testserver_advanced, tmp_path):
+    path = tmp_path / "ads_targets.yaml"
+    write_targets(path)
+    failures = _failures()
+    orchestrator = ADSOrchestrator(
+        path,
+        max_in_flight=4,
+        reload_interval=0.05,
+        restart_delay=0.05,
+        connection_pool=ADSConnectionPool(max_size=1, idle_timeout=0),
+        client_options={"retry_attempts": 1, "backoff": Backoff(initial=0.01)},
+    )
+    task = asyncio.ensure_future(orchestrator.run())
+    try:
+        await asyncio.sleep(1)
+        assert set(orchestrator.tasks) == {"testserver", "unreachable"}
+        # The unreachable target fails without holding up the other
+        assert _failures() > failures
+        samples = list(orchestrator.buffers["testserver"])
+        assert len(samples) >= 10
+        assert set(samples[-1]) == {"real0", "real1"}
+        assert not orchestrator.buffers["unreachable"]
+        # The pool grows to give every target its own connection
+        assert orchestrator.connection_pool.max_size == 2
+
+        # Removed targets are stopped and changed ones restarted
+        running = orchestrator.tasks["testserver"]
+        write_targets(path, data_names="real2", unreachable=False)
+        await asyncio.sleep(0.5)
+        assert set(orchestrator.tasks) == {"testserver"}
+        assert orchestrator.tasks["testserver"] is not running
+        assert set(orchestrator.buffers["testserver"][-1]) == {"real2"}
+
+        # A broken file keeps the running targets
+        running = orchestrator.tasks["testserver"]
+        path.write_text("testserver: [unbalanced")
+        await asyncio.sleep(0.2)
+        assert orchestrator.tasks == {"testserver": running}
+    finally:
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    assert orchestrator.tasks == {}
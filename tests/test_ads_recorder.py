@@ -0,0 +1,113 @@
+import pyads
+import pytest
+
+from ads_client import ADSConnection, ArrowRecorder
+from ads_client.ads_client import ADSReaderClient
+from ads_client.ads_recorder import arrow_type
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+pyarrow = pytest.importorskip("pyarrow")
+pytest.importorskip("pyarrow.parquet")
+
+PLC_DATATYPES = {
+    "fValue": pyads.PLCTYPE_LREAL,
+    "nCount": pyads.PLCTYPE_INT,
+    "bOn": pyads.PLCTYPE_BOOL,
+    "aValues": pyads.PLCTYPE_REAL * 2,
+}
+
+
+def samples(count: int, start: int = 0):
+    for n in range(start, start + count):
+        yield {
+            "fValue": n * 0.5,
+            "nCount": n,
+            "bOn": n % 2 == 1,
+            "aValues": [n, -n],
+        }, n
+
+
+def test_arrow_types():
+    assert arrow_type(pyads.PLCTYPE_INT) == pyarrow.int16()
+    assert arrow_type(pyads.PLCTYPE_UDINT) == pyarrow.uint32()
+    assert arrow_type(pyads.PLCTYPE_STRING) == pyarrow.string()
+    assert arrow_type(pyads.PLCTYPE_LREAL * 4) == pyarrow.list_(pyarrow.float64(), 4)
+
+
+def test_rolling_parquet_files(tmp_path):
+    recorder = ArrowRecorder(tmp_path, PLC_DATATYPES, batch_size=4, max_file_size=1)
+    for values, timestamp in samples(10):
+        recorder.append(values, timestamp)
+    recorder.close()
+    # Each batch exceeds the file size, so every batch starts a new file
+    assert len(recorder.files) == 3
+    assert not list(tmp_path.glob("*.part"))
+    table = pyarrow.concat_tables(
+        pyarrow.parquet.read_table(path) for path in recorder.files
+    )
+    assert table.schema == recorder.schema
+    assert table.column("nCount").to_pylist() == list(range(10))
+    assert table.column("aValues").to_pylist()[3] == [3.0, -3.0]
+
+
+def test_files_roll_by_duration(tmp_path):
+    recorder = ArrowRecorder(
+        tmp_path, PLC_DATATYPES, batch_size=100, max_file_duration=10
+    )
+    for values, timestamp in samples(3):
+        recorder.append(values, timestamp)
+    # The file has been appended to for longer than its duration
+    recorder._file_started -= 10
+    for values, timestamp in samples(2, start=3):
+        recorder.append(values, timestamp)
+    recorder.close()
+    assert [pyarrow.parquet.read_table(path).num_rows for path in recorder.files] == [
+        3,
+        2,
+    ]
+
+
+def test_untyped_variables_are_skipped(tmp_path, caplog):
+    recorder = ArrowRecorder(tmp_path, {**PLC_DATATYPES, "stError": None})
+    recorder.close()
+    assert recorder.schema.names == ["timestamp", *PLC_DATATYPES]
+    assert "stError" in caplog.text
+
+
+def test_arrow_files_missing_values(tmp_path):
+    with ArrowRecorder(
+        tmp_path, PLC_DATATYPES, file_format="arrow", batch_size=100
+    ) as recorder:
+        recorder.append({"fValue": 1.5, "sUnknown": "x"}, 1)
+        recorder.flush().result()
+        recorder.append({"nCount": 2}, 2)
+    [path] = recorder.files
+    # Arrow files are uncompressed by default and can be memory-mapped
+    with pyarrow.memory_map(str(path)) as source:
+        table = pyarrow.ipc.open_file(source).read_all()
+    assert table.num_rows == 2
+    assert table.column("fValue").to_pylist() == [1.5, None]
+    assert table.column("nCount").to_pylist() == [None, 2]
+
+
+@pytest.mark.asyncio
+async def test_reader_recorder(tmp_path, testserver_advanced):
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+    )
+    recorder = ArrowRecorder.from_connection(target, ["real0", "real1"], tmp_path)
+    assert recorder.schema.field("real0").type == pyarrow.float64()
+    reader = ADSReaderClient(
+        buffer=recorder,
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        data_names=["real0", "real1"],
+    )
+    for _ in range(3):
+        await reader.do_work()
+    reader.close()
+    recorder.close()
+    target.ensure_closed()
+    assert pyarrow.parquet.read_table(recorder.files[0]).num_rows == 3
@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+from pyads import ADSError
+
+from ads_client import ADSClient, ADSConnectionPool
+from ads_client.ads_resilience import (
+    Backoff,
+    CircuitBreaker,
+    get_circuit_breaker,
+    is_transport_error,
+)
+from ads_client.ads_transport import ADSERR_PORT_NOT_CONNECTED
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+# ADS error of a request to a target that did not answer
+TIMEOUT_ELAPSED = 0x745
+# ADS error of a request naming a variable unknown to the target
+SYMBOL_NOT_FOUND = 0x710
+
+
+def test_backoff_grows_with_jitter():
+    backoff = Backoff(initial=0.1, maximum=1.0, multiplier=2.0, jitter=0.5)
+    for attempt, delay in enumerate([0.1, 0.2, 0.4, 0.8, 1.0, 1.0]):
+        assert delay * 0.5 <= backoff.delay(attempt) <= delay
+    assert Backoff(initial=0.1, jitter=0).delay(2) == pytest.approx(0.4)
+
+
+def test_transport_errors():
+    assert is_transport_error(ADSError(err_code=TIMEOUT_ELAPSED))
+    assert is_transport_error(
+        ADSError(ADSERR_PORT_NOT_CONNECTED, "AMS/TCP connection lost")
+    )
+    assert not is_transport_error(ADSError(text="Connection closed"))
+    assert not is_transport_error(ADSError(err_code=SYMBOL_NOT_FOUND))
+
+
+def test_circuit_breaker_states():
+    breaker = CircuitBreaker("1.2.3.4.1.1", failure_threshold=2, reset_timeout=0.1)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    # After the timeout a single trial is let through
+    time.sleep(0.1)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    # A failed trial opens the circuit again
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.1)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_circuit_breakers_are_shared_per_target():
+    breaker = get_circuit_breaker("1.2.3.4.1.1", 851)
+    assert get_circuit_breaker("1.2.3.4.1.1", 851) is breaker
+    assert get_circuit_breaker("1.2.3.4.1.1", 852) is not breaker
+
+
+@pytest.fixture
+def client(testserver_advanced):
+    client = ADSClient(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        retry_attempts=3,
+        connection_pool=ADSConnectionPool(),
+        backoff=Backoff(initial=0.001),
+        circuit_breaker=CircuitBreaker(
+            PYADS_TESTSERVER_ADS_ADDRESS, failure_threshold=2, reset_timeout=60
+        ),
+    )
+    yield client
+    client.close()
+
+
+def _reconnects():
+    return (
+        REGISTRY.get_sample_value(
+            "ads_client_connection_reconnect_events_total",
+            {"ams_net_id": PYADS_TESTSERVER_ADS_ADDRESS},
+        )
+        or 0
+    )
+
+
+@pytest.mark.asyncio
+async def test_transport_errors_reconnect_and_open_circuit(client):
+    events = []
+    client.report_failure = events.append
+    reconnects = _reconnects()
+    calls = 0
+
+    async def failing_operation():
+        nonlocal calls
+        calls += 1
+        raise ADSError(err_code=TIMEOUT_ELAPSED)
+
+    assert not await client._perform_operation(failing_operation)
+    # The circuit opened after two failures, so the third attempt was not made
+    assert calls == 2
+    assert client.circuit_breaker.state == CircuitBreaker.OPEN
+    assert _reconnects() == reconnects + 2
+    assert client.target.is_open
+    assert [event.attempt for event in events] == [0, 1]
+    assert all(event.transport_error for event in events)
+    assert events[0].error_code == TIMEOUT_ELAPSED
+    assert events[0].ams_net_id == PYADS_TESTSERVER_ADS_ADDRESS
+
+    # Operations are skipped while the circuit is open
+    assert not await client._perform_operation(failing_operation)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_shared_connection_is_reconnected_once(client):
+    other = ADSClient(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        retry_attempts=1,
+        connection_pool=client.connection_pool,
+    )
+    client.retry_attempts = 1
+    assert other.target is client.target
+    reconnects = _reconnects()
+
+    async def failing_operation():
+        await asyncio.sleep(0.01)
+        raise ADSError(err_code=TIMEOUT_ELAPSED)
+
+    try:
+        # Both clients fail on the same connection before either reconnects it
+        results = await asyncio.gather(
+            client._perform_operation(failing_operation),
+            other._perform_operation(failing_operation),
+        )
+    finally:
+        other.close()
+    assert results == [False, False]
+    assert _reconnects() == reconnects + 1
+    assert client.target.is_open
+
+
+@pytest.mark.asyncio
+async def test_request_errors_are_retried_without_opening_circuit(client):
+    events = []
+    client.report_failure = events.append
+    reconnects = _reconnects()
+    calls = 0
+
+    async def flaky_operation():
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise ADSError(err_code=SYMBOL_NOT_FOUND)
+
+    assert await client._perform_operation(flaky_operation)
+    assert calls == 3
+    assert len(events) == 2 and not events[0].transport_error
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+    assert _reconnects() == reconnects
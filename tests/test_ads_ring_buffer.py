@@ -0,0 +1,123 @@
+import asyncio
+import threading
+
+import pyads
+import pytest
+
+from ads_client import BufferFullError, ColumnarRingBuffer
+from ads_client.ads_client import ADSReaderClient
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+numpy = pytest.importorskip("numpy")
+
+
+def ring_buffer(capacity=4, **kwargs) -> ColumnarRingBuffer:
+    return ColumnarRingBuffer(
+        ["fValue", "nCount", "bOn"],
+        capacity,
+        dtypes={"nCount": pyads.PLCTYPE_INT, "bOn": pyads.PLCTYPE_BOOL},
+        **kwargs,
+    )
+
+
+def fill(buffer, count, start=0):
+    for n in range(start, start + count):
+        buffer.append({"fValue": n * 0.5, "nCount": n, "bOn": n % 2 == 1}, n * 1000)
+
+
+def test_typed_columns():
+    buffer = ring_buffer()
+    assert buffer.timestamps.dtype == numpy.int64
+    assert buffer.columns["fValue"].dtype == numpy.float64
+    assert buffer.columns["nCount"].dtype == numpy.int16
+    assert buffer.columns["bOn"].dtype == numpy.bool_
+    fill(buffer, 2)
+    assert buffer[-1] == {"timestamp": 1000, "fValue": 0.5, "nCount": 1, "bOn": True}
+
+
+def test_overwrite_oldest():
+    buffer = ring_buffer()
+    fill(buffer, 6)
+    assert len(buffer) == 4 and buffer.full
+    assert buffer.overwritten == 2
+    # Columns are in the order samples were appended, across the wrap around
+    assert buffer.column("nCount").tolist() == [2, 3, 4, 5]
+    assert buffer[1:3]["timestamp"].tolist() == [3000, 4000]
+
+
+def test_window():
+    buffer = ring_buffer(capacity=8)
+    fill(buffer, 10)
+    window = buffer.window(start=4000, end=7000)
+    assert window["timestamp"].tolist() == [4000, 5000, 6000]
+    assert window["fValue"].tolist() == [2.0, 2.5, 3.0]
+    assert buffer.window(start=9000)["nCount"].tolist() == [9]
+
+
+def test_consume():
+    buffer = ring_buffer()
+    fill(buffer, 3)
+    assert buffer.consume(2)["nCount"].tolist() == [0, 1]
+    fill(buffer, 3, start=3)
+    assert buffer.consume()["nCount"].tolist() == [2, 3, 4, 5]
+    assert len(buffer) == 0
+
+
+def test_missing_values():
+    buffer = ring_buffer()
+    fill(buffer, 1)
+    buffer.append({"nCount": 7}, 1000)
+    # Missing values keep the previous value, or are masked
+    assert buffer.column("fValue").tolist() == [0.0, 0.0]
+    assert buffer.column("fValue", masked=True).mask.tolist() == [False, True]
+    assert buffer[1] == {"timestamp": 1000, "nCount": 7}
+
+
+def test_block_on_full():
+    buffer = ring_buffer(capacity=2, policy="block", timeout=0.05)
+    fill(buffer, 2)
+    with pytest.raises(BufferFullError):
+        fill(buffer, 1, start=2)
+
+    buffer.timeout = None
+    consumer = threading.Timer(0.05, buffer.consume, args=(1,))
+    consumer.start()
+    fill(buffer, 1, start=2)
+    consumer.join()
+    assert buffer.column("nCount").tolist() == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_block_rejected_in_event_loop():
+    buffer = ring_buffer(capacity=2, policy="block")
+    with pytest.raises(RuntimeError):
+        fill(buffer, 1)
+    assert len(buffer) == 0
+    # Other threads still append while the loop runs
+    await asyncio.get_running_loop().run_in_executor(None, fill, buffer, 1)
+    assert len(buffer) == 1
+
+
+def test_array_columns():
+    buffer = ColumnarRingBuffer(
+        ["aValues"], 2, dtypes={"aValues": pyads.PLCTYPE_LREAL * 4}
+    )
+    buffer.append({"aValues": [1.0, 2.0, 3.0, 4.0]})
+    assert buffer.column("aValues").shape == (1, 4)
+
+
+@pytest.mark.asyncio
+async def test_reader_sink(testserver_advanced):
+    buffer = ColumnarRingBuffer(["real0", "real1"], capacity=3)
+    reader = ADSReaderClient(
+        buffer=buffer,
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        data_names=["real0", "real1"],
+    )
+    reader.target.write_list_by_name({"real0": 1.5, "real1": 2.5})
+    for _ in range(4):
+        await reader.do_work()
+    reader.close()
+    assert len(buffer) == 3
+    assert buffer.column("real1").tolist() == [2.5] * 3
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import deque
+from pathlib import Path
+
+import pytest
+
+from ads_client import ADSConnectionPool, ADSScheduler, load_targets
+from ads_client.ads_client import Ticker
+from ads_client.ads_scheduler import base_interval
+from ads_client.ads_targets import TagGroup
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+TARGETS_YAML = """
+PLC1:
+  ams_net_id: "127.0.0.1.1.1"
+  ams_net_port: 48898
+  update_interval: 1
+  data_names: [real0, real1]
+  groups:
+    fast:
+      update_interval: 0.01
+      data_names: [real2]
+    medium:
+      update_interval: 0.1
+      data_names: [real3, real0]
+# PLC2:
+#   ams_net_id: "127.0.0.2.1.1"
+"""
+
+
+@pytest.fixture
+def targets_file(tmp_path):
+    path = tmp_path / "ads_targets.yaml"
+    path.write_text(TARGETS_YAML)
+    return path
+
+
+def test_load_targets(targets_file):
+    targets = load_targets(targets_file)
+    assert list(targets) == ["PLC1"]
+    target = targets["PLC1"]
+    assert target.ams_net_port == 48898
+    assert target.groups == (
+        TagGroup("default", 1.0, ("real0", "real1")),
+        TagGroup("fast", 0.01, ("real2",)),
+        TagGroup("medium", 0.1, ("real3", "real0")),
+    )
+    assert target.data_names == ["real0", "real1", "real2", "real3"]
+
+
+def test_load_repository_targets():
+    targets = load_targets(Path(__file__).parents[1] / "config" / "ads_targets.yaml")
+    assert targets["PLC1"].groups[0].update_interval == 0.1
+
+
+def test_base_interval():
+    assert base_interval([0.01, 0.1, 1]) == 0.01
+    assert base_interval([0.25, 0.1]) == 0.05
+
+
+@pytest.mark.asyncio
+async def test_ticker_does_not_drift():
+    ticker = Ticker(0.02)
+    for _ in range(10):
+        await ticker.wait()
+        await asyncio.sleep(0.01)
+    # Ten ticks take nine intervals plus the last piece of work, not ten of each
+    assert time.monotonic() - ticker.start < 0.02 * 9 + 0.01 + 0.015
+    assert ticker.missed == 0
+
+
+@pytest.mark.asyncio
+async def test_ticker_skips_missed_ticks():
+    ticker = Ticker(0.02)
+    assert await ticker.wait() == 0
+    await asyncio.sleep(0.07)
+    assert await ticker.wait() == 3
+    assert ticker.missed == 2
+
+
+def test_due_groups_catch_up_missed_ticks(testserver_advanced):
+    scheduler = ADSScheduler(
+        buffer=deque(),
+        groups=[("fast", 0.01, ("real0",)), ("slow", 0.05, ("real1",))],
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        connection_pool=ADSConnectionPool(),
+    )
+    assert scheduler.update_interval == 0.01
+    assert scheduler.periods == [1, 5]
+    assert [group.name for group in scheduler.due_groups(0)] == ["fast", "slow"]
+    assert [group.name for group in scheduler.due_groups(1)] == ["fast"]
+    # Tick 5 was missed, the slow group is read on the next tick instead
+    assert [group.name for group in scheduler.due_groups(6)] == ["fast", "slow"]
+    assert [group.name for group in scheduler.due_groups(9)] == ["fast"]
+    assert [group.name for group in scheduler.due_groups(10)] == ["fast", "slow"]
+    scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_merges_due_groups(testserver_advanced, targets_file):
+    buffer = deque()
+    target = load_targets(targets_file)["PLC1"]
+    # Slow the groups down so the testserver keeps up
+    target = target._replace(
+        groups=[
+            group._replace(update_interval=group.update_interval * 10)
+            for group in target.groups
+        ]
+    )
+    scheduler = ADSScheduler.from_config(
+        target, buffer, connection_pool=ADSConnectionPool()
+    )
+    assert scheduler.name == "PLC1"
+    assert scheduler.update_interval == 0.1
+    try:
+        await asyncio.wait_for(scheduler.do_work_periodically(), 1.05)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        scheduler.close()
+    # One read per tick, each holding every group due on it
+    assert [sorted(values) for values in buffer][:2] == [
+        ["real0", "real1", "real2", "real3"],
+        ["real2"],
+    ]
+    assert sum("real3" in values for values in buffer) == 2
+    assert sum("real1" in values for values in buffer) == 1
+    assert 9 <= len(buffer) <= 11
@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from prometheus_client import REGISTRY
+
+from ads_client import ADSConnection, Snapshot
+from ads_client.ads_stream import SnapshotQueue
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+
+def snapshot(second: int, values: dict, errors: dict = None) -> Snapshot:
+    return Snapshot(datetime(2024, 1, 1, 0, 0, second), values, errors or {})
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest():
+    overflows = []
+    queue = SnapshotQueue(2, "drop_oldest", on_overflow=lambda: overflows.append(1))
+    for second in range(3):
+        await queue.put(snapshot(second, {"nCount": second}))
+    assert [(await queue.get()).values["nCount"] for _ in range(2)] == [1, 2]
+    assert len(overflows) == 1
+
+
+def test_snapshot_errors_default():
+    first = Snapshot(datetime(2024, 1, 1), {"a": 1})
+    merged = first.merge(Snapshot(datetime(2024, 1, 2), {"b": 2}))
+    assert first.errors is None
+    assert merged.values == {"a": 1, "b": 2} and merged.errors == {}
+
+
+@pytest.mark.asyncio
+async def test_coalesce():
+    queue = SnapshotQueue(1, "coalesce")
+    await queue.put(snapshot(0, {"a": 1, "b": 1}, {"c": 0x745}))
+    await queue.put(snapshot(1, {"c": 2}, {"b": 0x745}))
+    merged = await queue.get()
+    assert merged.timestamp.second == 1
+    assert merged.values == {"a": 1, "c": 2}
+    assert merged.errors == {"b": 0x745}
+
+
+@pytest.mark.asyncio
+async def test_block():
+    queue = SnapshotQueue(1, "block")
+    await queue.put(snapshot(0, {"a": 0}))
+    put = asyncio.ensure_future(queue.put(snapshot(1, {"a": 1})))
+    await asyncio.sleep(0.01)
+    assert not put.done()
+    assert (await queue.get()).values == {"a": 0}
+    await put
+    assert (await queue.get()).values == {"a": 1}
+
+
+@pytest.fixture(params=["pyads", "asyncio"])
+def target(request, testserver_advanced):
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+        backend=request.param,
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT, "max_in_flight": 1},
+    )
+    yield target
+    target.ensure_closed()
+
+
+@pytest.mark.asyncio
+async def test_poll_stream(target):
+    target.write_list_by_name({"real0": 1.5, "real1": 2.5})
+    stream = target.stream(["real0", "real1"], interval=0.01)
+    snapshots = [await stream.__anext__() for _ in range(3)]
+    assert target.is_open
+    await stream.aclose()
+    assert all(s.values == {"real0": 1.5, "real1": 2.5} for s in snapshots)
+    assert snapshots[0].timestamp < snapshots[2].timestamp
+    assert snapshots[0].timestamp.tzinfo == timezone.utc
+    # The stream's session has ended
+    assert not target.is_open
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_drops_oldest(target):
+    labels = {"ams_net_id": PYADS_TESTSERVER_ADS_ADDRESS, "overflow": "drop_oldest"}
+    name = "ads_client_connection_stream_overflows_total"
+    overflows = REGISTRY.get_sample_value(name, labels) or 0
+    stream = target.stream(["real0"], interval=0.01, maxsize=1)
+    first = await stream.__anext__()
+    await asyncio.sleep(0.1)
+    # The snapshot taken is the latest read, not the next one after the first
+    latest = await stream.__anext__()
+    await stream.aclose()
+    assert (latest.timestamp - first.timestamp).total_seconds() >= 0.05
+    assert REGISTRY.get_sample_value(name, labels) > overflows
+
+
+@pytest.mark.asyncio
+async def test_cancelled_consumer_stops_stream(target):
+    received = []
+
+    async def consume():
+        async for snapshot in target.stream(["real0"], interval=0.01):
+            received.append(snapshot)
+
+    task = asyncio.ensure_future(consume())
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert received
+    # A read already running on the executor finishes after the stream is closed
+    await target.run_async(lambda: None)
+    assert target.session_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_notify_stream(testserver_advanced):
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+    )
+    stream = target.stream(["real2"], interval=0.01, mode="notify", maxsize=10)
+    # The subscription is added when the stream is first awaited
+    pending = asyncio.ensure_future(stream.__anext__())
+    while not target.notifications:
+        await asyncio.sleep(0.01)
+    await target.run_async(target.write_by_name, "real2", 4.5)
+    await target.run_async(target.write_by_name, "real2", 5.5)
+    snapshots = [await pending, await stream.__anext__()]
+    await stream.aclose()
+    assert [s.values for s in snapshots] == [{"real2": 4.5}, {"real2": 5.5}]
+    assert target.notifications == []
+    target.ensure_closed()
+
+    with pytest.raises(ValueError):
+        await target.stream(["real2"], mode="notify", overflow="block").__anext__()
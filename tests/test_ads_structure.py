@@ -0,0 +1,194 @@
+import json
+import struct
+
+import pyads
+import pyads.testserver
+import pytest
+from pyads.ads import bytes_from_dict, dict_from_bytes, size_of_structure
+
+from ads_client import ADSConnection
+from ads_client.ads_codec import get_structure_codec, get_symbol_structure_codec
+from ads_client.constants import (
+    ERROR_STRUCTURE,
+    MAGNET_STRUCTURE,
+    TDK_STRUCTURE,
+    TDKLOCAL_STRUCTURE,
+)
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+NESTED_STRUCTURE = (
+    ("rVar", pyads.PLCTYPE_LREAL, 1),
+    ("sVar", pyads.PLCTYPE_STRING, 2, 35),
+    ("wVar", pyads.PLCTYPE_WSTRING, 1, 10),
+    ("iVar", pyads.PLCTYPE_INT, 3),
+    ("errors", ERROR_STRUCTURE, 2),
+)
+NESTED_VALUE = {
+    "rVar": 1.5,
+    "sVar": ["first", "second"],
+    "wVar": "wide",
+    "iVar": [1, -2, 3],
+    "errors": [
+        {"status": True, "code": 3, "source": "MAIN"},
+        {"status": False, "code": -1, "source": "GVL"},
+    ],
+}
+ERRORS = [
+    {"status": True, "code": 1001, "source": "Magnet 1"},
+    {"status": False, "code": 0, "source": ""},
+    {"status": True, "code": -7, "source": "TDK supply"},
+]
+
+
+@pytest.mark.parametrize(
+    "structure_def",
+    [
+        ERROR_STRUCTURE,
+        MAGNET_STRUCTURE,
+        TDK_STRUCTURE,
+        TDKLOCAL_STRUCTURE,
+        NESTED_STRUCTURE,
+    ],
+)
+def test_codec_size_matches_pyads(structure_def):
+    # pyads assumes structures without padding
+    codec = get_structure_codec(structure_def, pack_mode=1)
+    assert codec.size == size_of_structure(structure_def)
+
+
+def test_codec_matches_pyads():
+    codec = get_structure_codec(NESTED_STRUCTURE, pack_mode=1)
+    assert get_structure_codec(NESTED_STRUCTURE, pack_mode=1) is codec
+    data = codec.encode([NESTED_VALUE, NESTED_VALUE])
+    assert list(data) == bytes_from_dict([NESTED_VALUE] * 2, NESTED_STRUCTURE)
+    assert codec.decode(memoryview(data), array_size=2) == dict_from_bytes(
+        data, NESTED_STRUCTURE, array_size=2
+    )
+    assert codec.decode(data[: codec.size]) == NESTED_VALUE
+
+
+MIXED_STRUCTURE = (
+    ("bEnable", pyads.PLCTYPE_BOOL, 1),
+    ("fValue", pyads.PLCTYPE_LREAL, 1),
+    ("nCount", pyads.PLCTYPE_INT, 1),
+    ("wName", pyads.PLCTYPE_WSTRING, 1, 2),
+)
+
+
+@pytest.mark.parametrize(
+    "pack_mode, offsets, size, nested_size",
+    [
+        (8, (0, 8, 16, 18), 24, 56),
+        (4, (0, 4, 12, 14), 20, 44),
+        (1, (0, 1, 9, 11), 17, 35),
+    ],
+)
+def test_codec_pack_modes(pack_mode, offsets, size, nested_size):
+    codec = get_structure_codec(MIXED_STRUCTURE, pack_mode)
+    assert codec.size == size
+    value = {"bEnable": True, "fValue": 2.5, "nCount": -3, "wName": "ab"}
+    data = codec.encode(value)
+    assert data[offsets[0]] == 1
+    assert struct.unpack_from("<d", data, offsets[1])[0] == 2.5
+    assert struct.unpack_from("<h", data, offsets[2])[0] == -3
+    assert data[offsets[3] : offsets[3] + 4] == "ab".encode("utf-16-le")
+    assert codec.decode(data) == value
+    # Nested structures are aligned like their largest member
+    nested_def = (("bFlag", pyads.PLCTYPE_BOOL, 1), ("stMixed", MIXED_STRUCTURE, 2))
+    nested = get_structure_codec(nested_def, pack_mode)
+    assert nested.size == nested_size
+    nested_value = {"bFlag": False, "stMixed": [value, value]}
+    assert nested.decode(nested.encode(nested_value)) == nested_value
+
+
+def test_symbol_structure_codec_detects_pack_mode():
+    packed = get_structure_codec(MIXED_STRUCTURE, pack_mode=1)
+    aligned = get_structure_codec(MIXED_STRUCTURE)
+    assert (
+        get_symbol_structure_codec(MIXED_STRUCTURE, 3 * aligned.size, array_size=3)
+        is aligned
+    )
+    assert get_symbol_structure_codec(MIXED_STRUCTURE, aligned.size) is aligned
+    assert get_symbol_structure_codec(MIXED_STRUCTURE, packed.size) is packed
+    assert (
+        get_symbol_structure_codec(MIXED_STRUCTURE, 2 * packed.size, array_size=2)
+        is packed
+    )
+    with pytest.raises(ValueError):
+        get_symbol_structure_codec(MIXED_STRUCTURE, 5)
+    with pytest.raises(ValueError):
+        get_symbol_structure_codec(MIXED_STRUCTURE, aligned.size, array_size=2)
+    # Structures of pack modes 8 and 2 both fill 72 bytes without filling them exactly
+    with pytest.raises(ValueError, match="ambiguous"):
+        get_symbol_structure_codec(MIXED_STRUCTURE, 3 * aligned.size)
+    assert (
+        get_symbol_structure_codec(MIXED_STRUCTURE, 3 * aligned.size, pack_mode=8)
+        is aligned
+    )
+
+
+def test_symbol_structure_codec_packed_array():
+    structure_def = (
+        ("bFlag", pyads.PLCTYPE_BOOL, 1),
+        ("fValue", pyads.PLCTYPE_LREAL, 1),
+    )
+    packed = get_structure_codec(structure_def, pack_mode=1)
+    assert packed.size * 16 == 144
+    assert get_symbol_structure_codec(structure_def, 144, array_size=16) is packed
+    # Read as one structure the array also fits 16 byte structures of pack mode 8
+    with pytest.raises(ValueError, match="ambiguous"):
+        get_symbol_structure_codec(structure_def, 144)
+    assert get_symbol_structure_codec(structure_def, 144, pack_mode=1) is packed
+    # Pack modes at or above the alignment of every member share one layout
+    lreals = (("fFirst", pyads.PLCTYPE_LREAL, 1), ("fSecond", pyads.PLCTYPE_LREAL, 2))
+    assert get_symbol_structure_codec(lreals, 48).pack_mode == 8
+
+
+def test_codec_truncates_strings():
+    codec = get_structure_codec(ERROR_STRUCTURE)
+    data = codec.encode({"status": True, "code": 1, "source": "x" * 100})
+    assert len(data) == codec.size
+    assert codec.decode(data)["source"] == "x" * 80
+    with pytest.raises(ValueError):
+        codec.encode(ERRORS, array_size=2)
+
+
+@pytest.fixture
+def errors_variable(testserver_advanced):
+    handler = testserver_advanced.handler
+    size = get_structure_codec(ERROR_STRUCTURE).size * len(ERRORS)
+    handler.add_variable(
+        pyads.testserver.PLCVariable(
+            "GVL.aErrors",
+            value=bytes(size),
+            ads_type=pyads.constants.ADST_BIGTYPE,
+            symbol_type="ST_Error",
+        )
+    )
+    yield "GVL.aErrors"
+
+
+@pytest.mark.parametrize("backend", ["pyads", "asyncio"])
+def test_structure_round_trip(errors_variable, backend):
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+        backend=backend,
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT, "max_in_flight": 1},
+    )
+    with target:
+        target.write_structure_by_name(
+            errors_variable, json.dumps(ERRORS), ERROR_STRUCTURE, array_size=3
+        )
+        assert (
+            target.read_structure_by_name(
+                errors_variable, ERROR_STRUCTURE, array_size=3
+            )
+            == ERRORS
+        )
+        assert json.loads(target.read_errors(errors_variable, 3)) == ERRORS
+        assert (
+            target.read_structure_by_name(errors_variable, ERROR_STRUCTURE) == ERRORS[0]
+        )
+    target.ensure_closed()
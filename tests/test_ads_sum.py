@@ -0,0 +1,213 @@
+import struct
+import time
+
+import pyads
+import pyads.testserver
+import pytest
+from pyads.testserver import AmsResponseData
+
+from ads_client import ADSConnection
+from ads_client.ads_connection import (
+    ADSIGRP_SUMUP_READ,
+    ADSIGRP_SUMUP_READWRITE,
+    ADSIGRP_SUMUP_WRITE,
+    chunk_sum_requests,
+)
+from conftest import (
+    PYADS_TESTSERVER_ADS_PORT,
+    add_symbol_variables,
+    get_variable_kwargs,
+)
+
+SUM_TESTSERVER_IP_ADDRESS = "127.0.0.4"
+SUM_TESTSERVER_ADS_ADDRESS = "127.0.0.4.1.1"
+ADSERR_DEVICE_SYMBOLNOTFOUND = 0x710
+VARIABLES = {f"sum_real{n}": round(n * 1.1, 2) for n in range(10)}
+
+
+class SumHandler(pyads.testserver.AdvancedHandler):
+    """
+    Handler adding per-variable errors to sum reads and support for sum read-write
+    commands, counting the sum commands received.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.failing = set()
+        self.sum_commands = []
+
+    def handle_request(self, request):
+        command_id = struct.unpack("<H", request.ams_header.command_id)[0]
+        data = request.ams_header.data
+        if command_id != pyads.constants.ADSCOMMAND_READWRITE:
+            return super().handle_request(request)
+        index_group, count, _, write_length = struct.unpack_from("<IIII", data)
+        if index_group == pyads.constants.ADSIGRP_SYM_INFOBYNAMEEX:
+            return self.symbol_info(request, data[16 : 16 + write_length])
+        if index_group == ADSIGRP_SUMUP_WRITE:
+            self.sum_commands.append((index_group, count))
+            return super().handle_request(request)
+        if index_group == ADSIGRP_SUMUP_READ:
+            read_data = self.sum_read(count, data[16 : 16 + write_length])
+        elif index_group == ADSIGRP_SUMUP_READWRITE:
+            read_data = self.sum_read_write(count, data[16 : 16 + write_length])
+        else:
+            return super().handle_request(request)
+        self.sum_commands.append((index_group, count))
+        state = struct.unpack("<H", request.ams_header.state_flags)[0] | 0x0001
+        return AmsResponseData(
+            struct.pack("<H", state),
+            request.ams_header.error_code,
+            bytes(4) + struct.pack("<I", len(read_data)) + read_data,
+        )
+
+    def symbol_info(self, request, data):
+        try:
+            self.get_variable_by_name(data.decode())
+        except KeyError:
+            # Answer unknown names with an error rather than dropping the connection
+            state = struct.unpack("<H", request.ams_header.state_flags)[0] | 0x0001
+            return AmsResponseData(
+                struct.pack("<H", state),
+                request.ams_header.error_code,
+                struct.pack("<II", ADSERR_DEVICE_SYMBOLNOTFOUND, 0),
+            )
+        return super().handle_request(request)
+
+    def sum_read(self, count, data):
+        errors, values = [], b""
+        for n in range(count):
+            index_group, index_offset, size = struct.unpack_from("<III", data, 12 * n)
+            var = self.get_variable_by_indices(index_group, index_offset)
+            if var.name in self.failing:
+                errors.append(ADSERR_DEVICE_SYMBOLNOTFOUND)
+                values += bytes(size)
+            else:
+                errors.append(0)
+                values += var.value[:size].ljust(size, b"\x00")
+        return struct.pack(f"<{count}I", *errors) + values
+
+    def sum_read_write(self, count, data):
+        results, values = b"", b""
+        offset = 16 * count
+        for n in range(count):
+            index_group, _, _, length = struct.unpack_from("<IIII", data, 16 * n)
+            name = data[offset : offset + length].decode().rstrip("\x00")
+            offset += length
+            if index_group != pyads.constants.ADSIGRP_SYM_HNDBYNAME or (
+                name in self.failing
+            ):
+                results += struct.pack("<II", ADSERR_DEVICE_SYMBOLNOTFOUND, 0)
+                continue
+            results += struct.pack("<II", 0, 4)
+            values += struct.pack("<I", self.get_variable_by_name(name).handle)
+        return results + values
+
+
+@pytest.fixture(scope="module")
+def sum_handler():
+    handler = SumHandler()
+    add_symbol_variables(handler)
+    for name in VARIABLES:
+        handler.add_variable(
+            pyads.testserver.PLCVariable(name, **get_variable_kwargs("reals"))
+        )
+    testserver = pyads.testserver.AdsTestServer(
+        handler, ip_address=SUM_TESTSERVER_IP_ADDRESS
+    )
+    testserver.start()
+    time.sleep(1)
+    yield handler
+    testserver.close()
+
+
+@pytest.fixture(params=["pyads", "asyncio"])
+def sum_target(request, sum_handler):
+    sum_handler.failing.clear()
+    sum_handler.sum_commands.clear()
+    target = ADSConnection(
+        ams_net_id=SUM_TESTSERVER_ADS_ADDRESS,
+        ip_address=SUM_TESTSERVER_IP_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+        backend=request.param,
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT, "max_in_flight": 1},
+        max_sum_sub_commands=4,
+    )
+    with target:
+        yield target
+    target.ensure_closed()
+
+
+def test_chunk_by_sub_commands_and_payload():
+    requests = [(0x4020, n, 8) for n in range(10)]
+    chunks = chunk_sum_requests(ADSIGRP_SUMUP_READ, requests, 4, 1000)
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    # Each read takes 12 request bytes and 12 response bytes
+    chunks = chunk_sum_requests(ADSIGRP_SUMUP_READ, requests, 500, 36)
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    # A sub-command larger than the payload limit is sent on its own
+    requests = [(0x4020, 0, b"\x00" * 100), (0x4020, 1, b"\x00")]
+    chunks = chunk_sum_requests(ADSIGRP_SUMUP_WRITE, requests, 500, 50)
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+
+
+def test_sum_write_read_chunked(sum_handler, sum_target):
+    assert sum_target.write_list_by_name(VARIABLES) == {}
+    result = sum_target.read_list_by_name(list(VARIABLES))
+    assert result == VARIABLES
+    assert result.errors == {}
+    assert [count for _, count in sum_handler.sum_commands] == [4, 4, 2, 4, 4, 2]
+
+
+def test_sum_read_payload_limit(sum_handler, sum_target):
+    sum_target.max_sum_payload = 50
+    sum_target.write_list_by_name(VARIABLES)
+    sum_handler.sum_commands.clear()
+    assert sum_target.read_list_by_name(list(VARIABLES)) == VARIABLES
+    # Each LREAL takes 12 bytes of the response
+    assert [count for _, count in sum_handler.sum_commands] == [4, 4, 2]
+
+
+def test_sum_read_per_variable_errors(sum_handler, sum_target):
+    sum_target.write_list_by_name(VARIABLES)
+    sum_handler.failing.add("sum_real1")
+    result = sum_target.sum_read(["sum_real0", "sum_real1", "sum_real2"])
+    assert result == {"sum_real0": 0.0, "sum_real2": 2.2}
+    assert result.errors == {"sum_real1": ADSERR_DEVICE_SYMBOLNOTFOUND}
+
+
+def test_sum_unknown_names(sum_handler, sum_target):
+    sum_target.write_list_by_name(VARIABLES)
+    sum_handler.sum_commands.clear()
+    result = sum_target.read_list_by_name(["sum_real1", "sum_missing", "sum_real2"])
+    assert result == {"sum_real1": 1.1, "sum_real2": 2.2}
+    assert result.errors == {"sum_missing": ADSERR_DEVICE_SYMBOLNOTFOUND}
+    errors = sum_target.write_list_by_name({"sum_missing": 1.0, "sum_real3": 4.4})
+    assert errors == {"sum_missing": ADSERR_DEVICE_SYMBOLNOTFOUND}
+    assert sum_target.read_by_name("sum_real3") == 4.4
+    # Unknown names are left out of the sum commands
+    assert sum_handler.sum_commands == [
+        (ADSIGRP_SUMUP_READ, 2),
+        (ADSIGRP_SUMUP_WRITE, 1),
+    ]
+
+
+def test_sum_read_write(sum_handler, sum_target):
+    sum_handler.failing.add("sum_real1")
+    results = sum_target.sum_read_write(
+        [
+            (pyads.constants.ADSIGRP_SYM_HNDBYNAME, 0, 4, f"{name}\x00".encode())
+            for name in ("sum_real0", "sum_real1", "sum_real2")
+        ]
+    )
+    handles = [
+        sum_handler.get_variable_by_name(name).handle
+        for name in ("sum_real0", "sum_real2")
+    ]
+    assert results == [
+        (0, struct.pack("<I", handles[0])),
+        (ADSERR_DEVICE_SYMBOLNOTFOUND, b""),
+        (0, struct.pack("<I", handles[1])),
+    ]
+    assert sum_handler.sum_commands == [(ADSIGRP_SUMUP_READWRITE, 3)]
@@ -0,0 +1,106 @@
+import struct
+
+import pyads
+import pytest
+from prometheus_client import REGISTRY
+
+from ads_client import ADSConnection
+from conftest import (
+    PYADS_TESTSERVER_ADS_ADDRESS,
+    PYADS_TESTSERVER_ADS_PORT,
+    TEST_DATASET,
+)
+
+
+def _sample(name):
+    return (
+        REGISTRY.get_sample_value(
+            f"ads_client_symbol_cache_{name}_total",
+            {"ams_net_id": PYADS_TESTSERVER_ADS_ADDRESS},
+        )
+        or 0
+    )
+
+
+def _make_target(backend="pyads", **kwargs):
+    return ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+        backend=backend,
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT, "max_in_flight": 1},
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def symbol_version(testserver_advanced):
+    variable = testserver_advanced.handler.get_variable_by_indices(
+        pyads.constants.ADSIGRP_SYM_VERSION, 0
+    )
+    yield variable
+    variable.value = bytes([1])
+
+
+def test_handles_reused_between_calls(testserver_advanced):
+    target = _make_target()
+    with target:
+        misses = _sample("misses")
+        target.write_by_name("real0", 1.5)
+        handle = target.symbol_cache.handles["real0"]
+        hits = _sample("hits")
+        assert target.read_by_name("real0") == 1.5
+        assert target.symbol_cache.handles["real0"] == handle
+        assert _sample("misses") - misses == 1
+        assert _sample("hits") - hits >= 1
+    target.ensure_closed()
+
+
+def test_handles_released_on_close(testserver_advanced):
+    target = _make_target()
+    with target:
+        target.read_by_name("real0")
+        target.read_by_name("real1")
+        handles = list(target.symbol_cache.handles.values())
+    assert not target.is_open
+    assert target.symbol_cache.handles == {}
+    # Handles are released with one sum write, the last one is left in the variable
+    release_variable = testserver_advanced.handler.get_variable_by_indices(
+        pyads.constants.ADSIGRP_SYM_RELEASEHND, 0
+    )
+    assert release_variable.value == struct.pack("<I", handles[-1])
+
+
+@pytest.mark.parametrize("backend", ["pyads", "asyncio"])
+def test_symbol_version_change_clears_cache(
+    testserver_advanced, symbol_version, backend
+):
+    variables = TEST_DATASET["single_small"]["reals"]
+    target = _make_target(backend, symbol_version_check_interval=0)
+    with target:
+        target.write_list_by_name(variables)
+        target.read_by_name("real0")
+        assert len(target.symbol_cache) > 0
+        invalidations = _sample("invalidations")
+
+        assert target.read_list_by_name(list(variables)) == variables
+        assert _sample("invalidations") == invalidations
+
+        # An online change bumps the symbol version of the PLC program
+        symbol_version.value = bytes([2])
+        assert target.read_list_by_name(list(variables)) == variables
+        assert _sample("invalidations") - invalidations == 1
+        assert target.symbol_cache.version == 2
+        assert "real0" not in target.symbol_cache.handles
+    target.ensure_closed()
+
+
+def test_symbol_version_not_read_within_interval(testserver_advanced, symbol_version):
+    target = _make_target(symbol_version_check_interval=60)
+    with target:
+        target.read_by_name("real0")
+        symbol_version.value = bytes([2])
+        target.read_by_name("real0")
+        assert target.symbol_cache.version == 1
+        assert "real0" in target.symbol_cache.handles
+    target.ensure_closed()
@@ -0,0 +1,275 @@
+import struct
+import time
+
+import pyads
+import pyads.testserver
+import pytest
+from prometheus_client import REGISTRY
+from pyads.testserver import AmsResponseData
+
+from ads_client import ADSConnection, SymbolIndex
+from ads_client.ads_symbol_index import (
+    ARRAY_INFO,
+    DATATYPE_ENTRY_HEADER,
+    SYMBOL_ENTRY_HEADER,
+    expand_symbols,
+    parse_datatype_upload,
+    parse_symbol_upload,
+)
+from conftest import PYADS_TESTSERVER_ADS_PORT, add_symbol_variables
+
+INDEX_TESTSERVER_IP_ADDRESS = "127.0.0.5"
+INDEX_TESTSERVER_ADS_ADDRESS = "127.0.0.5.1.1"
+
+
+def pack_symbol(name, index_offset, size, data_type, symbol_type, comment=""):
+    body = b"".join(
+        text.encode("windows-1252") + b"\x00" for text in (name, symbol_type, comment)
+    )
+    header = SYMBOL_ENTRY_HEADER.pack(
+        SYMBOL_ENTRY_HEADER.size + len(body),
+        pyads.constants.INDEXGROUP_DATA,
+        index_offset,
+        size,
+        data_type,
+        0,
+        len(name),
+        len(symbol_type),
+        len(comment),
+    )
+    return header + body
+
+
+def pack_datatype(
+    name, type_name, size, offset=0, data_type=65, array_info=(), sub_items=()
+):
+    body = (
+        name.encode()
+        + b"\x00"
+        + type_name.encode()
+        + b"\x00"
+        + b"\x00"
+        + b"".join(ARRAY_INFO.pack(*dimension) for dimension in array_info)
+        + b"".join(sub_items)
+    )
+    header = DATATYPE_ENTRY_HEADER.pack(
+        DATATYPE_ENTRY_HEADER.size + len(body),
+        1,
+        0,
+        0,
+        size,
+        offset,
+        data_type,
+        0,
+        len(name),
+        len(type_name),
+        0,
+        len(array_info),
+        len(sub_items),
+    )
+    return header + body
+
+
+SYMBOLS = [
+    pack_symbol("GVL.aMotors", 100, 48, 65, "ARRAY [0..2] OF ST_Motor", "Motors"),
+    pack_symbol("MAIN.nCount", 200, 4, pyads.constants.ADST_INT32, "DINT"),
+    pack_symbol("MAIN.fTemp", 204, 8, pyads.constants.ADST_REAL64, "LREAL"),
+]
+DATATYPES = [
+    pack_datatype(
+        "ST_Motor",
+        "",
+        16,
+        sub_items=(
+            pack_datatype("fPos", "LREAL", 8, 0, pyads.constants.ADST_REAL64),
+            pack_datatype("fVel", "LREAL", 8, 8, pyads.constants.ADST_REAL64),
+        ),
+    ),
+    pack_datatype("ARRAY [0..2] OF ST_Motor", "ST_Motor", 48, array_info=((0, 3),)),
+]
+
+
+class SymbolTableHandler(pyads.testserver.AdvancedHandler):
+    """Handler serving a symbol table and data types for upload."""
+
+    def handle_request(self, request):
+        command_id = struct.unpack("<H", request.ams_header.command_id)[0]
+        data = request.ams_header.data
+        if command_id != pyads.constants.ADSCOMMAND_READ:
+            return super().handle_request(request)
+        index_group, _, read_length = struct.unpack_from("<III", data)
+        symbols, datatypes = b"".join(SYMBOLS), b"".join(DATATYPES)
+        if index_group == pyads.constants.ADSIGRP_SYM_UPLOADINFO2:
+            content = struct.pack(
+                "<IIIIII",
+                len(SYMBOLS),
+                len(symbols),
+                len(DATATYPES),
+                len(datatypes),
+                0,
+                0,
+            )
+        elif index_group == pyads.constants.ADSIGRP_SYM_UPLOAD:
+            content = symbols
+        elif index_group == pyads.constants.ADSIGRP_SYM_DT_UPLOAD:
+            content = datatypes
+        else:
+            return super().handle_request(request)
+        content = content[:read_length]
+        state = struct.unpack("<H", request.ams_header.state_flags)[0] | 0x0001
+        return AmsResponseData(
+            struct.pack("<H", state),
+            request.ams_header.error_code,
+            bytes(4) + struct.pack("<I", len(content)) + content,
+        )
+
+
+@pytest.fixture(scope="module")
+def symbol_table_server():
+    handler = SymbolTableHandler()
+    handler.symbol_version = add_symbol_variables(handler)
+    testserver = pyads.testserver.AdsTestServer(
+        handler, ip_address=INDEX_TESTSERVER_IP_ADDRESS
+    )
+    testserver.start()
+    time.sleep(1)
+    yield handler
+    testserver.close()
+
+
+@pytest.fixture
+def symbol_version(symbol_table_server):
+    yield symbol_table_server.symbol_version
+    symbol_table_server.symbol_version.value = bytes([1])
+
+
+def _uploads():
+    return (
+        REGISTRY.get_sample_value(
+            "ads_client_symbol_index_uploads_total",
+            {"ams_net_id": INDEX_TESTSERVER_ADS_ADDRESS},
+        )
+        or 0
+    )
+
+
+def _make_target(symbol_index, backend="pyads"):
+    return ADSConnection(
+        ams_net_id=INDEX_TESTSERVER_ADS_ADDRESS,
+        ip_address=INDEX_TESTSERVER_IP_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+        backend=backend,
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT, "max_in_flight": 1},
+        symbol_version_check_interval=0,
+        symbol_index=symbol_index,
+    )
+
+
+def test_expand_and_query():
+    symbols = parse_symbol_upload(b"".join(SYMBOLS), len(SYMBOLS))
+    datatypes = parse_datatype_upload(b"".join(DATATYPES), len(DATATYPES))
+    index = SymbolIndex(":memory:")
+    assert index.store("1.2.3.4.1.1", 851, 7, expand_symbols(symbols, datatypes)) == 12
+
+    positions = index.query("1.2.3.4.1.1", 851, 7, "GVL.aMotors[*].fPos")
+    assert [(s.name, s.index_offset, s.size) for s in positions] == [
+        ("GVL.aMotors[0].fPos", 100, 8),
+        ("GVL.aMotors[1].fPos", 116, 8),
+        ("GVL.aMotors[2].fPos", 132, 8),
+    ]
+    assert [s.name for s in index.query("1.2.3.4.1.1", 851, 7, "MAIN.*")] == [
+        "MAIN.fTemp",
+        "MAIN.nCount",
+    ]
+    assert len(index.query("1.2.3.4.1.1", 851, 7, include_members=False)) == 3
+    assert index.get("1.2.3.4.1.1", 851, 7, "GVL.aMotors[1]").is_member
+    # Tables are keyed by symbol version and target
+    assert index.query("1.2.3.4.1.1", 851, 8) == []
+    assert index.query("1.2.3.4.1.1", 852, 7) == []
+
+
+def test_query_ignores_case():
+    symbols = parse_symbol_upload(b"".join(SYMBOLS), len(SYMBOLS))
+    datatypes = parse_datatype_upload(b"".join(DATATYPES), len(DATATYPES))
+    index = SymbolIndex(":memory:")
+    index.store("1.2.3.4.1.1", 851, 7, expand_symbols(symbols, datatypes))
+
+    positions = index.query("1.2.3.4.1.1", 851, 7, "gvl.AMOTORS[*].FPOS")
+    assert [s.name for s in positions] == [
+        "GVL.aMotors[0].fPos",
+        "GVL.aMotors[1].fPos",
+        "GVL.aMotors[2].fPos",
+    ]
+    assert index.get("1.2.3.4.1.1", 851, 7, "main.ncount").name == "MAIN.nCount"
+
+
+def test_expansion_is_capped():
+    symbols = [
+        pack_symbol("GVL.aAxes", 0, 1600000, 65, "ARRAY [0..99999] OF ST_Motor"),
+        pack_symbol("GVL.aMotors", 100, 48, 65, "ARRAY [0..2] OF ST_Motor"),
+    ]
+    datatypes = DATATYPES + [
+        pack_datatype(
+            "ARRAY [0..99999] OF ST_Motor",
+            "ST_Motor",
+            1600000,
+            array_info=((0, 100000),),
+        )
+    ]
+    datatypes = parse_datatype_upload(b"".join(datatypes), len(datatypes))
+    expanded = list(
+        expand_symbols(
+            parse_symbol_upload(b"".join(symbols), len(symbols)),
+            datatypes,
+            max_array_elements=1000,
+            max_members=4,
+        )
+    )
+    # The large array is indexed as one symbol, and the members of the small one
+    # are cut off after four
+    assert [symbol.name for symbol in expanded] == [
+        "GVL.aAxes",
+        "GVL.aMotors",
+        "GVL.aMotors[0]",
+        "GVL.aMotors[0].fPos",
+        "GVL.aMotors[0].fVel",
+        "GVL.aMotors[1]",
+    ]
+
+
+@pytest.mark.parametrize("backend", ["pyads", "asyncio"])
+def test_symbol_table_uploaded_once_per_version(
+    symbol_table_server, symbol_version, tmp_path, backend
+):
+    target = _make_target(SymbolIndex(tmp_path / "symbols.sqlite3"), backend)
+    uploads = _uploads()
+    with target:
+        assert len(target.find_symbols("GVL.aMotors[*].fVel")) == 3
+        assert target.find_symbols("MAIN.nCount")[0].index_offset == 200
+        assert _uploads() - uploads == 1
+
+        # An online change bumps the symbol version and the table is uploaded again
+        symbol_version.value = bytes([2])
+        assert len(target.find_symbols("MAIN.*")) == 2
+        assert _uploads() - uploads == 2
+    target.ensure_closed()
+
+
+def test_symbol_index_persisted(symbol_table_server, symbol_version, tmp_path):
+    path = tmp_path / "symbols.sqlite3"
+    with _make_target(SymbolIndex(path)) as target:
+        target.index_symbols()
+    target.ensure_closed()
+
+    uploads = _uploads()
+    target = _make_target(SymbolIndex(path))
+    with target:
+        symbols = target.get_all_symbols()
+    target.ensure_closed()
+    assert sorted(symbol.name for symbol in symbols) == [
+        "GVL.aMotors",
+        "MAIN.fTemp",
+        "MAIN.nCount",
+    ]
+    assert _uploads() == uploads
@@ -1,10 +1,15 @@
 import pytest
 import pyads
+import time
+from prometheus_client import REGISTRY
 from conftest import (
     TEST_DATASET,
+    PYADS_TESTSERVER_ADS_ADDRESS,
+    PYADS_TESTSERVER_ADS_PORT,
     # TESTSERVER_TOTAL_VARIABLES,
 )
 import logging
+from ads_client import ADSConnection
 from utils import (
     _testfunc_read_by_name,
     _testfunc_write_by_name,
@@ -133,6 +138,67 @@ def test_verify_ams_net_id():
         verify_ams_net_id("123.4.56.87.66.1.1")
 
 
+# Connection lifecycle testing
+# ################################################################################################
+
+
+def _open_events(ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS):
+    return REGISTRY.get_sample_value(
+        "ads_client_connection_open_events_total", {"ams_net_id": ams_net_id}
+    )
+
+
+def test_nested_sessions_keep_connection_open(testserver_advanced):
+    """Nested calls should not close the connection of the enclosing session."""
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+    )
+    variables = TEST_DATASET["single_large"]["reals"]
+    with target:
+        target.write_list_by_name(variables)
+        assert target.is_open
+        with target:
+            assert target.session_depth == 2
+        assert target.is_open
+        assert target.read_list_by_name(list(variables)) == variables
+    assert target.session_depth == 0
+    assert not target.is_open
+
+
+def test_back_to_back_calls_reuse_connection(testserver_advanced):
+    """Consecutive calls within the idle timeout should open the port only once."""
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0.5,
+    )
+    variables = TEST_DATASET["single_small"]["reals"]
+    opened_before = _open_events() or 0
+    for _ in range(10):
+        target.write_list_by_name(variables)
+        target.read_list_by_name(list(variables))
+    assert _open_events() - opened_before == 1
+    assert target.is_open
+
+    # Connection is closed by the idle timer once no session has used it
+    time.sleep(1)
+    assert not target.is_open
+
+
+def test_close_during_session_is_deferred(testserver_advanced):
+    """Calling close() inside a session should close once the session ends."""
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+    )
+    with target:
+        target.close()
+        assert target.is_open
+    assert not target.is_open
+
+
 # Performance testing
 # ################################################################################################
 
@@ -0,0 +1,211 @@
+import asyncio
+import struct
+import threading
+import time
+
+import pyads
+import pytest
+
+from ads_client import ADSConnection
+from ads_client.ads_transport import (
+    ADSERR_CLIENT_SYNCTIMEOUT,
+    AMS_HEADER,
+    AMS_TCP_HEADER,
+    AsyncADSTransport,
+    get_transport_loop,
+)
+from conftest import (
+    PYADS_TESTSERVER_ADS_ADDRESS,
+    PYADS_TESTSERVER_ADS_PORT,
+    TEST_DATASET,
+)
+
+FAKE_SERVER_DELAY = 0.2
+
+
+@pytest.fixture
+def asyncio_target():
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+        backend="asyncio",
+        # pyads' testserver handles one request per socket read, so do not pipeline
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT, "max_in_flight": 1},
+    )
+    yield target
+    target.ensure_closed()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        ADSConnection(ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS, backend="dll")
+
+
+@pytest.mark.parametrize("variable_type", ["reals", "bools"])
+def test_asyncio_backend_list_round_trip(
+    testserver_advanced, asyncio_target, variable_type
+):
+    variables = TEST_DATASET["single_large"][variable_type]
+    asyncio_target.write_list_by_name(variables)
+    assert asyncio_target.read_list_by_name(list(variables)) == variables
+
+
+def test_asyncio_backend_by_name(testserver_advanced, asyncio_target):
+    asyncio_target.write_by_name("real0", 4.5)
+    assert asyncio_target.read_by_name("real0") == 4.5
+    name, _ = asyncio_target.read_device_info()
+    assert name == "TestServer"
+
+
+@pytest.mark.asyncio
+async def test_asyncio_backend_async_read(testserver_advanced, asyncio_target):
+    variables = TEST_DATASET["single_small"]["reals"]
+    await asyncio_target.write_list_by_name_async(variables)
+    assert await asyncio_target.read_list_by_name_async(list(variables)) == variables
+
+
+@pytest.mark.asyncio
+async def test_asyncio_backend_opens_off_the_event_loop(
+    testserver_advanced, asyncio_target, monkeypatch
+):
+    opened_in = []
+    open_connection = asyncio_target.open
+
+    def open():
+        opened_in.append(threading.current_thread())
+        open_connection()
+
+    monkeypatch.setattr(asyncio_target, "open", open)
+    await asyncio_target.read_list_by_name_async(["real0"])
+    await asyncio_target.write_list_by_name_async({"real0": 1.5})
+    assert opened_in and threading.main_thread() not in opened_in
+    # The port was closed again, as the connection has no idle timeout
+    assert not asyncio_target.is_open
+
+
+def test_asyncio_backend_reconnects_after_connection_lost(
+    testserver_advanced, asyncio_target
+):
+    with asyncio_target:
+        asyncio_target.write_by_name("real0", 1.5)
+        transport = asyncio_target._transport
+        get_transport_loop().loop.call_soon_threadsafe(
+            transport._writer.transport.abort
+        )
+        deadline = time.monotonic() + 5
+        while transport.is_connected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not asyncio_target.is_open
+        # The next call opens a new socket rather than failing as not connected
+        assert asyncio_target.read_by_name("real0") == 1.5
+        assert asyncio_target.is_open
+
+
+def test_local_ams_ports_are_distinct():
+    first = AsyncADSTransport("127.0.0.1.1.1")
+    second = AsyncADSTransport("127.0.0.1.1.1")
+    assert first.local_ams_port != second.local_ams_port
+    assert AsyncADSTransport("127.0.0.1.1.1", local_ams_port=40000).local_ams_port == (
+        40000
+    )
+
+
+class FakeAMSServer:
+    """AMS/TCP server answering read requests out of order after a delay."""
+
+    def __init__(self, delay: float, respond: bool = True):
+        self.delay = delay
+        self.respond = respond
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                _, length = AMS_TCP_HEADER.unpack(
+                    await reader.readexactly(AMS_TCP_HEADER.size)
+                )
+                frame = await reader.readexactly(length)
+                asyncio.ensure_future(self.reply(writer, frame))
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+    async def reply(self, writer, frame):
+        (
+            target,
+            target_port,
+            source,
+            source_port,
+            command,
+            _,
+            _,
+            _,
+            invoke_id,
+        ) = AMS_HEADER.unpack_from(frame)
+        # Later requests are answered first
+        await asyncio.sleep(self.delay / (1 + invoke_id % 10))
+        if not self.respond:
+            return
+        _, index_offset, _ = struct.unpack_from("<III", frame, AMS_HEADER.size)
+        data = struct.pack("<II", 0, 4) + struct.pack("<I", index_offset)
+        header = AMS_HEADER.pack(
+            source,
+            source_port,
+            target,
+            target_port,
+            command,
+            5,
+            len(data),
+            0,
+            invoke_id,
+        )
+        writer.write(AMS_TCP_HEADER.pack(0, len(header) + len(data)) + header + data)
+
+
+@pytest.mark.asyncio
+async def test_pipelined_requests_matched_by_invoke_id():
+    server = FakeAMSServer(FAKE_SERVER_DELAY)
+    transport = AsyncADSTransport(
+        "127.0.0.1.1.1", ip_address="127.0.0.1", tcp_port=await server.start()
+    )
+    await transport.connect()
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(transport.read(pyads.constants.INDEXGROUP_DATA, n, 4) for n in range(20))
+        )
+        elapsed = time.perf_counter() - start
+        assert [struct.unpack("<I", result)[0] for result in results] == list(range(20))
+        # Requests are in flight together rather than waiting on each other
+        assert elapsed < 2 * FAKE_SERVER_DELAY
+    finally:
+        await transport.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_request_timeout():
+    server = FakeAMSServer(0, respond=False)
+    transport = AsyncADSTransport(
+        "127.0.0.1.1.1",
+        ip_address="127.0.0.1",
+        tcp_port=await server.start(),
+        timeout=0.1,
+    )
+    await transport.connect()
+    try:
+        with pytest.raises(pyads.ADSError) as excinfo:
+            await transport.read(pyads.constants.INDEXGROUP_DATA, 0, 4)
+        assert excinfo.value.err_code == ADSERR_CLIENT_SYNCTIMEOUT
+        assert not transport._pending
+    finally:
+        await transport.close()
+        await server.stop()
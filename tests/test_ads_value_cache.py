@@ -0,0 +1,134 @@
+import time
+
+import pyads
+import pytest
+from prometheus_client import REGISTRY
+
+from ads_client import ADSConnection, ValueCache
+from ads_client.ads_value_cache import MISSING
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+
+def sample(name):
+    return (
+        REGISTRY.get_sample_value(name, {"ams_net_id": PYADS_TESTSERVER_ADS_ADDRESS})
+        or 0
+    )
+
+
+def test_ttl_by_name_and_pattern():
+    cache = ValueCache(
+        PYADS_TESTSERVER_ADS_ADDRESS,
+        {"GVL_Config.*": 60, "GVL_Config.nMode": 1, "GVL.*": 5},
+    )
+    assert cache.ttl("GVL_Config.fGain") == 60
+    # A variable's own name takes precedence over patterns
+    assert cache.ttl("GVL_Config.nMode") == 1
+    assert cache.ttl("GVL.fValue") == 5
+    assert cache.ttl("MAIN.fValue") == 0
+    cache.set_ttl("GVL.*", 0)
+    assert cache.ttl("GVL.fValue") == 0
+
+
+def test_expiry_and_plc_type():
+    cache = ValueCache(PYADS_TESTSERVER_ADS_ADDRESS, {"real0": 0.05})
+    cache.put("real0", 1.5, pyads.PLCTYPE_LREAL)
+    assert cache.get("real0", pyads.PLCTYPE_LREAL) == 1.5
+    # The value read as another type is not served
+    assert cache.get("real0", pyads.PLCTYPE_REAL) is MISSING
+    time.sleep(0.1)
+    assert cache.get("real0", pyads.PLCTYPE_LREAL) is MISSING
+    # Variables without a TTL are not cached
+    cache.put("real1", 2.5)
+    assert "real1" not in cache
+
+
+def test_least_recently_used_are_evicted():
+    evictions = sample("ads_client_value_cache_evictions_total")
+    cache = ValueCache(PYADS_TESTSERVER_ADS_ADDRESS, {"*": 60}, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert sample("ads_client_value_cache_evictions_total") == evictions + 1
+
+
+@pytest.fixture(params=["pyads", "asyncio"])
+def target(request, testserver_advanced):
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+        backend=request.param,
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT, "max_in_flight": 1},
+        value_cache_ttls={"real[0-2]": 60},
+    )
+    with target:
+        yield target
+    target.ensure_closed()
+
+
+def record_sum_reads(target) -> list:
+    sum_reads = []
+    sum_read = target.sum_read
+    sum_read_async = target._sum_read_async
+
+    def record_sum_read(data_names):
+        sum_reads.append(list(data_names))
+        return sum_read(data_names)
+
+    def record_sum_read_async(data_names):
+        sum_reads.append(list(data_names))
+        return sum_read_async(data_names)
+
+    target.sum_read = record_sum_read
+    target._sum_read_async = record_sum_read_async
+    return sum_reads
+
+
+def test_cached_reads(target):
+    target.write_list_by_name({"real0": 1.5, "real1": 2.5, "real3": 3.5})
+    sum_reads = record_sum_reads(target)
+    hits = sample("ads_client_value_cache_hits_total")
+
+    data_names = ["real3", "real0", "real1"]
+    assert target.read_list_by_name(data_names) == {
+        "real3": 3.5,
+        "real0": 1.5,
+        "real1": 2.5,
+    }
+    result = target.read_list_by_name(data_names)
+    # Only the variable without a TTL is read again, and the order is kept
+    assert list(result) == data_names
+    assert sum_reads == [data_names, ["real3"]]
+    assert sample("ads_client_value_cache_hits_total") == hits + 2
+
+
+@pytest.mark.asyncio
+async def test_cached_reads_async(target):
+    target.read_list_by_name(["real0", "real1"])
+    sum_reads = record_sum_reads(target)
+    assert list(await target.read_list_by_name_async(["real1", "real0"])) == [
+        "real1",
+        "real0",
+    ]
+    assert sum_reads == []
+
+
+def test_writes_invalidate(target):
+    target.write_by_name("real2", 1.0, pyads.PLCTYPE_LREAL)
+    assert target.read_by_name("real2", pyads.PLCTYPE_LREAL) == 1.0
+    assert "real2" in target.value_cache
+
+    target.write_by_name("real2", 2.0, pyads.PLCTYPE_LREAL)
+    assert "real2" not in target.value_cache
+    assert target.read_by_name("real2", pyads.PLCTYPE_LREAL) == 2.0
+
+    target.read_list_by_name(["real0", "real1"])
+    target.write_list_by_name({"real0": 3.0})
+    assert "real0" not in target.value_cache and "real1" in target.value_cache
+    assert target.read_list_by_name(["real0"])["real0"] == 3.0
+
+    target.ensure_closed()
+    assert len(target.value_cache) == 0
@@ -0,0 +1,134 @@
+import struct
+from unittest.mock import patch
+
+import pyads
+import pyads.testserver
+import pytest
+
+from ads_client import ADSConnection, WriteVerificationError, WriteVerifier
+from conftest import PYADS_TESTSERVER_ADS_ADDRESS, PYADS_TESTSERVER_ADS_PORT
+
+
+def as_real(value: float) -> float:
+    """Return a value rounded to single precision, as a REAL holds it."""
+    return struct.unpack("<f", struct.pack("<f", value))[0]
+
+
+def test_tolerance_by_type():
+    verifier = WriteVerifier()
+    real = verifier.tolerance(pyads.PLCTYPE_REAL)
+    lreal = verifier.tolerance(pyads.PLCTYPE_LREAL)
+    assert verifier.matches(0.1, as_real(0.1), real)
+    assert not verifier.matches(0.1, as_real(0.1), lreal)
+    assert not verifier.matches(0.1, 0.2, real)
+    # Arrays take the tolerance of their elements
+    assert verifier.tolerance(pyads.PLCTYPE_REAL * 4) == real
+    assert verifier.matches([0.1, 0.2], [as_real(0.1), as_real(0.2)], real)
+    assert not verifier.matches([0.1, 0.2], [as_real(0.1)], real)
+    # Other types must be equal
+    assert verifier.tolerance(pyads.PLCTYPE_DINT) == 0
+    assert verifier.matches({"a": 1, "b": "x"}, {"a": 1, "b": "x"})
+    assert not verifier.matches({"a": 1}, {"a": 2})
+
+
+def test_sampled_verification():
+    verifier = WriteVerifier(sample_every=3)
+    assert [verifier.due() for _ in range(6)] == [False, False, True] * 2
+    assert all(WriteVerifier().due() for _ in range(3))
+    with pytest.raises(ValueError):
+        WriteVerifier(sample_every=0)
+
+
+@pytest.fixture(scope="module")
+def real_variable(testserver_advanced):
+    testserver_advanced.handler.add_variable(
+        pyads.testserver.PLCVariable(
+            "GVL.fSetpoint",
+            value=bytes(4),
+            ads_type=pyads.constants.ADST_REAL32,
+            symbol_type="REAL",
+        )
+    )
+    return "GVL.fSetpoint"
+
+
+@pytest.fixture(params=["pyads", "asyncio"])
+def target(request, testserver_advanced):
+    target = ADSConnection(
+        ams_net_id=PYADS_TESTSERVER_ADS_ADDRESS,
+        ams_net_port=PYADS_TESTSERVER_ADS_PORT,
+        idle_timeout=0,
+        backend=request.param,
+        transport_options={"tcp_port": PYADS_TESTSERVER_ADS_PORT, "max_in_flight": 1},
+    )
+    with target:
+        yield target
+    target.ensure_closed()
+
+
+def test_verify_real_within_tolerance(target, real_variable):
+    # The REAL read back is rounded to single precision
+    target.write_by_name(real_variable, 0.1, pyads.PLCTYPE_REAL, verify=True)
+    target.write_list_by_name({real_variable: 0.3, "real0": 0.7}, verify=True)
+    assert target.read_by_name(real_variable) == pytest.approx(0.3, rel=1e-6)
+
+
+def test_verify_writes_report(target):
+    target.write_list_by_name({"real0": 1.5, "real1": 2.5})
+    report = target.verify_writes({"real0": 1.5, "real1": 9.5})
+    assert report.checked == 2
+    assert not report.ok
+    assert list(report.mismatches) == ["real1"]
+    assert report.mismatches["real1"] == (9.5, 2.5)
+
+    with pytest.raises(WriteVerificationError) as excinfo:
+        target._verify(True, {"real1": 9.5})
+    assert excinfo.value.report.mismatches == report.mismatches
+
+    # Variables the write failed for are reported along with the mismatches
+    with patch.object(target, "sum_write", return_value={"real0": 0x710}):
+        with pytest.raises(WriteVerificationError) as excinfo:
+            target.write_list_by_name({"real0": 1.0, "real1": 9.5}, verify=True)
+    assert list(excinfo.value.report.mismatches) == ["real1"]
+    assert excinfo.value.write_errors == {"real0": 0x710}
+
+
+def test_verify_arrays_with_one_read(target, testserver_advanced):
+    for name in ("GVL.aFirst", "GVL.aSecond"):
+        testserver_advanced.handler.add_variable(
+            pyads.testserver.PLCVariable(
+                name,
+                value=bytes(8 * 4),
+                ads_type=pyads.constants.ADST_REAL64,
+                symbol_type="ARRAY [0..3] OF LREAL",
+            )
+        )
+    requests = []
+    sum_command = target._sum_command
+
+    def record_sum_command(index_group, sub_requests):
+        requests.append(index_group)
+        return sum_command(index_group, sub_requests)
+
+    target._sum_command = record_sum_command
+    target.write_list_array_by_name(
+        {"GVL.aFirst": [1.0, 2.0, 3.0, 4.0], "GVL.aSecond": [5.0, 6.0, 7.0, 8.0]},
+        pyads.PLCTYPE_LREAL,
+        verify=True,
+    )
+    assert requests == [pyads.constants.ADSIGRP_SUMUP_READ]
+
+
+def test_sampled_writes_skip_verification(target):
+    verifier = WriteVerifier(sample_every=2)
+    reads = []
+    verify_writes = target.verify_writes
+
+    def record_verify_writes(*args, **kwargs):
+        reads.append(args[0])
+        return verify_writes(*args, **kwargs)
+
+    target.verify_writes = record_verify_writes
+    for value in (1.0, 2.0, 3.0, 4.0):
+        target.write_list_by_name({"real2": value}, verify=verifier)
+    assert reads == [{"real2": 2.0}, {"real2": 4.0}]